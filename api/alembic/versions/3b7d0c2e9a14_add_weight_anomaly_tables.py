@@ -0,0 +1,59 @@
+"""add_weight_anomaly_tables
+
+Revision ID: 3b7d0c2e9a14
+Revises: fe7a8b67e541
+Create Date: 2026-10-19 09:12:31.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7d0c2e9a14'
+down_revision: Union[str, None] = 'fe7a8b67e541'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('weight_trend_states',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pet_id', sa.Integer(), nullable=False),
+    sa.Column('mean', sa.Float(), nullable=False),
+    sa.Column('variance', sa.Float(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=False),
+    sa.Column('last_date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['pet_id'], ['pets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('pet_id')
+    )
+    op.create_index(op.f('ix_weight_trend_states_id'), 'weight_trend_states', ['id'], unique=False)
+    op.create_table('weight_anomalies',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pet_id', sa.Integer(), nullable=False),
+    sa.Column('weight_record_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.Column('weight', sa.Float(), nullable=False),
+    sa.Column('expected_weight', sa.Float(), nullable=False),
+    sa.Column('z_score', sa.Float(), nullable=False),
+    sa.Column('detected_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['pet_id'], ['pets.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['weight_record_id'], ['weight_records.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('weight_record_id')
+    )
+    op.create_index(op.f('ix_weight_anomalies_id'), 'weight_anomalies', ['id'], unique=False)
+    op.create_index(op.f('ix_weight_anomalies_pet_id'), 'weight_anomalies', ['pet_id'], unique=False)
+    op.create_index('ix_weight_anomalies_date_pet_id', 'weight_anomalies', ['date', 'pet_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_weight_anomalies_date_pet_id', table_name='weight_anomalies')
+    op.drop_index(op.f('ix_weight_anomalies_pet_id'), table_name='weight_anomalies')
+    op.drop_index(op.f('ix_weight_anomalies_id'), table_name='weight_anomalies')
+    op.drop_table('weight_anomalies')
+    op.drop_index(op.f('ix_weight_trend_states_id'), table_name='weight_trend_states')
+    op.drop_table('weight_trend_states')
@@ -0,0 +1,44 @@
+"""add_rendered_reports
+
+Revision ID: 6f1a9c3e2b57
+Revises: d52e8f1b6c90
+Create Date: 2026-10-19 11:02:47.913520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f1a9c3e2b57'
+down_revision: Union[str, None] = 'd52e8f1b6c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('rendered_reports',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('object_key', sa.String(), nullable=False),
+    sa.Column('pet_id', sa.Integer(), nullable=False),
+    sa.Column('template_id', sa.Integer(), nullable=False),
+    sa.Column('format', sa.String(), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_accessed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('object_key')
+    )
+    op.create_index(op.f('ix_rendered_reports_id'), 'rendered_reports', ['id'], unique=False)
+    op.create_index(op.f('ix_rendered_reports_last_accessed_at'), 'rendered_reports', ['last_accessed_at'], unique=False)
+    op.create_index(op.f('ix_rendered_reports_pet_id'), 'rendered_reports', ['pet_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_rendered_reports_pet_id'), table_name='rendered_reports')
+    op.drop_index(op.f('ix_rendered_reports_last_accessed_at'), table_name='rendered_reports')
+    op.drop_index(op.f('ix_rendered_reports_id'), table_name='rendered_reports')
+    op.drop_table('rendered_reports')
@@ -0,0 +1,26 @@
+"""add_pet_data_version
+
+Revision ID: 8c41f5a2d7b3
+Revises: 3b7d0c2e9a14
+Create Date: 2026-10-19 10:02:47.193522
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41f5a2d7b3'
+down_revision: Union[str, None] = '3b7d0c2e9a14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('pets', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('pets', 'data_version')
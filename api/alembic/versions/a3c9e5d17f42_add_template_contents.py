@@ -0,0 +1,95 @@
+"""add_template_contents
+
+Revision ID: a3c9e5d17f42
+Revises: 6f1a9c3e2b57
+Create Date: 2026-10-19 14:21:08.463195
+
+"""
+from typing import Sequence, Union
+import hashlib
+import json
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e5d17f42'
+down_revision: Union[str, None] = '6f1a9c3e2b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('template_contents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('encoding', sa.String(), nullable=False),
+    sa.Column('base_id', sa.Integer(), nullable=True),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['base_id'], ['template_contents.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_hash')
+    )
+    op.create_index(op.f('ix_template_contents_id'), 'template_contents', ['id'], unique=False)
+    op.add_column('report_template_versions', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    # 现有版本内容按哈希去重并压缩（不做增量编码）
+    conn = op.get_bind()
+    stored = set()
+    for version_id, content in conn.execute(sa.text("SELECT id, content FROM report_template_versions")).fetchall():
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        if digest not in stored:
+            conn.execute(
+                sa.text(
+                    "INSERT INTO template_contents (content_hash, encoding, data, size, created_at) "
+                    "VALUES (:hash, 'zlib', :data, :size, now())"
+                ),
+                {"hash": digest, "data": zlib.compress(content.encode(), 9), "size": len(content.encode())}
+            )
+            stored.add(digest)
+        conn.execute(
+            sa.text("UPDATE report_template_versions SET content_hash = :hash WHERE id = :id"),
+            {"hash": digest, "id": version_id}
+        )
+
+    op.alter_column('report_template_versions', 'content_hash', nullable=False)
+    op.create_index(op.f('ix_report_template_versions_content_hash'), 'report_template_versions', ['content_hash'], unique=False)
+    op.create_foreign_key('report_template_versions_content_hash_fkey', 'report_template_versions', 'template_contents', ['content_hash'], ['content_hash'])
+    op.drop_column('report_template_versions', 'content')
+
+
+def downgrade() -> None:
+    op.add_column('report_template_versions', sa.Column('content', sa.TEXT(), autoincrement=False, nullable=True))
+
+    conn = op.get_bind()
+    blobs = {
+        row.id: row for row in conn.execute(
+            sa.text("SELECT id, content_hash, encoding, base_id, data FROM template_contents")
+        ).fetchall()
+    }
+
+    def decode(blob) -> str:
+        if blob.encoding == "delta":
+            base_lines = decode(blobs[blob.base_id]).splitlines(keepends=True)
+            return "".join(
+                "".join(base_lines[op_[0]:op_[1]]) if isinstance(op_, list) else op_
+                for op_ in json.loads(zlib.decompress(blob.data))
+            )
+        return zlib.decompress(blob.data).decode()
+
+    for blob in blobs.values():
+        conn.execute(
+            sa.text("UPDATE report_template_versions SET content = :content WHERE content_hash = :hash"),
+            {"content": decode(blob), "hash": blob.content_hash}
+        )
+
+    op.alter_column('report_template_versions', 'content', nullable=False)
+    op.drop_constraint('report_template_versions_content_hash_fkey', 'report_template_versions', type_='foreignkey')
+    op.drop_index(op.f('ix_report_template_versions_content_hash'), table_name='report_template_versions')
+    op.drop_column('report_template_versions', 'content_hash')
+    op.drop_index(op.f('ix_template_contents_id'), table_name='template_contents')
+    op.drop_table('template_contents')
@@ -0,0 +1,32 @@
+"""add_pet_avatar_key
+
+Revision ID: b8e4d2c61f05
+Revises: a3c9e5d17f42
+Create Date: 2026-10-19 14:08:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4d2c61f05'
+down_revision: Union[str, None] = 'a3c9e5d17f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('pets', sa.Column('avatar_key', sa.String(), nullable=True))
+    # 已上传头像的预签名链接形如 .../<bucket>/pets/<id>/avatar.<ext>?X-Amz-...，取出对象键
+    op.execute(
+        "UPDATE pets SET avatar_key = substring(avatar_url from '/(pets/[0-9]+/avatar[^/?]*)') "
+        "WHERE avatar_url ~ '/pets/[0-9]+/avatar[^/?]*'"
+    )
+
+
+def downgrade() -> None:
+    # avatar_url 在升级时未清空，旧数据原样保留
+    op.drop_column('pets', 'avatar_key')
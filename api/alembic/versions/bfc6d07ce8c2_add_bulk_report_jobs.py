@@ -0,0 +1,51 @@
+"""add_bulk_report_jobs
+
+Revision ID: bfc6d07ce8c2
+Revises: c4a7f0e93b18
+Create Date: 2026-10-19 18:04:51.203376
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bfc6d07ce8c2'
+down_revision: Union[str, None] = 'c4a7f0e93b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('bulk_report_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('template_id', sa.Integer(), nullable=False),
+    sa.Column('version_id', sa.Integer(), nullable=True),
+    sa.Column('format', sa.String(), nullable=False),
+    sa.Column('output', sa.String(), nullable=False),
+    sa.Column('pet_ids', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.JSON(), nullable=False),
+    sa.Column('objects', sa.JSON(), nullable=False),
+    sa.Column('archive_key', sa.String(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_bulk_report_jobs_owner_active', 'bulk_report_jobs', ['owner_id'], unique=True, postgresql_where=sa.text("status IN ('pending', 'running')"))
+    op.create_index(op.f('ix_bulk_report_jobs_owner_id'), 'bulk_report_jobs', ['owner_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_bulk_report_jobs_owner_id'), table_name='bulk_report_jobs')
+    op.drop_index('ix_bulk_report_jobs_owner_active', table_name='bulk_report_jobs')
+    op.drop_table('bulk_report_jobs')
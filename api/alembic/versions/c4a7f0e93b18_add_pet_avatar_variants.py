@@ -0,0 +1,26 @@
+"""add_pet_avatar_variants
+
+Revision ID: c4a7f0e93b18
+Revises: b8e4d2c61f05
+Create Date: 2026-10-19 16:21:47.118903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7f0e93b18'
+down_revision: Union[str, None] = 'b8e4d2c61f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('pets', sa.Column('avatar_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('pets', 'avatar_variants')
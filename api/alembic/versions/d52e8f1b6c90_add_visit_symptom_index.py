@@ -0,0 +1,64 @@
+"""add_visit_symptom_index
+
+Revision ID: d52e8f1b6c90
+Revises: 8c41f5a2d7b3
+Create Date: 2026-10-19 11:36:05.772310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd52e8f1b6c90'
+down_revision: Union[str, None] = '8c41f5a2d7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('symptoms',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_symptoms_id'), 'symptoms', ['id'], unique=False)
+    op.create_table('visit_symptoms',
+    sa.Column('visit_id', sa.Integer(), nullable=False),
+    sa.Column('symptom_id', sa.Integer(), nullable=False),
+    sa.Column('pet_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['pet_id'], ['pets.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['symptom_id'], ['symptoms.id'], ),
+    sa.ForeignKeyConstraint(['visit_id'], ['medical_visits.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('visit_id', 'symptom_id')
+    )
+    op.create_index('ix_visit_symptoms_pet_id_symptom_id', 'visit_symptoms', ['pet_id', 'symptom_id'], unique=False)
+    op.create_index('ix_visit_symptoms_symptom_id_pet_id', 'visit_symptoms', ['symptom_id', 'pet_id'], unique=False)
+
+    # 回填现有就医记录的症状（与 normalize_symptoms 的规则一致）
+    op.execute("""
+        INSERT INTO symptoms (name)
+        SELECT DISTINCT lower(trim(token))
+        FROM medical_visits, unnest(string_to_array(symptoms, ',')) AS token
+        WHERE trim(token) <> ''
+        ON CONFLICT (name) DO NOTHING
+    """)
+    op.execute("""
+        INSERT INTO visit_symptoms (visit_id, symptom_id, pet_id)
+        SELECT DISTINCT v.id, s.id, v.pet_id
+        FROM medical_visits AS v
+        CROSS JOIN unnest(string_to_array(v.symptoms, ',')) AS token
+        JOIN symptoms AS s ON s.name = lower(trim(token))
+        WHERE v.pet_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_visit_symptoms_symptom_id_pet_id', table_name='visit_symptoms')
+    op.drop_index('ix_visit_symptoms_pet_id_symptom_id', table_name='visit_symptoms')
+    op.drop_table('visit_symptoms')
+    op.drop_index(op.f('ix_symptoms_id'), table_name='symptoms')
+    op.drop_table('symptoms')
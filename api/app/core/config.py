@@ -27,6 +27,65 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: str = "minioadmin"
     MINIO_USE_SSL: bool = False
     MINIO_BUCKET_NAME: str = "petwell"
+    MINIO_REGION: str = "us-east-1"  # 固定区域，签名时无需向服务器查询
+    MINIO_WORKERS: int = 8  # 执行存储调用的线程数
+    MINIO_POOL_MAXSIZE: int = 16  # 连接池大小，不小于线程数（后台任务也共用连接池）
+    MINIO_RETRIES: int = 3  # 连接错误和 5xx 的重试次数
+    MINIO_TIMEOUT: float = 30.0  # 连接和读取超时（秒）
+    PRESIGNED_URL_EXPIRE_MINUTES: int = 24 * 60  # 头像等对象链接有效期
+    PRESIGNED_URL_CACHE_SIZE: int = 16384  # 每个头像含原图和 6 个缩略图
+    AVATAR_VARIANT_SIZES: List[int] = [48, 96, 256]  # 头像缩略图边长（像素）
+    
+    # Image processing pool
+    IMAGE_WORKERS: int = 2  # 图片解码/缩放/编码子进程数
+    IMAGE_QUEUE_LIMIT: int = 8  # 每个 API 进程排队和处理中的任务上限，超出返回 503
+    IMAGE_TASK_TIMEOUT: float = 10.0  # 从子进程开始处理起算，超时只结束该子进程
+    
+    # Weight anomaly detection
+    WEIGHT_EWMA_ALPHA: float = 0.3  # 新读数的权重
+    WEIGHT_ANOMALY_Z_THRESHOLD: float = 3.0
+    WEIGHT_ANOMALY_MIN_SAMPLES: int = 5  # 基线稳定前不标记异常
+    WEIGHT_ANOMALY_MIN_STD_RATIO: float = 0.01  # 标准差下限（相对均值）
+    
+    # Analysis result cache
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 512
+    ANALYSIS_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    
+    # Report charts
+    REPORT_CHART_MODE: str = "shared"  # shared: 引用共享的 plotly.js 静态资源; inline: 内嵌完整 plotly.js; svg: 静态 SVG
+    STATIC_ASSET_BASE_URL: str = ""  # API 的完整地址；为空时使用请求的地址，没有请求（预览预热）时 shared 改为 svg
+    
+    # Report templates
+    TEMPLATE_CACHE_SIZE: int = 256  # 进程内保留的已编译模板数
+    TEMPLATE_BYTECODE_CACHE: bool = True  # 编译结果写入磁盘，重启后免重新编译
+    TEMPLATE_BYTECODE_CACHE_DIR: str = ""  # 为空时使用系统临时目录
+    TEMPLATE_RENDER_WORKERS: int = 2  # 用户模板渲染子进程数，0 表示在 API 进程内渲染
+    TEMPLATE_RENDER_CPU_SECONDS: float = 2.0
+    TEMPLATE_RENDER_TIMEOUT: float = 5.0  # 墙钟超时兜底，从子进程开始渲染起算，超时只结束该子进程
+    TEMPLATE_RENDER_MAX_OPERATIONS: int = 1_000_000  # 函数调用、属性/下标访问、循环次数之和
+    TEMPLATE_RENDER_MAX_RANGE: int = 10_000
+    TEMPLATE_RENDER_MAX_OUTPUT: int = 16 * 1024 * 1024  # 字符数，内嵌 plotly.js 的报告约 5MB
+    TEMPLATE_CONTENT_CACHE_SIZE: int = 512  # 进程内缓存的已解码版本内容数
+    
+    # Shared template listings
+    SHARED_TEMPLATE_CACHE_SIZE: int = 1024  # 缓存的用户数
+    SHARED_TEMPLATE_CACHE_TTL: float = 60.0  # 秒，限制其他进程修改后的不一致时间（也用于默认模板列表）
+    
+    # Template preview cache
+    PREVIEW_CACHE_MAX_ENTRIES: int = 256
+    PREVIEW_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    
+    # Rendered report cache (MinIO)
+    REPORT_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # 超出后按最近访问时间淘汰
+    REPORT_ACCESS_RESOLUTION_SECONDS: int = 60  # 访问时间的更新粒度，期间的命中不再写库
+    REPORT_URL_EXPIRE_MINUTES: int = 60
+    REPORT_SPOOL_MAX_BYTES: int = 8 * 1024 * 1024  # PDF 渲染超过此大小时写入临时文件
+
+    # Bulk report jobs
+    BULK_REPORT_WORKERS: int = 2  # 批量渲染子进程数
+    BULK_REPORT_BATCH_SIZE: int = 50  # 每批加载的宠物数
+    BULK_REPORT_JOB_TTL_MINUTES: int = 60  # 完成后保留任务状态和压缩包的时间
+    BULK_REPORT_STALE_SECONDS: int = 120  # 执行中的任务超过此时间未更新进度，视为所在进程已退出
     
     # Timezone
     TIMEZONE: timezone = timezone(timedelta(hours=8))  # 中国标准时间 UTC+8
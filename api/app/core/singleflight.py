@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Callable, Dict, Hashable
+from starlette.concurrency import run_in_threadpool
+
+# 所有合并器实例，供 /metrics 汇总
+FLIGHTS: Dict[str, "SingleFlight"] = {}
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical computations within a worker
+
+    The first caller for a key runs `fn` in the threadpool; callers that
+    arrive with the same key while it is running await the same result
+    instead of repeating the work. The computation runs as its own task, so
+    a disconnecting caller does not cancel it for the others, which also
+    means `fn` must not use the caller's request session (see
+    app.db.session.detached_session).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        FLIGHTS[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 所有调用方都已断开时，避免 "exception was never retrieved" 告警
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced
+        }
+
+def flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Snapshot metrics of every registered single-flight group"""
+    return {name: flight.stats() for name, flight in FLIGHTS.items()}
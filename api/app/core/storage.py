@@ -1,50 +1,110 @@
 from minio import Minio
 from minio.error import S3Error
+from minio.deleteobjects import DeleteObject
 from fastapi import HTTPException, status
+from app.core.cache import ResultCache
 from app.core.config import settings
+import asyncio
+import certifi
+import functools
 import io
 import logging
+import os
+import threading
+import time
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from typing import BinaryIO, Callable, List, Optional, TypeVar, Union
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+def create_http_client() -> urllib3.PoolManager:
+    """
+    HTTP connection pool for the MinIO client
+
+    Sized from MINIO_POOL_MAXSIZE so every storage thread can hold its own
+    connection; connection errors and 5xx responses are retried with
+    backoff.
+    """
+    return urllib3.PoolManager(
+        maxsize=settings.MINIO_POOL_MAXSIZE,
+        block=False,
+        timeout=urllib3.Timeout(connect=settings.MINIO_TIMEOUT, read=settings.MINIO_TIMEOUT),
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(
+            total=settings.MINIO_RETRIES,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504]
+        )
+    )
+
 # Initialize MinIO client
 minio_client = Minio(
     f"{settings.MINIO_HOST}:{settings.MINIO_PORT}",
     access_key=settings.MINIO_ACCESS_KEY,
     secret_key=settings.MINIO_SECRET_KEY,
-    secure=settings.MINIO_USE_SSL
+    secure=settings.MINIO_USE_SSL,
+    region=settings.MINIO_REGION,
+    http_client=create_http_client()
 )
 
-async def upload_file(file_data: bytes, file_name: str, content_type: str) -> str:
+# MinIO 客户端是同步的，异步接口把调用放到专用线程池，不阻塞事件循环
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.MINIO_WORKERS, thread_name_prefix="storage")
+        return _executor
+
+async def run_storage(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking storage call on the storage thread pool
+
+    At most MINIO_WORKERS calls run at once; further calls wait in the
+    executor queue instead of occupying the event loop or the shared
+    threadpool used for database work.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+def shutdown_storage() -> None:
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def _upload(file_data: Union[bytes, BinaryIO], file_name: str, content_type: str, length: Optional[int]) -> str:
+    put_object(file_data, file_name, content_type, length)
+    return cached_presigned_url(file_name)
+
+async def upload_file(
+    file_data: Union[bytes, BinaryIO],
+    file_name: str,
+    content_type: str,
+    length: Optional[int] = None
+) -> str:
     """
     Upload file to MinIO storage
     
     Args:
-        file_data: File bytes
+        file_data: File bytes, or a readable file streamed to storage
         file_name: Name of the file
         content_type: MIME type of the file
+        length: Size of `file_data` when it is a file
     
     Returns:
-        str: Presigned URL of the uploaded file (valid for 7 days)
+        str: Presigned URL of the uploaded file (see cached_presigned_url)
     """
     try:
-        # Upload file
-        minio_client.put_object(
-            bucket_name=settings.MINIO_BUCKET_NAME,
-            object_name=file_name,
-            data=io.BytesIO(file_data),
-            length=len(file_data),
-            content_type=content_type
-        )
-        
-        # Generate presigned URL valid for 7 days
-        url = minio_client.presigned_get_object(
-            bucket_name=settings.MINIO_BUCKET_NAME,
-            object_name=file_name,
-            expires=timedelta(days=7)
-        )
-        
+        url = await run_storage(_upload, file_data, file_name, content_type, length)
         logger.info(f"File uploaded successfully: {file_name}")
         return url
     
@@ -63,7 +123,8 @@ async def delete_file(file_name: str) -> None:
         file_name: Name of the file to delete
     """
     try:
-        minio_client.remove_object(
+        await run_storage(
+            minio_client.remove_object,
             bucket_name=settings.MINIO_BUCKET_NAME,
             object_name=file_name
         )
@@ -73,3 +134,90 @@ async def delete_file(file_name: str) -> None:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete file: {str(e)}"
         )
+
+# 以下为同步版本，供线程池中执行的任务（如报告渲染缓存）调用；异步代码通过 run_storage 调用
+
+def put_object(file_data: Union[bytes, BinaryIO], file_name: str, content_type: str, length: Optional[int] = None) -> None:
+    """
+    Store bytes, or a readable file of `length` bytes, under `file_name`
+
+    Files are read in multipart chunks rather than loaded into memory.
+    """
+    if isinstance(file_data, bytes):
+        file_data, length = io.BytesIO(file_data), len(file_data)
+    minio_client.put_object(
+        bucket_name=settings.MINIO_BUCKET_NAME,
+        object_name=file_name,
+        data=file_data,
+        length=length,
+        content_type=content_type
+    )
+
+def object_exists(file_name: str) -> bool:
+    """Whether `file_name` is present in the bucket"""
+    try:
+        minio_client.stat_object(settings.MINIO_BUCKET_NAME, file_name)
+        return True
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return False
+        raise
+
+def get_presigned_url(file_name: str, expires: timedelta) -> str:
+    """Presigned GET URL for `file_name`; signed locally, no round trip"""
+    return minio_client.presigned_get_object(
+        bucket_name=settings.MINIO_BUCKET_NAME,
+        object_name=file_name,
+        expires=expires
+    )
+
+# 对象键 -> (链接, 刷新时间)
+presigned_cache = ResultCache("presigned_urls", max_entries=settings.PRESIGNED_URL_CACHE_SIZE)
+
+def cached_presigned_url(file_name: str) -> str:
+    """
+    Presigned GET URL for `file_name`, reused across requests
+
+    URLs are valid for PRESIGNED_URL_EXPIRE_MINUTES and re-signed once
+    half of that has passed, so a URL handed out is always good for at
+    least half the lifetime. Keys must change when their content does.
+    """
+    cached = presigned_cache.get(file_name)
+    now = time.monotonic()
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    lifetime = timedelta(minutes=settings.PRESIGNED_URL_EXPIRE_MINUTES)
+    url = get_presigned_url(file_name, lifetime)
+    presigned_cache.set(file_name, (url, now + lifetime.total_seconds() / 2))
+    return url
+
+def open_object(file_name: str):
+    """
+    Open `file_name` for streaming
+
+    The caller must call close() and release_conn() on the returned response.
+
+    Raises:
+        S3Error: Object missing (code NoSuchKey) or storage failure
+    """
+    return minio_client.get_object(settings.MINIO_BUCKET_NAME, file_name)
+
+def remove_objects(file_names: List[str]) -> None:
+    """Delete several objects in one request, logging failures instead of raising"""
+    if not file_names:
+        return
+    errors = minio_client.remove_objects(
+        settings.MINIO_BUCKET_NAME,
+        [DeleteObject(name) for name in file_names]
+    )
+    # remove_objects 是惰性的，遍历结果才会真正发送请求
+    for error in errors:
+        logger.error(f"Failed to delete file {error.name}: {error.message}")
+
+def stream_object(response, chunk_size: int = 64 * 1024):
+    """Yield the body of an `open_object` response and release the connection"""
+    try:
+        yield from response.stream(chunk_size)
+    finally:
+        response.close()
+        response.release_conn()
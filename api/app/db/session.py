@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker, Session
 from typing import Generator
 from datetime import datetime
@@ -15,8 +15,10 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 def before_flush(session, flush_context, instances):
     """Convert datetime to UTC before saving to database"""
     for obj in session.new | session.dirty:
+        state = inspect(obj)
         for key, value in obj.__dict__.items():
-            if isinstance(value, datetime):
+            # 只处理本次赋值的字段；重写未改动的 updated_at 会让 onupdate 失效
+            if isinstance(value, datetime) and (obj in session.new or state.attrs[key].history.has_changes()):
                 setattr(obj, key, value.astimezone(pytz.UTC))
 
 def get_db() -> Generator[Session, None, None]:
@@ -31,3 +33,13 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+def detached_session(db: Session) -> Session:
+    """
+    A new session on the same bind as `db`
+
+    For work handed to another thread that may outlive the request (e.g.
+    single-flight computations): the request session is closed by get_db
+    when its caller disconnects, and sessions are not thread-safe.
+    """
+    return SessionLocal(bind=db.get_bind())
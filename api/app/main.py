@@ -1,13 +1,23 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from datetime import datetime
 from app.core.config import settings
-from app.routes import auth, pets, records, reports, tags_metadata
+from app.core.cache import cache_stats
+from app.core.singleflight import flight_stats
+from app.routes import assets, auth, pets, records, reports, tags_metadata
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 from fastapi.openapi.docs import get_swagger_ui_html
+from starlette.concurrency import run_in_threadpool
+from app.core.storage import shutdown_storage
+from app.utils.bulk_reports import shutdown_bulk_pool
+from app.utils.default_avatars import warm_default_avatars
+from app.utils.image_pool import image_stats, shutdown_image_pool, warm_image_pool
 from app.utils.init_data import init_default_templates
+from app.utils.template_catalog import load_default_templates
+from app.utils.template_sandbox import shutdown_render_pool, warm_render_pool
 
 class CustomJSONResponse(JSONResponse):
     def render(self, content) -> bytes:
@@ -44,15 +54,27 @@ app.include_router(auth.router, prefix=settings.API_V1_STR)
 app.include_router(pets.router, prefix=settings.API_V1_STR)
 app.include_router(records.router, prefix=settings.API_V1_STR)
 app.include_router(reports.router, prefix=settings.API_V1_STR)
+app.include_router(assets.router)
 
 # Health check
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "version": settings.VERSION}
 
+# Cache metrics
+@app.get("/metrics")
+async def metrics():
+    return {"caches": cache_stats(), "single_flight": flight_stats(), "image_processing": image_stats()}
+
 @app.on_event("startup")
 async def startup_event():
-    init_default_templates()
+    # 同步数据库操作放到线程池，不阻塞事件循环
+    await run_in_threadpool(init_default_templates)
+    await run_in_threadpool(load_default_templates)
+    warm_render_pool()
+    warm_image_pool()
+    # 默认头像在后台准备，不阻塞启动（存储不可用时首次使用再重试）
+    asyncio.get_running_loop().run_in_executor(None, warm_default_avatars)
     print(f"""
 🚀 PetWell API is running:
    - API Documentation: http://127.0.0.1:8000/api/docs
@@ -61,5 +83,12 @@ async def startup_event():
    - Version: {settings.VERSION}
     """)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_render_pool()
+    shutdown_bulk_pool()
+    shutdown_image_pool()
+    shutdown_storage()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
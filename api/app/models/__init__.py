@@ -5,13 +5,20 @@ from app.models.records import (
     VaccineRecord,
     Deworming,
     MedicalVisit,
-    DailyObservation
+    Symptom,
+    VisitSymptom,
+    DailyObservation,
+    WeightTrendState,
+    WeightAnomaly
 )
 from app.models.settings import (
     ReminderSettings,
     ReportTemplate,
     ReportTemplateVersion,
-    SharedTemplate
+    TemplateContent,
+    SharedTemplate,
+    RenderedReport,
+    BulkReportJob
 )
 
 # 确保所有模型都被导入，这样 SQLAlchemy 可以正确设置关系
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
@@ -13,8 +13,12 @@ class Pet(Base):
     breed = Column(String)
     birth_date = Column(DateTime)
     status = Column(String, default="active")
-    avatar_url = Column(String)
+    avatar_url = Column(String)  # 外部头像链接；上传的头像只存对象键，链接在读取时签发
+    avatar_key = Column(String)
+    avatar_variants = Column(JSON)  # {"48": {"webp": 对象键, "jpeg": 对象键}, ...}
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # 记录数据版本号，任何记录增删改都会递增，用于分析结果缓存失效
+    data_version = Column(Integer, default=0, server_default="0", nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -1,7 +1,9 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from itertools import chain
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index, event, update
+from sqlalchemy.orm import relationship, Session
 from app.db.base import Base
+from app.models.pet import Pet
 
 class WeightRecord(Base):
     """Weight record table"""
@@ -58,6 +60,28 @@ class MedicalVisit(Base):
     notes = Column(Text)
     
     pet = relationship("Pet", back_populates="medical_records")
+    symptom_links = relationship("VisitSymptom", cascade="all, delete-orphan")
+
+class Symptom(Base):
+    """Interned symptom vocabulary"""
+    __tablename__ = "symptoms"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+
+class VisitSymptom(Base):
+    """Normalized symptoms of a medical visit, populated at write time"""
+    __tablename__ = "visit_symptoms"
+    __table_args__ = (
+        Index("ix_visit_symptoms_pet_id_symptom_id", "pet_id", "symptom_id"),
+        Index("ix_visit_symptoms_symptom_id_pet_id", "symptom_id", "pet_id"),
+    )
+
+    visit_id = Column(Integer, ForeignKey("medical_visits.id", ondelete="CASCADE"), primary_key=True)
+    symptom_id = Column(Integer, ForeignKey("symptoms.id"), primary_key=True)
+    pet_id = Column(Integer, ForeignKey("pets.id", ondelete="CASCADE"), nullable=False)
+
+    symptom = relationship("Symptom")
 
 class DailyObservation(Base):
     """Daily observation table"""
@@ -70,4 +94,60 @@ class DailyObservation(Base):
     action_taken = Column(Text)
     notes = Column(Text)
     
-    pet = relationship("Pet", back_populates="observations") 
\ No newline at end of file
+    pet = relationship("Pet", back_populates="observations")
+
+class WeightTrendState(Base):
+    """Per-pet EWMA weight baseline, updated on every new reading"""
+    __tablename__ = "weight_trend_states"
+
+    id = Column(Integer, primary_key=True, index=True)
+    pet_id = Column(Integer, ForeignKey("pets.id", ondelete="CASCADE"), unique=True, nullable=False)
+    mean = Column(Float, nullable=False)
+    variance = Column(Float, nullable=False, default=0.0)
+    sample_count = Column(Integer, nullable=False, default=0)
+    last_date = Column(DateTime, nullable=False)
+
+class WeightAnomaly(Base):
+    """Weight readings flagged as anomalous at insert time"""
+    __tablename__ = "weight_anomalies"
+    __table_args__ = (
+        Index("ix_weight_anomalies_date_pet_id", "date", "pet_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    pet_id = Column(Integer, ForeignKey("pets.id", ondelete="CASCADE"), nullable=False, index=True)
+    weight_record_id = Column(
+        Integer,
+        ForeignKey("weight_records.id", ondelete="CASCADE"),
+        unique=True,
+        nullable=False
+    )
+    date = Column(DateTime, nullable=False)
+    weight = Column(Float, nullable=False)
+    expected_weight = Column(Float, nullable=False)
+    z_score = Column(Float, nullable=False)
+    detected_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    weight_record = relationship("WeightRecord")
+
+# 会影响宠物分析结果的记录类型
+RECORD_MODELS = (WeightRecord, VaccineRecord, Deworming, MedicalVisit, DailyObservation)
+
+@event.listens_for(Session, 'after_flush')
+def bump_pet_data_version(session, flush_context):
+    """Bump Pet.data_version for every pet whose records changed in this flush"""
+    pet_ids = {
+        obj.pet_id
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, RECORD_MODELS) and obj.pet_id is not None
+    }
+    if not pet_ids:
+        return
+    
+    pets = Pet.__table__
+    session.connection().execute(
+        update(pets)
+        .where(pets.c.id.in_(pet_ids))
+        # 保留 updated_at：记录变化不代表宠物资料被修改
+        .values(data_version=pets.c.data_version + 1, updated_at=pets.c.updated_at)
+    )
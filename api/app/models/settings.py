@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, JSON, Text, Boolean, LargeBinary, Index, text
+from sqlalchemy.orm import relationship, object_session
 from app.db.base import Base
 from datetime import datetime
 
@@ -42,12 +42,36 @@ class ReportTemplateVersion(Base):
     id = Column(Integer, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey("report_templates.id", ondelete="CASCADE"))
     version = Column(String, nullable=False)  # 语义化版本号
-    content = Column(Text, nullable=False)
+    # 内容按哈希存放在 template_contents，相同内容只存一份
+    content_hash = Column(String(64), ForeignKey("template_contents.content_hash"), nullable=False, index=True)
     changelog = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     template = relationship("ReportTemplate", back_populates="versions")
 
+    @property
+    def content(self) -> str:
+        """Decoded version content (cached per process by hash)"""
+        from app.utils.template_store import load_content
+        return load_content(self.content_hash, object_session(self))
+
+class TemplateContent(Base):
+    """
+    模板版本内容，按 SHA-256 寻址
+
+    Stored zlib-compressed, or as a compressed line delta against a full
+    (zlib) blob of the same template when that is at most half the size.
+    """
+    __tablename__ = "template_contents"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, nullable=False)
+    encoding = Column(String, nullable=False)  # zlib/delta
+    base_id = Column(Integer, ForeignKey("template_contents.id"))  # delta 的基准内容
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)  # 原文字节数
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class SharedTemplate(Base):
     """共享的报告模板"""
     __tablename__ = "shared_templates"
@@ -59,4 +83,57 @@ class SharedTemplate(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     template = relationship("ReportTemplate")
-    shared_with = relationship("User") 
\ No newline at end of file
+    shared_with = relationship("User")
+
+class RenderedReport(Base):
+    """已渲染报告在对象存储中的缓存索引"""
+    __tablename__ = "rendered_reports"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # 键中包含宠物、模板版本、记录数据版本和格式，内容变化即换键
+    object_key = Column(String, unique=True, nullable=False)
+    # 不设外键：宠物或模板删除后，缓存条目按 LRU 自然淘汰，同时清理对象存储
+    pet_id = Column(Integer, nullable=False, index=True)
+    template_id = Column(Integer, nullable=False)
+    format = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class BulkReportJob(Base):
+    """批量报告任务；状态保存在数据库中，任一 API 进程都能查询和取消"""
+    __tablename__ = "bulk_report_jobs"
+    __table_args__ = (
+        # 每个用户同时只能有一个未结束的任务（跨进程生效）
+        Index(
+            "ix_bulk_report_jobs_owner_active",
+            "owner_id",
+            unique=True,
+            postgresql_where=text("status IN ('pending', 'running')")
+        ),
+    )
+
+    id = Column(String(32), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    template_id = Column(Integer, nullable=False)
+    version_id = Column(Integer)
+    format = Column(String, nullable=False)
+    output = Column(String, nullable=False)
+    pet_ids = Column(JSON, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed, cancelled
+    total = Column(Integer, nullable=False)
+    completed = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=False, default=dict)  # 宠物 id -> 错误信息
+    objects = Column(JSON, nullable=False, default=dict)  # 宠物 id -> 报告对象键（objects 输出）
+    archive_key = Column(String)
+    error = Column(Text)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # 执行中的任务定期刷新，超时未刷新说明所在进程已退出
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from . import auth, pets, records, reports
+from . import assets, auth, pets, records, reports
 
 router = APIRouter()
 
@@ -23,4 +23,4 @@ tags_metadata = [
     },
 ]
 
-__all__ = ["auth", "pets", "records", "reports", "tags_metadata"]
+__all__ = ["assets", "auth", "pets", "records", "reports", "tags_metadata"]
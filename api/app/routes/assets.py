@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+from app.utils.report_assets import get_plotlyjs_bundle, plotlyjs_digest
+
+router = APIRouter(
+    prefix="/static",
+    include_in_schema=False,
+)
+
+# 文件名带内容哈希，可以永久缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@router.get("/plotly-{digest}.min.js")
+async def plotlyjs(digest: str, request: Request):
+    """Versioned plotly.js bundle shared by all HTML reports"""
+    if digest != plotlyjs_digest():
+        raise HTTPException(status_code=404, detail="Asset not found")
+    
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "ETag": f'"{digest}"'
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=get_plotlyjs_bundle(),
+        media_type="application/javascript",
+        headers=headers
+    )
@@ -1,16 +1,23 @@
-from typing import List
+import asyncio
+import logging
+from typing import Collection, Dict, List, Tuple
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, status
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
 from app.core.security import get_current_user
-from app.core.storage import upload_file, delete_file
+from app.core.storage import remove_objects, run_storage, upload_file
 from app.db.session import get_db
 from app.models.user import User
 from app.models.pet import Pet
 from app.schemas.pet import PetCreate, PetUpdate, PetResponse
 from app.routes.deps import validate_image
-from app.utils.file_validator import FileValidator
-from app.utils.avatar_generator import AvatarGenerator
-from urllib.parse import urlparse
+from app.utils.file_validator import FileValidator, ValidatedImage
+from app.utils.avatar_variants import CONTENT_TYPES, render_variants, variant_key, variant_keys
+from app.utils.default_avatars import default_avatar
+from app.utils.image_pool import run_image_task
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/pets",
@@ -96,7 +103,7 @@ async def update_pet(
     * **name**: New name (optional)
     * **status**: New status (optional)
     * **breed**: New breed (optional)
-    * **avatar_url**: New avatar URL (optional)
+    * **avatar_url**: New external avatar URL (optional; an uploaded avatar takes precedence)
     
     Returns updated pet information.
     
@@ -149,6 +156,55 @@ async def delete_pet(
     db.commit()
     return {"status": "success"}
 
+async def _store_avatar(
+    pet_id: int,
+    image: ValidatedImage,
+    in_use: Collection[str] = ()
+) -> Tuple[str, Dict[str, Dict[str, str]]]:
+    """
+    Upload an avatar and its size variants; returns its key and variant keys
+
+    If any upload fails, the objects that did upload are removed (except
+    keys in `in_use`, which the pet already references) and the first
+    error is raised.
+    """
+    # 键随内容变化，已签发的链接不会指向新内容
+    file_name = f"pets/{pet_id}/avatar-{image.digest[:16]}.{image.image_type}"
+    
+    # 缩略图在图片处理进程中生成
+    data = await run_in_threadpool(image.stream.read)
+    image.stream.seek(0)
+    variants = await run_image_task(render_variants, data, settings.AVATAR_VARIANT_SIZES)
+    
+    # 原图和各缩略图并发上传（同时预热链接缓存）
+    avatar_variants: Dict[str, Dict[str, str]] = {}
+    keys = [file_name]
+    uploads = [upload_file(
+        file_data=image.stream,
+        file_name=file_name,
+        content_type=image.content_type,
+        length=image.size
+    )]
+    for size, fmt, content in sorted(variants):
+        key = variant_key(file_name, size, fmt)
+        avatar_variants.setdefault(str(size), {})[fmt] = key
+        keys.append(key)
+        uploads.append(upload_file(content, key, CONTENT_TYPES[fmt]))
+    results = await asyncio.gather(*uploads, return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        # 部分上传失败：删除已上传的对象，避免遗留孤儿文件
+        uploaded = [
+            key for key, result in zip(keys, results)
+            if not isinstance(result, BaseException) and key not in in_use
+        ]
+        try:
+            await run_storage(remove_objects, uploaded)
+        except Exception as e:
+            logger.warning(f"Failed to clean up partial avatar upload: {str(e)}")
+        raise errors[0]
+    return file_name, avatar_variants
+
 @router.post("/{pet_id}/avatar", response_model=PetResponse)
 async def upload_avatar(
     pet_id: int,
@@ -167,40 +223,31 @@ async def upload_avatar(
             detail="Pet not found"
         )
     
+    old_keys = [pet.avatar_key] + variant_keys(pet.avatar_variants) if pet.avatar_key else []
     try:
         if file:
-            # 处理上传的文件
-            file_data, image_type = await FileValidator.validate_image(file)
-            file_name = f"pets/{pet_id}/avatar.{image_type}"
+            # 流式校验，通过后直接把上传的临时文件交给存储
+            image = await FileValidator.validate_image(file)
+            file_name, avatar_variants = await _store_avatar(pet_id, image, old_keys)
         else:
-            # 生成默认头像
-            file_data = AvatarGenerator.generate_default_avatar(
-                species=pet.species
-            )
-            file_name = f"pets/{pet_id}/avatar.png"
-        
-        # 删除旧头像
-        if pet.avatar_url:
-            try:
-                # 从 URL 中提取文件名
-                old_file_name = f"pets/{pet_id}/avatar.{pet.avatar_url.split('.')[-1].split('?')[0]}"
-                await delete_file(old_file_name)
-            except Exception as e:
-                logger.warning(f"Failed to delete old avatar: {str(e)}")
-                # 继续处理，不要因为删除旧文件失败而中断
-        
-        # 上传新头像
-        avatar_url = await upload_file(
-            file_data=file_data,
-            file_name=file_name,
-            content_type='image/png' if not file else f'image/{image_type}'
-        )
+            # 默认头像已预先绘制并存储，只引用共享的对象
+            avatar = await run_in_threadpool(default_avatar, pet.species)
+            file_name, avatar_variants = avatar.key, avatar.variants
         
         # 更新记录
-        pet.avatar_url = avatar_url
+        pet.avatar_key = file_name
+        pet.avatar_variants = avatar_variants
+        pet.avatar_url = None
         db.commit()
         db.refresh(pet)
         
+        # 删除旧头像（失败只记录日志）；默认头像为所有宠物共用，不删除
+        if file_name not in old_keys:
+            try:
+                await run_storage(remove_objects, [key for key in old_keys if key.startswith(f"pets/{pet_id}/")])
+            except Exception as e:
+                logger.warning(f"Failed to delete old avatar: {str(e)}")
+        
         return pet
         
     except HTTPException:
@@ -1,9 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Hashable
 from datetime import datetime, timedelta
+from app.core.cache import ResultCache
+from app.core.config import settings
 from app.core.security import get_current_user
-from app.db.session import get_db
+from app.core.singleflight import SingleFlight
+from app.db.session import detached_session, get_db
 from app.models.user import User
 from app.models.pet import Pet
 from app.models.records import (
@@ -11,11 +17,14 @@ from app.models.records import (
     VaccineRecord,
     Deworming,
     MedicalVisit,
-    DailyObservation
+    DailyObservation,
+    WeightAnomaly
 )
 from app.schemas.record import (
     WeightRecordCreate,
     WeightRecordResponse,
+    WeightAnomalyResponse,
+    PetAnomalySummary,
     VaccineRecordCreate,
     VaccineRecordResponse,
     DewormingCreate,
@@ -25,17 +34,51 @@ from app.schemas.record import (
     DailyObservationCreate,
     DailyObservationResponse
 )
-from app.utils.health_analysis import analyze_weight_trend, analyze_health_patterns
+from app.utils.health_analysis import (
+    analyze_weight_trend,
+    analyze_health_patterns,
+    get_symptom_frequencies,
+    get_symptom_cooccurrence,
+    find_pets_with_symptom
+)
+from app.utils.symptom_index import index_visit_symptoms
 from app.utils.visualization import create_weight_chart, create_health_summary_chart
 from app.utils.export import export_to_excel
 from app.utils.import_data import import_records_from_excel
 from app.utils.prediction import predict_weight_trend
+from app.utils.anomaly_detection import update_weight_baseline
 
 router = APIRouter(
     prefix="/records",
     tags=["records"],
 )
 
+# 分析结果缓存：键包含 Pet.data_version，记录变化后旧条目自然失效
+analysis_cache = ResultCache(
+    "analysis",
+    max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+    max_bytes=settings.ANALYSIS_CACHE_MAX_BYTES
+)
+# 多端同时刷新时，相同的分析请求只计算一次
+analysis_flight = SingleFlight("analysis")
+
+async def _cached_json_response(key: Hashable, compute: Callable[[], Any]) -> Response:
+    """Serve a cached JSON body, computing and storing it on a miss"""
+    body = analysis_cache.get(key)
+    cache_status = "HIT"
+    if body is None:
+        body = await analysis_flight.do(
+            key,
+            lambda: JSONResponse(jsonable_encoder(compute())).body
+        )
+        analysis_cache.set(key, body)
+        cache_status = "MISS"
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"X-Cache": cache_status}
+    )
+
 # Basic Record Management APIs
 @router.post("/weight", response_model=WeightRecordResponse)
 async def create_weight_record(
@@ -51,8 +94,11 @@ async def create_weight_record(
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
     
-    db_record = WeightRecord(**record.model_dump())
+    db_record = WeightRecord(**record.model_dump(exclude_none=True))
+    if db_record.date is None:
+        db_record.date = datetime.utcnow()
     db.add(db_record)
+    update_weight_baseline(db, db_record)
     db.commit()
     db.refresh(db_record)
     return db_record
@@ -77,10 +123,93 @@ async def create_vaccine_record(
     db.refresh(db_record)
     return db_record
 
+@router.post("/medical", response_model=MedicalVisitResponse)
+async def create_medical_visit(
+    record: MedicalVisitCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create a new medical visit record"""
+    pet = db.query(Pet).filter(
+        Pet.id == record.pet_id,
+        Pet.owner_id == current_user.id
+    ).first()
+    if not pet:
+        raise HTTPException(status_code=404, detail="Pet not found")
+    
+    db_record = MedicalVisit(**record.model_dump())
+    db.add(db_record)
+    index_visit_symptoms(db, [db_record])
+    db.commit()
+    db.refresh(db_record)
+    return db_record
+
+@router.get("/symptoms/{symptom}/pets")
+async def list_pets_with_symptom(
+    symptom: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List the user's pets that have had a given symptom"""
+    return [
+        {"pet_id": pet_id, "pet_name": pet_name, "visit_count": count}
+        for pet_id, pet_name, count in find_pets_with_symptom(db, symptom, current_user.id)
+    ]
+
+@router.get("/anomalies/recent", response_model=List[PetAnomalySummary])
+async def list_recent_anomalies(
+    days: int = Query(30, ge=1, description="Look-back window in days"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List pets with weight anomalies flagged in the look-back window"""
+    since = datetime.utcnow() - timedelta(days=days)
+    rows = db.query(
+        Pet.id,
+        Pet.name,
+        func.count(WeightAnomaly.id),
+        func.max(WeightAnomaly.date)
+    ).join(
+        WeightAnomaly, WeightAnomaly.pet_id == Pet.id
+    ).filter(
+        Pet.owner_id == current_user.id,
+        WeightAnomaly.date >= since
+    ).group_by(Pet.id, Pet.name).order_by(func.max(WeightAnomaly.date).desc()).all()
+    
+    return [
+        PetAnomalySummary(
+            pet_id=pet_id,
+            pet_name=pet_name,
+            anomaly_count=count,
+            latest_date=latest_date
+        ) for pet_id, pet_name, count, latest_date in rows
+    ]
+
+@router.get("/{pet_id}/anomalies", response_model=List[WeightAnomalyResponse])
+async def list_pet_anomalies(
+    pet_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List weight anomalies flagged for a pet, newest first"""
+    pet = db.query(Pet).filter(
+        Pet.id == pet_id,
+        Pet.owner_id == current_user.id
+    ).first()
+    if not pet:
+        raise HTTPException(status_code=404, detail="Pet not found")
+    
+    return db.query(WeightAnomaly).filter(
+        WeightAnomaly.pet_id == pet_id
+    ).order_by(WeightAnomaly.date.desc()).all()
+
 # Advanced Analysis APIs
 @router.get("/{pet_id}/analysis/weight")
 async def analyze_pet_weight(
     pet_id: int,
+    max_points: int = Query(500, ge=10, le=10000, description="Chart point budget"),
+    downsample: str = Query("lttb", pattern="^(lttb|minmax)$", description="Downsampling method (lttb/minmax)"),
+    chart_format: str = Query("columnar", pattern="^(columnar|plotly)$", description="Chart payload format (columnar/plotly)"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -92,15 +221,27 @@ async def analyze_pet_weight(
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
     
-    weight_records = db.query(WeightRecord).filter(
-        WeightRecord.pet_id == pet_id
-    ).order_by(WeightRecord.date).all()
+    def compute():
+        with detached_session(db) as session:
+            weight_records = session.query(WeightRecord).filter(
+                WeightRecord.pet_id == pet_id
+            ).order_by(WeightRecord.date).all()
+        
+        return {
+            "trend_analysis": analyze_weight_trend(weight_records),
+            "chart_data": create_weight_chart(
+                weight_records,
+                max_points=max_points,
+                downsample=downsample,
+                chart_format=chart_format
+            ),
+            "predictions": predict_weight_trend(weight_records)
+        }
     
-    return {
-        "trend_analysis": analyze_weight_trend(weight_records),
-        "chart_data": create_weight_chart(weight_records),
-        "predictions": predict_weight_trend(weight_records)
-    }
+    return await _cached_json_response(
+        ("weight", pet_id, pet.data_version, max_points, downsample, chart_format),
+        compute
+    )
 
 @router.get("/{pet_id}/analysis/health")
 async def analyze_pet_health(
@@ -116,13 +257,39 @@ async def analyze_pet_health(
     if not pet:
         raise HTTPException(status_code=404, detail="Pet not found")
     
-    medical_records = db.query(MedicalVisit).filter(
-        MedicalVisit.pet_id == pet_id
-    ).order_by(MedicalVisit.date).all()
+    def compute():
+        # 只有聚合结果从数据库返回
+        with detached_session(db) as session:
+            return {
+                "health_patterns": analyze_health_patterns(session, pet_id),
+                "summary_chart": create_health_summary_chart(
+                    get_symptom_frequencies(session, pet_id)
+                )
+            }
+    
+    return await _cached_json_response(("health", pet_id, pet.data_version), compute)
+
+@router.get("/{pet_id}/analysis/symptoms")
+async def analyze_pet_symptoms(
+    pet_id: int,
+    limit: int = Query(10, ge=1, le=100, description="Maximum number of symptom pairs"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Symptom frequencies and symptoms that tend to occur together"""
+    pet = db.query(Pet).filter(
+        Pet.id == pet_id,
+        Pet.owner_id == current_user.id
+    ).first()
+    if not pet:
+        raise HTTPException(status_code=404, detail="Pet not found")
     
     return {
-        "health_patterns": analyze_health_patterns(medical_records),
-        "summary_chart": create_health_summary_chart(medical_records)
+        "frequencies": get_symptom_frequencies(db, pet_id),
+        "cooccurrence": [
+            {"symptoms": [first, second], "count": count}
+            for first, second, count in get_symptom_cooccurrence(db, pet_id, limit)
+        ]
     }
 
 # Data Import/Export APIs
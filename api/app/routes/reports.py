@@ -1,29 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from jinja2 import TemplateError
+from minio.error import S3Error
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Optional
+import tempfile
+from datetime import datetime, timedelta
+from urllib.parse import quote
 from app.core.security import get_current_user
-from app.db.session import get_db
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.core.storage import get_presigned_url, open_object, run_storage, stream_object
+from app.db.session import detached_session, get_db
 from app.models.user import User
-from app.models.settings import ReportTemplate, ReportTemplateVersion, SharedTemplate
+from app.models.pet import Pet
+from app.models.settings import ReportTemplate, ReportTemplateVersion, SharedTemplate, TemplateContent
 from app.schemas.report import (
     ReportTemplateCreate,
     ReportTemplateUpdate,
     ReportTemplateResponse,
     TemplateVersionCreate,
     TemplateVersionResponse,
+    TemplateVersionSummary,
     ShareTemplateRequest,
-    SharedTemplateResponse
+    SharedTemplateResponse,
+    BulkReportRequest,
+    BulkReportJobResponse
 )
+from app.utils.bulk_reports import BULK_OUTPUTS, cancel_job, create_job, get_job, job_to_dict, owner_pet_ids, run_bulk_job
+from app.utils.pdf_report import write_pet_pdf_report
+from app.utils.report_data import Snapshot, load_recent_context, load_report_context, snapshot, upcoming_reminders
+from app.utils.report_cache import REPORT_FORMATS, report_object_key, lookup_report, forget_report, store_report
 from app.utils.report_generator import ReportGenerator
+from app.utils.template_catalog import (
+    default_templates,
+    invalidate_default_templates,
+    invalidate_shared_templates,
+    shared_templates,
+    shared_with
+)
+from app.utils.template_preview import preview_cache, preview_key, render_sample_preview, warm_sample_preview
+from app.utils.template_sandbox import TemplateBudgetExceeded
+from app.utils.template_store import intern_content, purge_unused_contents
 
 router = APIRouter(
     prefix="/reports/templates",
     tags=["reports"],
 )
 
+# 多端同时预览同一模板时只渲染一次
+report_flight = SingleFlight("report")
+
 @router.post("", response_model=ReportTemplateResponse)
 async def create_template(
     template: ReportTemplateCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -35,6 +66,10 @@ async def create_template(
     db.add(db_template)
     db.commit()
     db.refresh(db_template)
+    if db_template.is_default:
+        invalidate_default_templates()
+    # 预先渲染示例预览，作者随后的预览直接命中缓存（后台任务不访问请求会话，传快照）
+    background_tasks.add_task(warm_sample_preview, snapshot(db_template))
     return db_template
 
 @router.get("", response_model=List[ReportTemplateResponse])
@@ -49,19 +84,15 @@ async def list_templates(
     return templates
 
 @router.get("/default", response_model=List[ReportTemplateResponse])
-async def list_default_templates(
-    db: Session = Depends(get_db)
-):
-    """获取默认报告模板列表"""
-    templates = db.query(ReportTemplate).filter(
-        ReportTemplate.is_default == True
-    ).all()
-    return templates
+async def list_default_templates(request: Request):
+    """获取默认报告模板列表（进程内快照，支持 If-None-Match）"""
+    return default_templates().response(request)
 
 @router.put("/{template_id}", response_model=ReportTemplateResponse)
 async def update_template(
     template_id: int,
     template: ReportTemplateUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -73,11 +104,16 @@ async def update_template(
     if not db_template:
         raise HTTPException(status_code=404, detail="Template not found")
     
+    was_default = db_template.is_default
     for key, value in template.model_dump().items():
         setattr(db_template, key, value)
     
     db.commit()
     db.refresh(db_template)
+    if was_default or db_template.is_default:
+        invalidate_default_templates()
+    invalidate_shared_templates(shared_with(db, template_id))
+    background_tasks.add_task(warm_sample_preview, snapshot(db_template))
     return db_template
 
 @router.delete("/{template_id}")
@@ -94,14 +130,24 @@ async def delete_template(
     if not db_template:
         raise HTTPException(status_code=404, detail="Template not found")
     
+    was_default = db_template.is_default
+    # 删除后分享记录随之删除，先取出需要失效的用户
+    shared_user_ids = shared_with(db, template_id)
     db.delete(db_template)
     db.commit()
+    if was_default:
+        invalidate_default_templates()
+    invalidate_shared_templates(shared_user_ids)
+    # 清理不再被任何版本引用的内容
+    purge_unused_contents(db)
     return {"status": "success"}
 
 @router.get("/{template_id}/preview")
 async def preview_template(
     template_id: int,
+    request: Request,
     sample_data: bool = Query(True, description="Use sample data for preview"),
+    version_id: Optional[int] = Query(None, description="Preview a saved template version instead of the current content"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -114,39 +160,64 @@ async def preview_template(
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
+    version = None
+    if version_id is not None:
+        version = db.query(ReportTemplateVersion).filter(
+            ReportTemplateVersion.id == version_id,
+            ReportTemplateVersion.template_id == template.id
+        ).first()
+        if not version:
+            raise HTTPException(status_code=404, detail="Template version not found")
+    
+    # 渲染在线程池中执行并由合并的请求共用，只传快照，不再访问请求会话
+    template = snapshot(template)
+    version = snapshot(version, content=version.content) if version is not None else None
+    
     # 生成示例数据或使用真实数据
     if sample_data:
-        sample = generate_sample_data()
-        return ReportGenerator.generate_report(**sample, template=template)
+        # 按模板内容哈希缓存，保存模板时已预先渲染
+        key = preview_key((version or template).content, template.template_type)
+        cached = preview_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        def render_sample():
+            return render_sample_preview(template, version)
+        
+        render = render_sample
     else:
         # 使用用户最新的真实数据
         pet = db.query(Pet).filter(Pet.owner_id == current_user.id).first()
         if not pet:
             raise HTTPException(status_code=404, detail="No pet found for preview")
+        asset_base_url = str(request.base_url)
+        pet_id, data_version = pet.id, pet.data_version
         
-        # 获取最近的记录
-        weight_records = db.query(WeightRecord).filter(
-            WeightRecord.pet_id == pet.id
-        ).order_by(WeightRecord.date.desc()).limit(10).all()
-        
-        medical_records = db.query(MedicalVisit).filter(
-            MedicalVisit.pet_id == pet.id
-        ).order_by(MedicalVisit.date.desc()).limit(5).all()
+        def render_pet():
+            # 最近的记录和待办提醒
+            with detached_session(db) as session:
+                context = load_recent_context(session, pet_id, weights=10, visits=5)
+            return ReportGenerator.generate_report(
+                **context.report_kwargs(),
+                template=template,
+                version=version,
+                asset_base_url=asset_base_url
+            )
         
-        reminders = []  # 获取提醒
-        
-        return ReportGenerator.generate_report(
-            pet=pet,
-            weight_records=weight_records,
-            medical_records=medical_records,
-            reminders=reminders,
-            template=template
-        )
+        key = ("preview", template.id, template.updated_at, version_id, (pet_id, data_version))
+        render = render_pet
+    
+    try:
+        return await report_flight.do(key, render)
+    except (TemplateBudgetExceeded, TemplateError) as e:
+        # 用户模板语法错误、超出渲染限制或访问了不安全的属性
+        raise HTTPException(status_code=422, detail=f"Template render failed: {e}")
 
 @router.post("/{template_id}/versions", response_model=TemplateVersionResponse)
 async def create_template_version(
     template_id: int,
     version: TemplateVersionCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -160,20 +231,28 @@ async def create_template_version(
     
     db_version = ReportTemplateVersion(
         template_id=template_id,
-        **version.model_dump()
+        version=version.version,
+        changelog=version.changelog,
+        content_hash=intern_content(db, template_id, version.content)
     )
     db.add(db_version)
     db.commit()
     db.refresh(db_version)
+    # 后台任务在会话关闭后执行，传入快照
+    background_tasks.add_task(
+        warm_sample_preview,
+        snapshot(template),
+        snapshot(db_version, content=version.content)
+    )
     return db_version
 
-@router.get("/{template_id}/versions", response_model=List[TemplateVersionResponse])
+@router.get("/{template_id}/versions", response_model=List[TemplateVersionSummary])
 async def list_template_versions(
     template_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取模板版本历史"""
+    """获取模板版本历史（仅元数据，内容按版本单独获取）"""
     template = db.query(ReportTemplate).filter(
         ReportTemplate.id == template_id,
         ReportTemplate.owner_id == current_user.id
@@ -181,12 +260,46 @@ async def list_template_versions(
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    versions = db.query(ReportTemplateVersion).filter(
+    versions = db.query(
+        ReportTemplateVersion.id,
+        ReportTemplateVersion.template_id,
+        ReportTemplateVersion.version,
+        ReportTemplateVersion.changelog,
+        ReportTemplateVersion.content_hash,
+        TemplateContent.size,
+        ReportTemplateVersion.created_at
+    ).join(
+        TemplateContent, TemplateContent.content_hash == ReportTemplateVersion.content_hash
+    ).filter(
         ReportTemplateVersion.template_id == template_id
     ).order_by(ReportTemplateVersion.created_at.desc()).all()
     
     return versions
 
+@router.get("/{template_id}/versions/{version_id}", response_model=TemplateVersionResponse)
+async def get_template_version(
+    template_id: int,
+    version_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取模板版本（含内容）"""
+    template = db.query(ReportTemplate).filter(
+        ReportTemplate.id == template_id,
+        ReportTemplate.owner_id == current_user.id
+    ).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    
+    version = db.query(ReportTemplateVersion).filter(
+        ReportTemplateVersion.id == version_id,
+        ReportTemplateVersion.template_id == template_id
+    ).first()
+    if not version:
+        raise HTTPException(status_code=404, detail="Template version not found")
+    
+    return version
+
 @router.post("/{template_id}/share", response_model=SharedTemplateResponse)
 async def share_template(
     template_id: int,
@@ -223,19 +336,235 @@ async def share_template(
     db.add(shared)
     db.commit()
     db.refresh(shared)
+    invalidate_shared_templates([share_request.user_id])
     return shared
 
 @router.get("/shared", response_model=List[ReportTemplateResponse])
 async def list_shared_templates(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取分享给当前用户的模板列表"""
-    shared_templates = db.query(ReportTemplate).join(
-        SharedTemplate,
-        SharedTemplate.template_id == ReportTemplate.id
-    ).filter(
-        SharedTemplate.shared_with_id == current_user.id
-    ).all()
+    """获取分享给当前用户的模板列表（按用户缓存，支持 If-None-Match）"""
+    return shared_templates(db, current_user.id).response(request)
+
+def _render_report(
+    db: Session,
+    pet_id: int,
+    template: Snapshot,
+    version: Optional[Snapshot],
+    format: str,
+    asset_base_url: str
+) -> bytes:
+    report = ReportGenerator.generate_report(
+        **load_report_context(db, pet_id).report_kwargs(),
+        template=template,
+        format=format,
+        version=version,
+        asset_base_url=asset_base_url
+    )
+    return report.getvalue() if hasattr(report, "getvalue") else report
+
+def _render_pdf_report(db: Session, pet: Snapshot, object_key: str, template_id: int) -> None:
+    """
+    流式生成 PDF 并直接上传
+
+    Rows are read from DB cursors and the document is spooled to a
+    temporary file, so large reports never sit in memory as a whole.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=settings.REPORT_SPOOL_MAX_BYTES) as spool:
+        write_pet_pdf_report(db, pet, spool, upcoming_reminders(db, pet.id))
+        size = spool.tell()
+        spool.seek(0)
+        store_report(db, object_key, pet.id, template_id, "pdf", spool, size)
+
+def _report_headers(pet: Pet, format: str, cache_status: str) -> Dict[str, str]:
+    extension, _ = REPORT_FORMATS[format]
+    filename = quote(f"{pet.name}-health-report.{extension}")
+    return {
+        "Content-Disposition": f"attachment; filename*=UTF-8''{filename}",
+        "X-Cache": cache_status
+    }
+
+def _report_url(object_key: str, cache_status: str) -> dict:
+    expires = timedelta(minutes=settings.REPORT_URL_EXPIRE_MINUTES)
+    return {
+        "url": get_presigned_url(object_key, expires),
+        "expires_in": int(expires.total_seconds()),
+        "cache": cache_status
+    }
+
+@router.get("/{template_id}/render/{pet_id}")
+async def render_report(
+    template_id: int,
+    pet_id: int,
+    request: Request,
+    format: str = Query("html", description="Report format (html/markdown/excel/pdf)"),
+    version_id: Optional[int] = Query(None, description="Render a saved template version instead of the current content"),
+    delivery: str = Query("stream", description="stream: return the file; url: return a presigned download URL"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    生成宠物健康报告
+
+    Rendered reports are cached in object storage, keyed by pet, template
+    version, format and record data version; repeat downloads are served
+    from storage without re-rendering. PDF reports use a fixed layout and
+    are streamed from storage on every request.
+    """
+    if format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid report format")
+    if delivery not in ("stream", "url"):
+        raise HTTPException(status_code=400, detail="Invalid delivery mode")
+    
+    template = db.query(ReportTemplate).filter(
+        ReportTemplate.id == template_id,
+        (ReportTemplate.owner_id == current_user.id) |
+        (ReportTemplate.is_default == True)
+    ).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    
+    version = None
+    if version_id is not None:
+        version = db.query(ReportTemplateVersion).filter(
+            ReportTemplateVersion.id == version_id,
+            ReportTemplateVersion.template_id == template.id
+        ).first()
+        if not version:
+            raise HTTPException(status_code=404, detail="Template version not found")
+    
+    pet = db.query(Pet).filter(
+        Pet.id == pet_id,
+        Pet.owner_id == current_user.id
+    ).first()
+    if not pet:
+        raise HTTPException(status_code=404, detail="Pet not found")
+    
+    object_key = report_object_key(pet, template, version, format, datetime.utcnow())
+    _, content_type = REPORT_FORMATS[format]
+    # 下载的报告在 API 域名之外打开，共享图表脚本需要绝对地址
+    asset_base_url = str(request.base_url)
+    
+    cached = lookup_report(db, object_key)
+    if cached is not None:
+        if delivery == "url":
+            return _report_url(object_key, "HIT")
+        try:
+            stored = await run_storage(open_object, object_key)
+        except S3Error as e:
+            if e.code != "NoSuchKey":
+                raise
+            # 对象已被外部删除，重新生成
+            forget_report(db, cached)
+        else:
+            return StreamingResponse(
+                stream_object(stored),
+                media_type=content_type,
+                headers=_report_headers(pet, format, "HIT")
+            )
+    
+    # 渲染在线程池中执行并由合并的请求共用，只传快照，不再访问请求会话
+    template = snapshot(template)
+    version = snapshot(version, content=version.content) if version is not None else None
+    pet_snapshot = snapshot(pet)
+    
+    def render_and_store():
+        # 渲染和写入缓存记录都在独立会话中进行，首个请求断开也不影响其他等待者
+        with detached_session(db) as session:
+            if format == "pdf":
+                return _render_pdf_report(session, pet_snapshot, object_key, template.id)
+            content = _render_report(session, pet_snapshot.id, template, version, format, asset_base_url)
+            store_report(session, object_key, pet_snapshot.id, template.id, format, content)
+            return content
+    
+    try:
+        content = await report_flight.do(("render", object_key), render_and_store)
+    except (TemplateBudgetExceeded, TemplateError) as e:
+        raise HTTPException(status_code=422, detail=f"Template render failed: {e}")
+    
+    if delivery == "url":
+        return _report_url(object_key, "MISS")
+    if content is None:
+        # PDF 已上传，从存储流式返回
+        stored = await run_storage(open_object, object_key)
+        return StreamingResponse(
+            stream_object(stored),
+            media_type=content_type,
+            headers=_report_headers(pet, format, "MISS")
+        )
+    return Response(content=content, media_type=content_type, headers=_report_headers(pet, format, "MISS"))
+
+@router.post("/{template_id}/bulk", response_model=BulkReportJobResponse, status_code=202)
+async def start_bulk_report(
+    template_id: int,
+    request: BulkReportRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    为多只宠物批量生成报告
+
+    Renders every pet of the current user (or the listed `pet_ids`) across
+    the bulk worker pool, into one zip archive or one cached report object
+    per pet. Poll the job for progress.
+    """
+    if request.format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid report format")
+    if request.output not in BULK_OUTPUTS:
+        raise HTTPException(status_code=400, detail="Invalid output mode")
+    
+    template = db.query(ReportTemplate).filter(
+        ReportTemplate.id == template_id,
+        (ReportTemplate.owner_id == current_user.id) |
+        (ReportTemplate.is_default == True)
+    ).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
     
-    return shared_templates 
\ No newline at end of file
+    if request.version_id is not None:
+        version = db.query(ReportTemplateVersion).filter(
+            ReportTemplateVersion.id == request.version_id,
+            ReportTemplateVersion.template_id == template.id
+        ).first()
+        if not version:
+            raise HTTPException(status_code=404, detail="Template version not found")
+    
+    pet_ids = owner_pet_ids(db, current_user.id, request.pet_ids)
+    if not pet_ids:
+        raise HTTPException(status_code=404, detail="No pets found")
+    
+    job = create_job(db, current_user.id, template.id, request.version_id, request.format, request.output, pet_ids)
+    if job is None:
+        raise HTTPException(status_code=409, detail="A bulk report job is already running")
+    # 压缩包中的 HTML 报告离线打开，共享图表脚本使用 API 的绝对地址
+    background_tasks.add_task(run_bulk_job, job.id, str(http_request.base_url))
+    return job_to_dict(job)
+
+@router.get("/bulk/{job_id}", response_model=BulkReportJobResponse)
+async def get_bulk_report(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """查询批量任务进度；完成后 url 为压缩包的下载地址"""
+    job = get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+@router.post("/bulk/{job_id}/cancel", response_model=BulkReportJobResponse)
+async def cancel_bulk_report(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """取消批量任务，已完成的报告不会保留在压缩包中"""
+    job = get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(cancel_job(db, job))
+
@@ -1,7 +1,8 @@
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict, Field, computed_field, field_serializer, field_validator
 from app.core.config import settings
+from app.core.storage import cached_presigned_url
 
 class PetBase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -30,6 +31,24 @@ class PetResponse(PetBase):
     status: str
     birth_date: datetime | None = None
     avatar_url: str | None = None
+    avatar_key: str | None = Field(None, exclude=True)
+    avatar_variants: Dict[str, Dict[str, str]] | None = Field(None, exclude=True)
     created_at: datetime
     updated_at: datetime
     owner_id: int
+
+    @field_serializer("avatar_url")
+    def sign_avatar_url(self, value):
+        # 上传的头像优先，链接按对象键缓存
+        return cached_presigned_url(self.avatar_key) if self.avatar_key else value
+
+    @computed_field
+    @property
+    def avatar_urls(self) -> Dict[str, Dict[str, str]] | None:
+        """Avatar URLs by size (px) and format, e.g. {"48": {"webp": ..., "jpeg": ...}}"""
+        if not self.avatar_variants:
+            return None
+        return {
+            size: {fmt: cached_presigned_url(key) for fmt, key in formats.items()}
+            for size, formats in self.avatar_variants.items()
+        }
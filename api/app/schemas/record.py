@@ -19,6 +19,24 @@ class WeightRecordResponse(WeightRecordBase):
     pet_id: int
     date: datetime
 
+class WeightAnomalyResponse(BaseModel):
+    """Weight reading flagged at insert time"""
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+    pet_id: int
+    weight_record_id: int
+    date: datetime
+    weight: float
+    expected_weight: float
+    z_score: float
+
+class PetAnomalySummary(BaseModel):
+    """Pets with recent weight anomalies"""
+    pet_id: int
+    pet_name: str
+    anomaly_count: int
+    latest_date: datetime
+
 # 疫苗记录
 class VaccineRecordBase(BaseModel):
     """Base schema for vaccination records"""
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class ReportTemplateBase(BaseModel):
@@ -17,7 +17,7 @@ class ReportTemplateUpdate(ReportTemplateBase):
 
 class ReportTemplateResponse(ReportTemplateBase):
     id: int
-    owner_id: int
+    owner_id: Optional[int] = None  # 内置默认模板没有所有者
     created_at: datetime
     updated_at: datetime
 
@@ -32,6 +32,20 @@ class TemplateVersionCreate(BaseModel):
 class TemplateVersionResponse(TemplateVersionCreate):
     id: int
     template_id: int
+    content_hash: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class TemplateVersionSummary(BaseModel):
+    """版本元数据（不含内容）"""
+    id: int
+    template_id: int
+    version: str
+    changelog: Optional[str] = None
+    content_hash: str
+    size: int
     created_at: datetime
 
     class Config:
@@ -49,4 +63,28 @@ class SharedTemplateResponse(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class BulkReportRequest(BaseModel):
+    format: str = "html"
+    output: str = "zip"
+    version_id: Optional[int] = None
+    pet_ids: Optional[List[int]] = None
+
+class BulkReportJobResponse(BaseModel):
+    id: str
+    status: str
+    template_id: int
+    version_id: Optional[int] = None
+    format: str
+    output: str
+    total: int
+    completed: int
+    failed: int
+    progress: float
+    error: Optional[str] = None
+    errors: Dict[int, str]
+    objects: Dict[int, str]
+    url: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
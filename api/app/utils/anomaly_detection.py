@@ -0,0 +1,88 @@
+import math
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.records import WeightRecord, WeightTrendState, WeightAnomaly
+
+def _as_utc(value: datetime) -> datetime:
+    """Normalize to naive UTC, matching what the DateTime columns return"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def update_weight_baseline(db: Session, record: WeightRecord) -> Optional[WeightAnomaly]:
+    """
+    Fold a new weight reading into the pet's EWMA baseline
+
+    The reading is scored against the baseline before it is folded in, and
+    flagged when its z-score exceeds WEIGHT_ANOMALY_Z_THRESHOLD. Readings
+    older than the latest folded-in reading are stored but not scored, since
+    the baseline only moves forward in time.
+
+    Args:
+        db: Database session (caller commits)
+        record: Newly added weight record
+
+    Returns:
+        Optional[WeightAnomaly]: The flag that was added, if any
+    """
+    state = db.query(WeightTrendState).filter(
+        WeightTrendState.pet_id == record.pet_id
+    ).with_for_update().first()
+    record_date = _as_utc(record.date)
+
+    if not state:
+        db.add(WeightTrendState(
+            pet_id=record.pet_id,
+            mean=record.weight,
+            variance=0.0,
+            sample_count=1,
+            last_date=record_date
+        ))
+        # 批量导入时后续读数需要能查到这条基线
+        db.flush()
+        return None
+
+    if record_date < state.last_date:
+        return None
+
+    alpha = settings.WEIGHT_EWMA_ALPHA
+    diff = record.weight - state.mean
+
+    # 先用旧基线打分，再更新
+    anomaly = None
+    if state.sample_count >= settings.WEIGHT_ANOMALY_MIN_SAMPLES:
+        std = max(
+            math.sqrt(state.variance),
+            abs(state.mean) * settings.WEIGHT_ANOMALY_MIN_STD_RATIO
+        )
+        z_score = diff / std if std > 0 else 0.0
+        if abs(z_score) > settings.WEIGHT_ANOMALY_Z_THRESHOLD:
+            anomaly = WeightAnomaly(
+                pet_id=record.pet_id,
+                weight_record=record,
+                date=record_date,
+                weight=record.weight,
+                expected_weight=state.mean,
+                z_score=z_score
+            )
+            db.add(anomaly)
+
+    # 增量 EWMA 均值与方差
+    increment = alpha * diff
+    state.mean = state.mean + increment
+    state.variance = (1 - alpha) * (state.variance + diff * increment)
+    state.sample_count += 1
+    state.last_date = record_date
+
+    return anomaly
+
+def update_weight_baselines(db: Session, records: Iterable[WeightRecord]) -> List[WeightAnomaly]:
+    """Fold a batch of readings (e.g. an import) in chronological order"""
+    anomalies = []
+    for record in sorted(records, key=lambda r: (r.pet_id, _as_utc(r.date))):
+        anomaly = update_weight_baseline(db, record)
+        if anomaly is not None:
+            anomalies.append(anomaly)
+    return anomalies
@@ -1,10 +1,9 @@
 import io
-from typing import Tuple
+from typing import Optional, Tuple
 import random
 from PIL import Image, ImageDraw
-import xml.etree.ElementTree as ET
-import base64
 import math
+from app.utils.svg_path import path_mask
 
 class AvatarGenerator:
     # 预定义的颜色方案
@@ -16,7 +15,7 @@ class AvatarGenerator:
         ('#D4A5A5', '#FFFFFF'),  # 粉色背景，白色图标
     ]
     
-    # Font Awesome SVG 路径数据
+    # Font Awesome SVG 路径数据（由 svg_path 栅格化，按包围盒缩放）
     ANIMAL_ICONS = {
         'dog': 'M576 840c-35.3 0-64-28.7-64-64s28.7-64 64-64s64 28.7 64 64s-28.7 64-64 64zm160-128c-35.3 0-64-28.7-64-64s28.7-64 64-64s64 28.7 64 64s-28.7 64-64 64zm160-128c-35.3 0-64-28.7-64-64s28.7-64 64-64s64 28.7 64 64s-28.7 64-64 64z',
         'cat': 'M320 192h17.1c22.1 38.3 63.5 64 110.9 64s88.8-25.7 110.9-64H576c35.3 0 64-28.7 64-64V64c0-35.3-28.7-64-64-64H320c-35.3 0-64 28.7-64 64v64c0 35.3 28.7 64 64 64zM44.1 224a384 384 0 0 0 791.8 0H44.1z',
@@ -94,51 +93,30 @@ class AvatarGenerator:
     def generate_default_avatar(
         cls,
         size: Tuple[int, int] = (200, 200),
-        species: str = None
+        species: str = None,
+        scheme: Optional[int] = None
     ) -> bytes:
         """
         Generate a default avatar
+
+        `scheme` indexes COLORS; None picks one at random.
         """
-        # 创建新图片
-        img = Image.new('RGB', size)
-        draw = ImageDraw.Draw(img)
-        
-        # 随机选择颜色方案
-        bg_color, icon_color = random.choice(cls.COLORS)
-        
-        # 填充背景
-        draw.rectangle([0, 0, size[0], size[1]], fill=bg_color)
-        
+        # 未指定时随机选择颜色方案
+        bg_color, icon_color = random.choice(cls.COLORS) if scheme is None else cls.COLORS[scheme]
+        img = Image.new('RGB', size, bg_color)
+
+        icon_size = min(size) // 2
         try:
-            # 尝试使用 SVG 路径
             path_data = cls.ANIMAL_ICONS.get(species.lower() if species else None, cls.ANIMAL_ICONS['paw'])
-            
-            # 创建 SVG
-            svg = ET.Element('svg')
-            svg.set('width', str(size[0]))
-            svg.set('height', str(size[1]))
-            svg.set('viewBox', '0 0 512 512')
-            
-            path = ET.SubElement(svg, 'path')
-            path.set('d', path_data)
-            path.set('fill', icon_color)
-            
-            # 转换并绘制
-            svg_str = ET.tostring(svg)
-            img_data = f"data:image/svg+xml;base64,{base64.b64encode(svg_str).decode()}"
-            
-            with Image.open(io.BytesIO(base64.b64decode(img_data.split(',')[1]))) as icon:
-                icon_size = min(size) // 2
-                icon = icon.resize((icon_size, icon_size))
-                x = (size[0] - icon_size) // 2
-                y = (size[1] - icon_size) // 2
-                img.paste(icon, (x, y), icon)
-                
-        except Exception:
-            # 如果 SVG 转换失败，使用备选图标
-            cls.draw_fallback_icon(draw, size, species.lower() if species else 'paw', icon_color)
-        
+            # 遮罩按 (路径, 尺寸) 缓存，合成只需一次 paste
+            mask = path_mask(path_data, icon_size)
+        except ValueError:
+            # 路径数据无法解析时使用备选图标
+            cls.draw_fallback_icon(ImageDraw.Draw(img), size, species.lower() if species else 'paw', icon_color)
+        else:
+            img.paste(icon_color, ((size[0] - icon_size) // 2, (size[1] - icon_size) // 2), mask)
+
         # 转换为字节流
         output = io.BytesIO()
         img.save(output, format='PNG', optimize=True)
-        return output.getvalue() 
\ No newline at end of file
+        return output.getvalue()
@@ -0,0 +1,56 @@
+import io
+from typing import Dict, List, Optional, Sequence, Tuple
+from PIL import Image, ImageOps
+from app.utils.image_pool import StageTimer
+
+# 各尺寸都输出 WebP，另附一份兼容格式：有透明通道用 PNG，否则 JPEG
+CONTENT_TYPES = {"webp": "image/webp", "png": "image/png", "jpeg": "image/jpeg"}
+
+def variant_key(avatar_key: str, size: int, fmt: str) -> str:
+    """
+    Object key of one variant, derived from the original's key
+
+    pets/1/avatar-<hash>.jpg -> pets/1/avatar-<hash>/96.webp
+    """
+    return f"{avatar_key.rsplit('.', 1)[0]}/{size}.{fmt}"
+
+def variant_keys(variants: Optional[Dict[str, Dict[str, str]]]) -> List[str]:
+    """Every object key in a Pet.avatar_variants map"""
+    return [key for formats in (variants or {}).values() for key in formats.values()]
+
+def render_variants(timer: StageTimer, data: bytes, sizes: Sequence[int]) -> List[Tuple[int, str, bytes]]:
+    """
+    生成各尺寸的方形头像（在图片处理子进程中执行）
+
+    The image is decoded once (JPEG at a reduced DCT scale), centre-cropped
+    to a square and scaled down from the largest size to the smallest,
+    each step starting from the previous one.
+
+    Returns:
+        List[Tuple[int, str, bytes]]: (size, format, encoded bytes) per variant
+    """
+    sizes = sorted(sizes, reverse=True)
+    with timer.stage("decode"):
+        img = Image.open(io.BytesIO(data))
+        # JPEG 直接按缩小的比例解码，只保留略大于最大尺寸的像素
+        img.draft("RGB", (sizes[0] * 2, sizes[0] * 2))
+        img = ImageOps.exif_transpose(img)
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+    fallback = "png" if has_alpha else "jpeg"
+
+    variants = []
+    for size in sizes:
+        with timer.stage("resize"):
+            img = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+        with timer.stage("encode"):
+            output = io.BytesIO()
+            img.save(output, format="WEBP", quality=80, method=4)
+            variants.append((size, "webp", output.getvalue()))
+            output = io.BytesIO()
+            if fallback == "png":
+                img.save(output, format="PNG", optimize=True)
+            else:
+                img.save(output, format="JPEG", quality=85, optimize=True, progressive=True)
+            variants.append((size, fallback, output.getvalue()))
+    return variants
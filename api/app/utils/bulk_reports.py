@@ -0,0 +1,345 @@
+import logging
+import multiprocessing
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.storage import get_presigned_url, put_object, remove_objects
+from app.db.session import SessionLocal
+from app.models.pet import Pet
+from app.models.settings import BulkReportJob, ReportTemplate, ReportTemplateVersion
+from app.utils.report_cache import REPORT_FORMATS, report_object_key, store_report
+from app.utils.report_data import ReportContext, load_report_contexts, snapshot
+
+logger = logging.getLogger(__name__)
+
+# 输出方式：zip 打包为一个压缩包；objects 每只宠物一个对象（写入报告缓存）
+BULK_OUTPUTS = ("zip", "objects")
+
+# 已压缩的格式在压缩包中直接存储
+_STORED_FORMATS = ("excel", "pdf")
+
+_ACTIVE_STATUSES = ("pending", "running")
+
+def job_to_dict(job: BulkReportJob) -> Dict[str, Any]:
+    """Response body of a job; `url` is set once a zip archive is ready"""
+    url = None
+    if job.status == "completed" and job.archive_key is not None:
+        url = get_presigned_url(job.archive_key, timedelta(minutes=settings.BULK_REPORT_JOB_TTL_MINUTES))
+    errors = job.errors or {}
+    return {
+        "id": job.id,
+        "status": job.status,
+        "template_id": job.template_id,
+        "version_id": job.version_id,
+        "format": job.format,
+        "output": job.output,
+        "total": job.total,
+        "completed": job.completed,
+        "failed": len(errors),
+        "progress": round((job.completed + len(errors)) / job.total, 4) if job.total else 1.0,
+        "error": job.error,
+        "errors": errors,
+        "objects": job.objects or {},
+        "url": url,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
+
+def _fail_stale_jobs(db: Session) -> None:
+    """Mark unfinished jobs whose process stopped updating them as failed"""
+    now = datetime.utcnow()
+    db.query(BulkReportJob).filter(
+        BulkReportJob.status.in_(_ACTIVE_STATUSES),
+        BulkReportJob.updated_at < now - timedelta(seconds=settings.BULK_REPORT_STALE_SECONDS)
+    ).update({
+        "status": "failed",
+        "error": "Job was interrupted",
+        "finished_at": now
+    }, synchronize_session=False)
+    db.commit()
+
+def _prune_jobs(db: Session) -> None:
+    """Delete finished jobs past their TTL and their archives"""
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.BULK_REPORT_JOB_TTL_MINUTES)
+    expired = db.query(BulkReportJob.id, BulkReportJob.archive_key).filter(
+        BulkReportJob.finished_at < cutoff
+    ).all()
+    if not expired:
+        return
+    db.query(BulkReportJob).filter(
+        BulkReportJob.id.in_([row.id for row in expired])
+    ).delete(synchronize_session=False)
+    db.commit()
+    remove_objects([row.archive_key for row in expired if row.archive_key])
+
+def create_job(
+    db: Session,
+    owner_id: int,
+    template_id: int,
+    version_id: Optional[int],
+    format: str,
+    output: str,
+    pet_ids: List[int]
+) -> Optional[BulkReportJob]:
+    """
+    登记新的批量任务
+
+    Job state lives in the database, so status and cancel requests can be
+    served by any API process; the job itself runs in the process that
+    created it.
+
+    Returns:
+        Optional[BulkReportJob]: The new job, or None if the owner already
+        has a job running
+    """
+    _fail_stale_jobs(db)
+    _prune_jobs(db)
+    job = BulkReportJob(
+        id=uuid.uuid4().hex,
+        owner_id=owner_id,
+        template_id=template_id,
+        version_id=version_id,
+        format=format,
+        output=output,
+        pet_ids=pet_ids,
+        status="pending",
+        total=len(pet_ids),
+        completed=0,
+        errors={},
+        objects={}
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # 部分唯一索引：该用户已有未结束的任务
+        db.rollback()
+        return None
+    db.refresh(job)
+    return job
+
+def get_job(db: Session, job_id: str, owner_id: int) -> Optional[BulkReportJob]:
+    _fail_stale_jobs(db)
+    return db.query(BulkReportJob).filter(
+        BulkReportJob.id == job_id,
+        BulkReportJob.owner_id == owner_id
+    ).first()
+
+def cancel_job(db: Session, job: BulkReportJob) -> BulkReportJob:
+    """Ask the job to stop; the process running it picks this up within a second"""
+    if not job.finished:
+        job.cancel_requested = True
+        db.commit()
+        db.refresh(job)
+    return job
+
+def owner_pet_ids(db: Session, owner_id: int, pet_ids: Optional[List[int]] = None) -> List[int]:
+    """Ids of the owner's pets, optionally restricted to `pet_ids`"""
+    query = db.query(Pet.id).filter(Pet.owner_id == owner_id)
+    if pet_ids is not None:
+        query = query.filter(Pet.id.in_(pet_ids))
+    return [row.id for row in query.order_by(Pet.id)]
+
+# ---- 渲染子进程 ----
+
+def _init_worker() -> None:
+    # 子进程内直接在沙箱中限时渲染，不再嵌套模板渲染进程池
+    settings.TEMPLATE_RENDER_WORKERS = 0
+
+def _render_in_worker(
+    template: SimpleNamespace,
+    version: Optional[SimpleNamespace],
+    format: str,
+    context: ReportContext,
+    asset_base_url: Optional[str]
+) -> bytes:
+    from app.utils.report_generator import ReportGenerator
+
+    report = ReportGenerator.generate_report(
+        **context.report_kwargs(),
+        template=template,
+        format=format,
+        version=version,
+        asset_base_url=asset_base_url
+    )
+    return report.getvalue() if hasattr(report, "getvalue") else report
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.BULK_REPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return _pool
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_bulk_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# ---- 任务执行 ----
+
+def _archive_name(pet: SimpleNamespace, format: str) -> str:
+    extension, _ = REPORT_FORMATS[format]
+    name = "".join(c if c.isalnum() or c in "-_" else "_" for c in pet.name)
+    return f"{pet.id}-{name}.{extension}"
+
+def run_bulk_job(job_id: str, asset_base_url: Optional[str] = None) -> None:
+    """
+    执行批量任务（后台任务，阻塞直到完成或取消）
+
+    `asset_base_url` is the API address shared-mode charts load plotly.js
+    from, taken from the request that started the job.
+
+    Report contexts are loaded BULK_REPORT_BATCH_SIZE pets at a time in a
+    fixed number of queries and rendered across the bulk worker pool. A
+    failing pet is recorded in `errors` and the job moves on. Progress is
+    written to the job row about once a second; the write doubles as the
+    heartbeat and reloads the cancel flag set by other processes.
+    """
+    # 任务状态单独一个会话：数据会话每批 expunge_all
+    state = SessionLocal()
+    job = state.get(BulkReportJob, job_id)
+    if job is None:
+        state.close()
+        return
+    db = SessionLocal()
+    pool = None
+    spool = None
+    archive = None
+    completed = 0
+    errors: Dict[str, str] = {}
+    objects: Dict[str, str] = {}
+    last_saved = time.monotonic()
+
+    def save(**values) -> None:
+        nonlocal last_saved
+        job.completed = completed
+        job.errors = dict(errors)
+        job.objects = dict(objects)
+        job.updated_at = datetime.utcnow()
+        for key, value in values.items():
+            setattr(job, key, value)
+        # 提交后属性过期，下次读取 cancel_requested 时重新加载
+        state.commit()
+        last_saved = time.monotonic()
+
+    try:
+        save(status="running")
+        template = db.query(ReportTemplate).filter(ReportTemplate.id == job.template_id).first()
+        version = None
+        if job.version_id is not None:
+            version = db.query(ReportTemplateVersion).filter(
+                ReportTemplateVersion.id == job.version_id
+            ).first()
+        if template is None or (job.version_id is not None and version is None):
+            save(status="failed", error="Template not found")
+            return
+        template = snapshot(template)
+        version = snapshot(version, content=version.content) if version is not None else None
+
+        if job.output == "zip":
+            spool = tempfile.SpooledTemporaryFile(max_size=settings.REPORT_SPOOL_MAX_BYTES)
+            compression = zipfile.ZIP_STORED if job.format in _STORED_FORMATS else zipfile.ZIP_DEFLATED
+            archive = zipfile.ZipFile(spool, "w", compression=compression)
+
+        pool = _get_pool()
+        batch_size = settings.BULK_REPORT_BATCH_SIZE
+        job_pet_ids = list(job.pet_ids)
+        batches = (job_pet_ids[start:start + batch_size] for start in range(0, len(job_pet_ids), batch_size))
+        pending: Dict[Future, SimpleNamespace] = {}
+        more = True
+        while not job.cancel_requested and (pending or more):
+            if time.monotonic() - last_saved >= 1:
+                save()
+            # 在途任务快用完时加载下一批，批次之间渲染进程不空闲
+            if more and len(pending) <= settings.BULK_REPORT_WORKERS:
+                pet_ids = next(batches, None)
+                if pet_ids is None:
+                    more = False
+                    continue
+                contexts = load_report_contexts(db, pet_ids)
+                loaded = {context.pet.id for context in contexts}
+                for pet_id in pet_ids:
+                    if pet_id not in loaded:
+                        errors[str(pet_id)] = "Pet not found"
+                for context in contexts:
+                    pending[pool.submit(_render_in_worker, template, version, job.format, context, asset_base_url)] = context.pet
+                # 本批的 ORM 对象已转为快照
+                db.expunge_all()
+                continue
+
+            done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+            for future in done:
+                pet = pending.pop(future)
+                try:
+                    content = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    errors[str(pet.id)] = str(e) or e.__class__.__name__
+                    continue
+                if archive is not None:
+                    archive.writestr(_archive_name(pet, job.format), content)
+                else:
+                    object_key = report_object_key(pet, template, version, job.format, datetime.utcnow())
+                    store_report(db, object_key, pet.id, template.id, job.format, content)
+                    objects[str(pet.id)] = object_key
+                completed += 1
+
+        if job.cancel_requested:
+            # 已在子进程中执行的渲染会跑完，结果丢弃
+            for future in pending:
+                future.cancel()
+            save(status="cancelled", finished_at=datetime.utcnow())
+            return
+        archive_key = None
+        if archive is not None:
+            archive.close()
+            archive = None
+            size = spool.tell()
+            spool.seek(0)
+            archive_key = f"bulk/{job.owner_id}/{job.id}.zip"
+            put_object(spool, archive_key, "application/zip", size)
+        save(status="completed", archive_key=archive_key, finished_at=datetime.utcnow())
+    except BrokenProcessPool:
+        logger.error(f"Bulk report job {job_id} lost a worker process")
+        _discard_pool(pool)
+        state.rollback()
+        save(status="failed", error="Report worker crashed", finished_at=datetime.utcnow())
+    except Exception as e:
+        logger.exception(f"Bulk report job {job_id} failed")
+        state.rollback()
+        save(status="failed", error=str(e), finished_at=datetime.utcnow())
+    finally:
+        if archive is not None:
+            archive.close()
+        if spool is not None:
+            spool.close()
+        db.close()
+        state.close()
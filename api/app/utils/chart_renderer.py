@@ -0,0 +1,344 @@
+import io
+import math
+from datetime import datetime, timezone
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from app.core.cache import ResultCache
+from app.utils.visualization import weight_frame, lttb_indices
+
+# 与 Plotly 默认配色一致，静态图和交互图外观相同
+PALETTE = [
+    "#636EFA", "#EF553B", "#00CC96", "#AB63FA", "#FFA15A",
+    "#19D3F3", "#FF6692", "#B6E880", "#FF97FF", "#FECB52",
+]
+AXIS_COLOR = "#444444"
+GRID_COLOR = "#E5E5E5"
+FONT_FAMILY = "Arial, sans-serif"
+CHART_FORMATS = ("svg", "png")
+
+# 按 (图表, 格式, 尺寸, 宠物+数据版本, 数据摘要) 缓存渲染结果，HTML/PDF/Excel 共用
+chart_cache = ResultCache("charts", max_entries=256, max_bytes=32 * 1024 * 1024)
+
+class DisplayList:
+    """Backend-neutral drawing primitives in pixel coordinates"""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.items: List[tuple] = []
+
+    def line(self, points: Sequence[Tuple[float, float]], color: str, width: float = 1, dash: bool = False):
+        if len(points) > 1:
+            self.items.append(("line", tuple(points), color, width, dash))
+
+    def circle(self, x: float, y: float, r: float, color: str):
+        self.items.append(("circle", x, y, r, color))
+
+    def rect(self, x0: float, y0: float, x1: float, y1: float, color: str):
+        self.items.append(("rect", x0, y0, x1, y1, color))
+
+    def wedge(self, cx: float, cy: float, r: float, start: float, end: float, color: str):
+        """Pie slice, angles in degrees clockwise from 12 o'clock"""
+        self.items.append(("wedge", cx, cy, r, start, end, color))
+
+    def text(self, x: float, y: float, text: str, size: int = 11, anchor: str = "start",
+             color: str = AXIS_COLOR, bold: bool = False):
+        """Text vertically centred on y; anchor is start, middle or end"""
+        self.items.append(("text", x, y, text, size, anchor, color, bold))
+
+def _nice_ticks(low: float, high: float, count: int = 5) -> List[float]:
+    """Round tick values covering [low, high]"""
+    if high <= low:
+        high = low + 1
+    raw = (high - low) / max(count - 1, 1)
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw)
+    start = math.floor(low / step) * step
+    ticks = [round(start, 10)]
+    while ticks[-1] < high:
+        ticks.append(round(ticks[-1] + step, 10))
+    return ticks
+
+def _weight_chart(weight_records, width: int, height: int) -> DisplayList:
+    """Weight line with 7-day moving average"""
+    chart = DisplayList(width, height)
+    left, right, top, bottom = 56, width - 16, 44, height - 36
+    chart.text(width / 2, 18, "Weight Trend", size=14, anchor="middle", bold=True)
+
+    df = weight_frame(weight_records)
+    if df.empty:
+        chart.text(width / 2, height / 2, "No weight records", anchor="middle")
+        return chart
+
+    timestamps = df["date"].to_numpy(dtype="datetime64[ms]").astype(np.int64).astype(float)
+    weights = df["weight"].to_numpy()
+    moving_average = df["ma7"].to_numpy()
+    # 每个像素最多一个点
+    indices = lttb_indices(timestamps, weights, max(right - left, 3))
+    timestamps, weights, moving_average = timestamps[indices], weights[indices], moving_average[indices]
+
+    y_ticks = _nice_ticks(float(np.nanmin(weights)), float(np.nanmax(weights)))
+    y_low, y_high = y_ticks[0], y_ticks[-1]
+    x_low, x_high = timestamps[0], timestamps[-1]
+    x_span = (x_high - x_low) or 1.0
+
+    def x_of(ts):
+        return left + (ts - x_low) / x_span * (right - left)
+
+    def y_of(value):
+        return bottom - (value - y_low) / ((y_high - y_low) or 1.0) * (bottom - top)
+
+    for tick in y_ticks:
+        y = y_of(tick)
+        chart.line([(left, y), (right, y)], GRID_COLOR)
+        chart.text(left - 6, y, f"{tick:g}", anchor="end")
+    chart.line([(left, top), (left, bottom), (right, bottom)], AXIS_COLOR)
+
+    tick_count = 1 if x_high == x_low else 5
+    for i, ts in enumerate(np.linspace(x_low, x_high, tick_count)):
+        label = datetime.fromtimestamp(ts / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+        # 两端标签向内对齐，避免被裁切
+        anchor = "middle" if tick_count == 1 else "start" if i == 0 else "end" if i == tick_count - 1 else "middle"
+        chart.line([(x_of(ts), bottom), (x_of(ts), bottom + 4)], AXIS_COLOR)
+        chart.text(x_of(ts), bottom + 14, label, anchor=anchor)
+    chart.text(14, (top + bottom) / 2, "kg", anchor="middle")
+
+    xs = x_of(timestamps)
+    chart.line(list(zip(xs, y_of(weights))), PALETTE[0], width=2)
+    if len(xs) <= 120:
+        for x, y in zip(xs, y_of(weights)):
+            chart.circle(x, y, 2.5, PALETTE[0])
+    valid = ~np.isnan(moving_average)
+    chart.line(list(zip(xs[valid], y_of(moving_average[valid]))), PALETTE[1], width=2, dash=True)
+
+    # 图例
+    for i, (name, color, dash) in enumerate((("Weight", PALETTE[0], False), ("7-day MA", PALETTE[1], True))):
+        x = right - 170 + i * 90
+        chart.line([(x, 34), (x + 20, 34)], color, width=2, dash=dash)
+        chart.text(x + 26, 34, name)
+    return chart
+
+def _symptom_pie(symptom_counts: Sequence[Tuple[str, int]], width: int, height: int) -> DisplayList:
+    """Symptom distribution pie with legend"""
+    chart = DisplayList(width, height)
+    chart.text(width / 2, 18, "Symptom Distribution", size=14, anchor="middle", bold=True)
+
+    total = sum(count for _, count in symptom_counts)
+    if not total:
+        chart.text(width / 2, height / 2, "No symptoms recorded", anchor="middle")
+        return chart
+
+    radius = min(width * 0.6, height - 60) / 2
+    cx, cy = 20 + radius, 36 + (height - 36) / 2
+    angle = 0.0
+    for i, (name, count) in enumerate(symptom_counts):
+        color = PALETTE[i % len(PALETTE)]
+        sweep = 360.0 * count / total
+        chart.wedge(cx, cy, radius, angle, angle + sweep, color)
+        if sweep >= 18:
+            middle = math.radians(angle + sweep / 2)
+            chart.text(
+                cx + math.sin(middle) * radius * 0.65,
+                cy - math.cos(middle) * radius * 0.65,
+                f"{count / total:.0%}",
+                anchor="middle",
+                color="#FFFFFF"
+            )
+        angle += sweep
+
+        legend_y = 50 + i * 18
+        if legend_y < height - 10:
+            chart.rect(cx + radius + 24, legend_y - 5, cx + radius + 34, legend_y + 5, color)
+            chart.text(cx + radius + 40, legend_y, name)
+    return chart
+
+def _to_svg(chart: DisplayList) -> str:
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{chart.width}" height="{chart.height}" '
+        f'viewBox="0 0 {chart.width} {chart.height}" font-family="{FONT_FAMILY}">',
+        f'<rect width="{chart.width}" height="{chart.height}" fill="#FFFFFF"/>'
+    ]
+    for item in chart.items:
+        kind = item[0]
+        if kind == "line":
+            _, points, color, width, dash = item
+            coords = " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+            dash_attr = ' stroke-dasharray="6 4"' if dash else ""
+            parts.append(
+                f'<polyline points="{coords}" fill="none" stroke="{color}" '
+                f'stroke-width="{width}"{dash_attr}/>'
+            )
+        elif kind == "circle":
+            _, x, y, r, color = item
+            parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{r}" fill="{color}"/>')
+        elif kind == "rect":
+            _, x0, y0, x1, y1, color = item
+            parts.append(
+                f'<rect x="{x0:.1f}" y="{y0:.1f}" width="{x1 - x0:.1f}" height="{y1 - y0:.1f}" fill="{color}"/>'
+            )
+        elif kind == "wedge":
+            _, cx, cy, r, start, end, color = item
+            if end - start >= 359.999:
+                parts.append(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{r:.1f}" fill="{color}"/>')
+                continue
+            x0 = cx + r * math.sin(math.radians(start))
+            y0 = cy - r * math.cos(math.radians(start))
+            x1 = cx + r * math.sin(math.radians(end))
+            y1 = cy - r * math.cos(math.radians(end))
+            large = 1 if end - start > 180 else 0
+            parts.append(
+                f'<path d="M{cx:.1f},{cy:.1f} L{x0:.1f},{y0:.1f} A{r:.1f},{r:.1f} 0 {large} 1 '
+                f'{x1:.1f},{y1:.1f} Z" fill="{color}" stroke="#FFFFFF"/>'
+            )
+        elif kind == "text":
+            _, x, y, text, size, anchor, color, bold = item
+            weight = ' font-weight="bold"' if bold else ""
+            parts.append(
+                f'<text x="{x:.1f}" y="{y:.1f}" font-size="{size}" fill="{color}" '
+                f'text-anchor="{anchor}" dominant-baseline="central"{weight}>{escape(text)}</text>'
+            )
+    parts.append("</svg>")
+    return "".join(parts)
+
+def _dash_segments(points, scale: float, on: float = 6, off: float = 4):
+    """Split a polyline into dash segments"""
+    pattern, remaining, drawing = (on * scale, off * scale), on * scale, True
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        length = math.hypot(x1 - x0, y1 - y0)
+        position = 0.0
+        while position < length:
+            step = min(remaining, length - position)
+            if drawing:
+                t0, t1 = position / length, (position + step) / length
+                yield (x0 + (x1 - x0) * t0, y0 + (y1 - y0) * t0), (x0 + (x1 - x0) * t1, y0 + (y1 - y0) * t1)
+            position += step
+            remaining -= step
+            if remaining <= 0:
+                drawing = not drawing
+                remaining = pattern[0] if drawing else pattern[1]
+
+def _to_png(chart: DisplayList, scale: int = 2) -> bytes:
+    """Rasterize with Pillow, supersampled for smooth edges"""
+    image = Image.new("RGB", (chart.width * scale, chart.height * scale), "#FFFFFF")
+    draw = ImageDraw.Draw(image)
+    fonts: Dict[int, ImageFont.ImageFont] = {}
+
+    for item in chart.items:
+        kind = item[0]
+        if kind == "line":
+            _, points, color, width, dash = item
+            scaled = [(x * scale, y * scale) for x, y in points]
+            if dash:
+                for start, end in _dash_segments(scaled, scale):
+                    draw.line([start, end], fill=color, width=int(width * scale))
+            else:
+                draw.line(scaled, fill=color, width=int(width * scale), joint="curve")
+        elif kind == "circle":
+            _, x, y, r, color = item
+            draw.ellipse([(x - r) * scale, (y - r) * scale, (x + r) * scale, (y + r) * scale], fill=color)
+        elif kind == "rect":
+            _, x0, y0, x1, y1, color = item
+            draw.rectangle([x0 * scale, y0 * scale, x1 * scale, y1 * scale], fill=color)
+        elif kind == "wedge":
+            _, cx, cy, r, start, end, color = item
+            box = [(cx - r) * scale, (cy - r) * scale, (cx + r) * scale, (cy + r) * scale]
+            # PIL 从 3 点钟方向起算
+            draw.pieslice(box, start - 90, end - 90, fill=color, outline="#FFFFFF", width=scale)
+        elif kind == "text":
+            _, x, y, text, size, anchor, color, bold = item
+            font = fonts.get(size * scale)
+            if font is None:
+                font = fonts[size * scale] = ImageFont.load_default(size=size * scale)
+            left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+            text_width = right - left
+            offset = {"start": 0, "middle": text_width / 2, "end": text_width}[anchor]
+            position = (x * scale - offset - left, y * scale - (top + bottom) / 2)
+            draw.text(position, text, fill=color, font=font, stroke_width=1 if bold else 0, stroke_fill=color)
+
+    image = image.resize((chart.width, chart.height), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+def _render(chart: DisplayList, fmt: str):
+    if fmt == "svg":
+        return _to_svg(chart)
+    if fmt == "png":
+        return _to_png(chart)
+    raise ValueError(f"Unsupported chart format: {fmt}")
+
+def _cached(key: Optional[Hashable], build):
+    if key is None:
+        return build()
+    result = chart_cache.get(key)
+    if result is None:
+        result = build()
+        chart_cache.set(key, result)
+    return result
+
+def _series_digest(weight_records) -> Tuple[int, int]:
+    """Count and hash of the (date, weight) pairs actually drawn"""
+    pairs = tuple((r.date, r.weight) for r in weight_records)
+    return len(pairs), hash(pairs)
+
+def render_weight_chart(
+    weight_records,
+    fmt: str = "svg",
+    size: Tuple[int, int] = (800, 360),
+    cache_key: Optional[Hashable] = None
+):
+    """
+    Render the weight trend chart without a browser
+
+    Args:
+        weight_records: Weight records
+        fmt: "svg" (str) or "png" (bytes)
+        size: Width and height in pixels
+        cache_key: Identity of the pet data, e.g. (pet_id, data_version); None disables caching
+
+    Returns:
+        Union[str, bytes]: SVG markup or PNG bytes
+    """
+    # 同一宠物的调用方传入的记录范围不同（预览只取最近 10 条），键中加入数据摘要
+    key = ("weight", fmt, size, cache_key, _series_digest(weight_records)) if cache_key is not None else None
+    return _cached(key, lambda: _render(_weight_chart(weight_records, *size), fmt))
+
+def render_symptom_chart(
+    symptom_counts: Sequence[Tuple[str, int]],
+    fmt: str = "svg",
+    size: Tuple[int, int] = (640, 320),
+    cache_key: Optional[Hashable] = None
+):
+    """Render the symptom distribution pie; see render_weight_chart"""
+    key = ("symptoms", fmt, size, cache_key, tuple(symptom_counts)) if cache_key is not None else None
+    return _cached(key, lambda: _render(_symptom_pie(symptom_counts, *size), fmt))
+
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+def render_weight_sparkline(weight_records, width: int = 40) -> str:
+    """
+    Text stand-in for the weight chart in Markdown reports
+
+    One block character per point (bucket averages when there are more
+    than `width` records), followed by the range and the latest weight.
+    """
+    if not weight_records:
+        return "No weight records."
+    weights = [r.weight for r in weight_records]
+    if len(weights) > width:
+        step = len(weights) / width
+        weights = [
+            sum(bucket) / len(bucket)
+            for bucket in (weights[int(i * step):int((i + 1) * step)] for i in range(width))
+        ]
+    low, high = min(weights), max(weights)
+    span = (high - low) or 1.0
+    top = len(SPARK_BLOCKS) - 1
+    spark = "".join(SPARK_BLOCKS[round((w - low) / span * top)] for w in weights)
+    latest = weight_records[-1]
+    return (
+        f"`{spark}` {min(r.weight for r in weight_records):.1f}–{max(r.weight for r in weight_records):.1f}kg, "
+        f"latest {latest.weight:.1f}kg ({latest.date.strftime('%Y-%m-%d')})"
+    )
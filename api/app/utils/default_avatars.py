@@ -0,0 +1,72 @@
+import hashlib
+import logging
+import random
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.storage import object_exists, put_object
+from app.utils.avatar_generator import AvatarGenerator
+from app.utils.avatar_variants import CONTENT_TYPES, render_variants, variant_key
+from app.utils.image_pool import StageTimer
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class DefaultAvatar:
+    """A stored default avatar, shared by every pet that uses it"""
+
+    key: str
+    variants: Dict[str, Dict[str, str]]
+
+# (图标, 颜色方案) -> DefaultAvatar
+_avatars: Optional[Dict[Tuple[str, int], DefaultAvatar]] = None
+_avatars_lock = threading.Lock()
+
+def _icon(species: Optional[str]) -> str:
+    species = species.lower() if species else None
+    return species if species in AvatarGenerator.ANIMAL_ICONS else "paw"
+
+def _store(icon: str, scheme: int) -> DefaultAvatar:
+    content = AvatarGenerator.generate_default_avatar(species=icon, scheme=scheme)
+    # 按内容寻址：绘制结果不变时键不变，各进程、各次启动共用同一份对象
+    key = f"defaults/avatar-{hashlib.sha256(content).hexdigest()[:16]}.png"
+    variants: Dict[str, Dict[str, str]] = {}
+    renders = sorted(render_variants(StageTimer(), content, settings.AVATAR_VARIANT_SIZES))
+    for size, fmt, _ in renders:
+        variants.setdefault(str(size), {})[fmt] = variant_key(key, size, fmt)
+    if not object_exists(key):
+        # 原图最后上传，原图存在即表示缩略图齐全
+        for size, fmt, data in renders:
+            put_object(data, variant_key(key, size, fmt), CONTENT_TYPES[fmt])
+        put_object(content, key, "image/png")
+    return DefaultAvatar(key=key, variants=variants)
+
+def load_default_avatars() -> Dict[Tuple[str, int], DefaultAvatar]:
+    """
+    绘制并存储全部默认头像（阻塞，首次使用前执行一次）
+
+    There are only len(ANIMAL_ICONS) x len(COLORS) of them; each is
+    uploaded once under a content-hash key unless already in storage.
+    """
+    global _avatars
+    with _avatars_lock:
+        if _avatars is None:
+            _avatars = {
+                (icon, scheme): _store(icon, scheme)
+                for icon in AvatarGenerator.ANIMAL_ICONS
+                for scheme in range(len(AvatarGenerator.COLORS))
+            }
+        return _avatars
+
+def warm_default_avatars() -> None:
+    """Load the default avatars at startup; failures are retried on first use"""
+    try:
+        load_default_avatars()
+    except Exception as e:
+        logger.warning(f"Failed to prepare default avatars: {str(e)}")
+
+def default_avatar(species: Optional[str]) -> DefaultAvatar:
+    """A default avatar for `species` with a random color scheme"""
+    avatars = _avatars if _avatars is not None else load_default_avatars()
+    return avatars[(_icon(species), random.randrange(len(AvatarGenerator.COLORS)))]
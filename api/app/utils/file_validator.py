@@ -1,8 +1,68 @@
 from fastapi import HTTPException, status, UploadFile
-import imghdr
-from typing import Tuple
+import hashlib
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Tuple
 from PIL import Image, UnidentifiedImageError
 import io
+from app.utils.image_pool import StageTimer, run_image_task
+
+@dataclass
+class ValidatedImage:
+    """An accepted image, ready to be streamed to storage"""
+
+    stream: BinaryIO
+    size: int
+    image_type: str
+    digest: str  # 内容的 sha256
+
+    @property
+    def content_type(self) -> str:
+        return FileValidator.ALLOWED_IMAGE_TYPES[self.image_type]
+
+    @classmethod
+    def from_bytes(cls, content: bytes, image_type: str) -> "ValidatedImage":
+        return cls(
+            stream=io.BytesIO(content),
+            size=len(content),
+            image_type=image_type,
+            digest=hashlib.sha256(content).hexdigest()
+        )
+
+def resize_image(timer: StageTimer, data: bytes, image_type: str, max_size: Tuple[int, int]) -> Tuple[bytes, str]:
+    """
+    缩小图片（在图片处理子进程中执行）
+
+    Returns:
+        Tuple[bytes, str]: Encoded image and its type
+    """
+    with timer.stage("decode"):
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    
+    with timer.stage("resize"):
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    
+    with timer.stage("encode"):
+        output = io.BytesIO()
+        
+        # 保持原始格式，除非是不常见的格式
+        save_format = image_type if image_type in ['jpeg', 'png', 'webp'] else 'jpeg'
+        if save_format == 'jpeg' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        
+        # 根据格式设置保存参数
+        save_params = {}
+        if save_format == 'jpeg':
+            save_params['quality'] = 85
+            save_params['optimize'] = True
+        elif save_format == 'png':
+            save_params['optimize'] = True
+        elif save_format == 'webp':
+            save_params['quality'] = 85
+            save_params['method'] = 6
+        
+        img.save(output, format=save_format, **save_params)
+    return output.getvalue(), save_format
 
 class FileValidator:
     # 允许的图片格式及其对应的 MIME 类型
@@ -27,16 +87,100 @@ class FileValidator:
     MAX_IMAGE_SIZE = (2000, 2000)
     RESIZE_THRESHOLD = (1000, 1000)
 
+    # 流式读取的块大小；文件头必须在前 HEADER_LIMIT 字节内可识别
+    CHUNK_SIZE = 64 * 1024
+    HEADER_LIMIT = 256 * 1024
+
+    @classmethod
+    def _too_large(cls, size: int) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                f"File size ({size / 1024 / 1024:.1f}MB) exceeds the limit of "
+                f"{cls.MAX_FILE_SIZE / 1024 / 1024:.0f}MB"
+            )
+        )
+
+    @classmethod
+    def _check_header(cls, image_type: str, size: Tuple[int, int]) -> None:
+        """Check format and dimensions from the parsed header"""
+        if image_type not in cls.ALLOWED_IMAGE_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Unsupported image format: {image_type}. "
+                    f"Supported formats are: {', '.join(cls.ALLOWED_IMAGE_TYPES.keys())}"
+                )
+            )
+        
+        # 检查图片尺寸
+        width, height = size
+        
+        if width < cls.MIN_IMAGE_SIZE[0] or height < cls.MIN_IMAGE_SIZE[1]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Image is too small ({width}x{height}). "
+                    f"Minimum size is {cls.MIN_IMAGE_SIZE[0]}x{cls.MIN_IMAGE_SIZE[1]} pixels"
+                )
+            )
+        
+        if width > cls.MAX_IMAGE_SIZE[0] or height > cls.MAX_IMAGE_SIZE[1]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Image is too large ({width}x{height}). "
+                    f"Maximum size is {cls.MAX_IMAGE_SIZE[0]}x{cls.MAX_IMAGE_SIZE[1]} pixels"
+                )
+            )
+        return image_type
+
+    @staticmethod
+    def _webp_size(head: bytes) -> Optional[Tuple[int, int]]:
+        """Canvas size from a WebP header (PIL needs the whole file to open WebP)"""
+        if len(head) < 30 or head[:4] != b"RIFF" or head[8:12] != b"WEBP":
+            return None
+        chunk = head[12:16]
+        if chunk == b"VP8X":
+            return 1 + int.from_bytes(head[24:27], "little"), 1 + int.from_bytes(head[27:30], "little")
+        if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+            return int.from_bytes(head[26:28], "little") & 0x3FFF, int.from_bytes(head[28:30], "little") & 0x3FFF
+        if chunk == b"VP8L" and head[20] == 0x2F:
+            bits = int.from_bytes(head[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        return None
+
+    @classmethod
+    def _sniff(cls, head: bytes) -> Optional[Tuple[str, Tuple[int, int]]]:
+        """Image type and size from the first bytes, None if more data is needed"""
+        size = cls._webp_size(head)
+        if size is not None:
+            return "webp", size
+        try:
+            # Image.open 只解析文件头，不解码像素
+            with Image.open(io.BytesIO(head)) as img:
+                return img.format.lower(), img.size
+        except Exception:
+            return None
+
     @classmethod
-    async def validate_image(cls, file: UploadFile) -> Tuple[bytes, str]:
+    async def validate_image(cls, file: UploadFile) -> ValidatedImage:
         """
         Validate and process image file
         
+        The upload is read in CHUNK_SIZE chunks: format and dimensions are
+        checked as soon as the header has arrived and the size limit as the
+        bytes come in, so bad uploads are rejected without reading them in
+        full. Accepted uploads are hashed on the way through and returned
+        as the spooled upload file itself, not a copy in memory. Only
+        images over RESIZE_THRESHOLD are decoded, to be shrunk in the
+        image processing pool.
+        
         Args:
             file: UploadFile object
         
         Returns:
-            Tuple[bytes, str]: Processed file content and image type
+            ValidatedImage: Stream positioned at the start, with its size, type and hash
         
         Raises:
             HTTPException: With user-friendly error messages
@@ -48,91 +192,62 @@ class FileValidator:
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="No file was uploaded"
                 )
+            
+            # 请求中已给出大小时直接拒绝
+            if file.size is not None and file.size > cls.MAX_FILE_SIZE:
+                raise cls._too_large(file.size)
 
-            # 检查文件大小
+            digest = hashlib.sha256()
+            head = b""
+            header = None
             file_size = 0
-            content = bytearray()
             
-            chunk = await file.read(8192)
+            chunk = await file.read(cls.CHUNK_SIZE)
             while chunk:
-                content.extend(chunk)
                 file_size += len(chunk)
                 if file_size > cls.MAX_FILE_SIZE:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=(
-                            f"File size ({file_size / 1024 / 1024:.1f}MB) exceeds the limit of "
-                            f"{cls.MAX_FILE_SIZE / 1024 / 1024:.0f}MB"
-                        )
-                    )
-                chunk = await file.read(8192)
+                    raise cls._too_large(file_size)
+                digest.update(chunk)
+                
+                # 文件头到达后立即检查类型和尺寸
+                if header is None:
+                    head += chunk
+                    header = cls._sniff(head)
+                    if header is not None:
+                        cls._check_header(*header)
+                        head = b""
+                    elif len(head) >= cls.HEADER_LIMIT:
+                        break
+                chunk = await file.read(cls.CHUNK_SIZE)
             
-            content_bytes = bytes(content)
-            
-            # 检查文件类型
-            try:
-                with Image.open(io.BytesIO(content_bytes)) as img:
-                    image_type = img.format.lower()
-                    if image_type not in cls.ALLOWED_IMAGE_TYPES:
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=(
-                                f"Unsupported image format: {image_type}. "
-                                f"Supported formats are: {', '.join(cls.ALLOWED_IMAGE_TYPES.keys())}"
-                            )
-                        )
-                    
-                    # 检查图片尺寸
-                    width, height = img.size
-                    
-                    if width < cls.MIN_IMAGE_SIZE[0] or height < cls.MIN_IMAGE_SIZE[1]:
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=(
-                                f"Image is too small ({width}x{height}). "
-                                f"Minimum size is {cls.MIN_IMAGE_SIZE[0]}x{cls.MIN_IMAGE_SIZE[1]} pixels"
-                            )
-                        )
-                    
-                    if width > cls.MAX_IMAGE_SIZE[0] or height > cls.MAX_IMAGE_SIZE[1]:
-                        raise HTTPException(
-                            status_code=status.HTTP_400_BAD_REQUEST,
-                            detail=(
-                                f"Image is too large ({width}x{height}). "
-                                f"Maximum size is {cls.MAX_IMAGE_SIZE[0]}x{cls.MAX_IMAGE_SIZE[1]} pixels"
-                            )
-                        )
-                    
-                    # 处理大图片
-                    if width > cls.RESIZE_THRESHOLD[0] or height > cls.RESIZE_THRESHOLD[1]:
-                        img.thumbnail(cls.RESIZE_THRESHOLD, Image.Resampling.LANCZOS)
-                        output = io.BytesIO()
-                        
-                        # 保持原始格式，除非是不常见的格式
-                        save_format = image_type if image_type in ['jpeg', 'png', 'webp'] else 'jpeg'
-                        
-                        # 根据格式设置保存参数
-                        save_params = {}
-                        if save_format == 'jpeg':
-                            save_params['quality'] = 85
-                            save_params['optimize'] = True
-                        elif save_format == 'png':
-                            save_params['optimize'] = True
-                        elif save_format == 'webp':
-                            save_params['quality'] = 85
-                            save_params['method'] = 6
-                        
-                        img.save(output, format=save_format, **save_params)
-                        content_bytes = output.getvalue()
-                        image_type = save_format
-            
-            except UnidentifiedImageError:
+            if header is None:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="The uploaded file is not a valid image"
                 )
             
-            return content_bytes, image_type
+            await file.seek(0)
+            image_type, (width, height) = header
+            
+            # 处理大图片：需要完整解码，交给图片处理进程
+            if width > cls.RESIZE_THRESHOLD[0] or height > cls.RESIZE_THRESHOLD[1]:
+                try:
+                    content, image_type = await run_image_task(
+                        resize_image, await file.read(), image_type, cls.RESIZE_THRESHOLD
+                    )
+                except (UnidentifiedImageError, OSError):
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="The uploaded file is not a valid image"
+                    )
+                return ValidatedImage.from_bytes(content, image_type)
+            
+            return ValidatedImage(
+                stream=file.file,
+                size=file_size,
+                image_type=image_type,
+                digest=digest.hexdigest()
+            )
 
         except HTTPException:
             raise
@@ -140,4 +255,4 @@ class FileValidator:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Error processing image: {str(e)}"
-            ) 
\ No newline at end of file
+            )
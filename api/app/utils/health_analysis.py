@@ -1,8 +1,11 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import numpy as np
 from scipy import stats
-from app.models.records import WeightRecord, MedicalVisit
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session, aliased
+from app.models.pet import Pet
+from app.models.records import WeightRecord, MedicalVisit, Symptom, VisitSymptom
 
 def analyze_weight_trend(weight_records: List[WeightRecord]) -> Dict[str, Any]:
     """Detailed weight trend analysis"""
@@ -30,46 +33,87 @@ def analyze_weight_trend(weight_records: List[WeightRecord]) -> Dict[str, Any]:
     
     return stats_data
 
-def analyze_health_patterns(medical_records: List[MedicalVisit]) -> Dict[str, Any]:
+SEASONS = ('spring', 'summer', 'autumn', 'winter')
+
+def get_symptom_frequencies(
+    db: Session,
+    pet_id: int,
+    limit: Optional[int] = None
+) -> List[Tuple[str, int]]:
+    """Symptom frequencies for a pet, most common first"""
+    count = func.count().label('count')
+    query = db.query(Symptom.name, count).join(
+        VisitSymptom, VisitSymptom.symptom_id == Symptom.id
+    ).filter(
+        VisitSymptom.pet_id == pet_id
+    ).group_by(Symptom.id, Symptom.name).order_by(count.desc(), Symptom.name)
+    if limit is not None:
+        query = query.limit(limit)
+    return [(symptom, count) for symptom, count in query.all()]
+
+def get_symptom_cooccurrence(
+    db: Session,
+    pet_id: int,
+    limit: int = 10
+) -> List[Tuple[str, str, int]]:
+    """Pairs of symptoms reported in the same visit, most frequent first"""
+    first = aliased(VisitSymptom)
+    second = aliased(VisitSymptom)
+    first_symptom = aliased(Symptom)
+    second_symptom = aliased(Symptom)
+    count = func.count().label('count')
+    rows = db.query(first_symptom.name, second_symptom.name, count).select_from(first).join(
+        second,
+        (second.visit_id == first.visit_id) & (second.symptom_id > first.symptom_id)
+    ).join(
+        first_symptom, first_symptom.id == first.symptom_id
+    ).join(
+        second_symptom, second_symptom.id == second.symptom_id
+    ).filter(
+        first.pet_id == pet_id
+    ).group_by(
+        first_symptom.name, second_symptom.name
+    ).order_by(count.desc()).limit(limit).all()
+    return [(a, b, count) for a, b, count in rows]
+
+def find_pets_with_symptom(db: Session, symptom: str, owner_id: int) -> List[Tuple[int, str, int]]:
+    """Owner's pets that have had a symptom, with the number of visits"""
+    rows = db.query(Pet.id, Pet.name, func.count()).join(
+        VisitSymptom, VisitSymptom.pet_id == Pet.id
+    ).join(
+        Symptom, Symptom.id == VisitSymptom.symptom_id
+    ).filter(
+        Symptom.name == symptom.strip().lower(),
+        Pet.owner_id == owner_id
+    ).group_by(Pet.id, Pet.name).order_by(Pet.id).all()
+    return [(pet_id, name, count) for pet_id, name, count in rows]
+
+def get_seasonal_counts(db: Session, pet_id: int) -> Dict[str, int]:
+    """Medical visit counts per season for a pet"""
+    month = func.date_part('month', MedicalVisit.date)
+    season = case(
+        (month.between(3, 5), 'spring'),
+        (month.between(6, 8), 'summer'),
+        (month.between(9, 11), 'autumn'),
+        else_='winter'
+    ).label('season')
+    rows = db.query(season, func.count()).filter(
+        MedicalVisit.pet_id == pet_id
+    ).group_by(season).all()
+    
+    counts = dict.fromkeys(SEASONS, 0)
+    counts.update({season: count for season, count in rows})
+    return counts
+
+def analyze_health_patterns(db: Session, pet_id: int) -> Dict[str, Any]:
     """Analyze health patterns and periodic issues"""
-    if not medical_records:
+    # 季节性分析（在数据库中按月份聚合）
+    seasonal_patterns = get_seasonal_counts(db, pet_id)
+    if not any(seasonal_patterns.values()):
         return {"status": "no_data"}
     
     # 症状频率分析
-    symptom_freq = {}
-    for record in medical_records:
-        symptoms = record.symptoms.split(',')
-        for symptom in symptoms:
-            symptom = symptom.strip()
-            symptom_freq[symptom] = symptom_freq.get(symptom, 0) + 1
-    
-    # 季节性分析
-    seasonal_patterns = {
-        'spring': [],
-        'summer': [],
-        'autumn': [],
-        'winter': []
-    }
-    
-    for record in medical_records:
-        month = record.date.month
-        if 3 <= month <= 5:
-            seasonal_patterns['spring'].append(record)
-        elif 6 <= month <= 8:
-            seasonal_patterns['summer'].append(record)
-        elif 9 <= month <= 11:
-            seasonal_patterns['autumn'].append(record)
-        else:
-            seasonal_patterns['winter'].append(record)
-    
     return {
-        "common_symptoms": sorted(
-            symptom_freq.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:5],
-        "seasonal_patterns": {
-            season: len(records)
-            for season, records in seasonal_patterns.items()
-        }
-    } 
\ No newline at end of file
+        "common_symptoms": get_symptom_frequencies(db, pet_id, limit=5),
+        "seasonal_patterns": seasonal_patterns
+    }
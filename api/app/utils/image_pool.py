@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.utils.worker_pool import TaskTimeout, WorkerPool
+
+# 注意：任务函数在图片处理子进程中执行，不能依赖数据库或请求状态
+
+class StageTimer:
+    """Times named stages inside a worker; the timings travel back with the result"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+class StageStats:
+    """Latency of one processing stage over the most recent samples"""
+
+    def __init__(self, window: int = 512):
+        self.count = 0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.samples.append(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": self.count}
+
+        def percentile(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+        return {
+            "count": self.count,
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(ordered[-1] * 1000, 2)
+        }
+
+STAGES: Dict[str, StageStats] = {}
+_counters = {"submitted": 0, "rejected": 0, "timeouts": 0, "failed": 0}
+_pending = 0
+_pending_lock = threading.Lock()
+
+def _record(timings: Dict[str, float]) -> None:
+    for name, seconds in timings.items():
+        STAGES.setdefault(name, StageStats()).record(seconds)
+
+def image_stats() -> Dict[str, Any]:
+    """Snapshot of the image pool for /metrics"""
+    return {
+        "pending": _pending,
+        **_counters,
+        "stages": {name: stage.stats() for name, stage in STAGES.items()}
+    }
+
+# ---- 子进程 ----
+
+def _run_task(func: Callable, submitted: float, args: tuple) -> Tuple[Any, Dict[str, float]]:
+    # 墙钟时间可跨进程比较，用于计算排队时间
+    queued = time.time() - submitted
+    timer = StageTimer()
+    result = func(timer, *args)
+    timer.timings["queue"] = max(queued, 0.0)
+    return result, timer.timings
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> WorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool(settings.IMAGE_WORKERS)
+        return _pool
+
+def warm_image_pool() -> None:
+    """Start the image workers ahead of the first upload"""
+    _get_pool()
+
+def shutdown_image_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+async def run_image_task(func: Callable[..., Any], *args) -> Any:
+    """
+    在图片处理子进程中执行 func(timer, *args)
+
+    At most IMAGE_QUEUE_LIMIT tasks may be running or queued per API
+    process; beyond that the upload is turned away with 503 rather than
+    queued without bound. IMAGE_TASK_TIMEOUT counts from the moment a
+    worker starts the task; a task that exceeds it has only its own worker
+    killed, so uploads on the other workers carry on. Stage timings
+    recorded through `timer`, plus the queue wait, feed the latency stats
+    in /metrics.
+
+    Raises:
+        HTTPException: 503 when the queue is full or the task times out
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= settings.IMAGE_QUEUE_LIMIT:
+            _counters["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Image processing is busy, please retry",
+                headers={"Retry-After": "1"}
+            )
+        _pending += 1
+        _counters["submitted"] += 1
+
+    start = time.perf_counter()
+    try:
+        task = _get_pool().submit(_run_task, func, time.time(), args)
+        # 等待结果会阻塞，放到线程池
+        result, timings = await run_in_threadpool(task.result, settings.IMAGE_TASK_TIMEOUT)
+    except TaskTimeout:
+        _counters["timeouts"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Image processing timed out"
+        )
+    except Exception:
+        _counters["failed"] += 1
+        raise
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+    timings["total"] = time.perf_counter() - start
+    _record(timings)
+    return result
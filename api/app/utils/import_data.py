@@ -4,6 +4,8 @@ from datetime import datetime
 from fastapi import UploadFile, HTTPException
 from sqlalchemy.orm import Session
 from app.models.records import WeightRecord, MedicalVisit
+from app.utils.anomaly_detection import update_weight_baselines
+from app.utils.symptom_index import index_visit_symptoms
 
 async def import_records_from_excel(
     file: UploadFile,
@@ -18,6 +20,9 @@ async def import_records_from_excel(
         
         records_created = 0
         records_updated = 0
+        weight_records = []
+        medical_visits = []
+        anomalies = []
         
         if record_type == "weight":
             for _, row in df.iterrows():
@@ -29,9 +34,13 @@ async def import_records_from_excel(
                         notes=str(row.get('Notes', ''))
                     )
                     db.add(record)
+                    weight_records.append(record)
                     records_created += 1
                 except Exception as e:
                     continue
+            
+            # 按时间顺序更新体重基线并标记异常
+            anomalies = update_weight_baselines(db, weight_records)
                     
         elif record_type == "medical":
             for _, row in df.iterrows():
@@ -47,14 +56,18 @@ async def import_records_from_excel(
                         notes=str(row.get('Notes', ''))
                     )
                     db.add(record)
+                    medical_visits.append(record)
                     records_created += 1
                 except Exception as e:
                     continue
+            
+            index_visit_symptoms(db, medical_visits)
         
         db.commit()
         return {
             "records_created": records_created,
-            "records_updated": records_updated
+            "records_updated": records_updated,
+            "anomalies_flagged": len(anomalies)
         }
         
     except Exception as e:
@@ -1,6 +1,28 @@
+import textwrap
 from app.db.session import SessionLocal
 from app.models.settings import ReportTemplate
 
+# Markdown 中缩进的行是代码块，内容需顶格
+DEFAULT_MARKDOWN_TEMPLATE = textwrap.dedent("""
+    # {{ pet.name }}'s Health Report
+
+    Generated on: {{ generated_date }}
+
+    ## Basic Information
+
+    - Name: {{ pet.name }}
+    - Species: {{ pet.species }}
+    - Age: {{ pet_age }}
+
+    ## Weight Trend
+
+    {{ weight_chart }}
+
+    ## Health Summary
+
+    {{ health_summary }}
+    """).lstrip()
+
 def init_default_templates():
     db = SessionLocal()
     try:
@@ -39,21 +61,7 @@ def init_default_templates():
             name="Default Markdown Template",
             description="Default health report template in Markdown format",
             template_type="markdown",
-            content="""
-            # {{ pet.name }}'s Health Report
-            
-            Generated on: {{ generated_date }}
-            
-            ## Basic Information
-            
-            - Name: {{ pet.name }}
-            - Species: {{ pet.species }}
-            - Age: {{ pet_age }}
-            
-            ## Health Summary
-            
-            {{ health_summary }}
-            """,
+            content=DEFAULT_MARKDOWN_TEMPLATE,
             is_default=True
         )
         
@@ -0,0 +1,329 @@
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from app.models.pet import Pet
+from app.models.records import MedicalVisit, WeightRecord
+from app.utils.chart_renderer import render_symptom_chart, render_weight_chart
+from app.utils.health_analysis import get_symptom_frequencies
+
+# 每个表格块的行数：表格按块懒加载，块内可跨页拆分
+TABLE_CHUNK_ROWS = 40
+# 数据库游标每批读取的行数
+CURSOR_BATCH_SIZE = 500
+# 内置 CID 字体，中文症状、诊断无需额外字体文件
+CJK_FONT = "STSong-Light"
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 18 * mm
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+class FlowableStream:
+    """
+    Lazy stand-in for the flowables list consumed by DocTemplate.build
+
+    build() only touches the head of the list (index, delete, insert and
+    slice assignment for split remainders), so flowables are pulled from
+    the generator a few at a time and released once drawn.
+    """
+
+    LOOKAHEAD = 4
+
+    def __init__(self, flowables: Iterable):
+        self._source = iter(flowables)
+        self._buffer: List[Any] = []
+        self._exhausted = False
+
+    def _fill(self, count: int) -> None:
+        while not self._exhausted and len(self._buffer) < count:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                self._exhausted = True
+
+    def __len__(self) -> int:
+        # keepWithNext 只向前看已缓冲的几个
+        self._fill(self.LOOKAHEAD)
+        return len(self._buffer)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.stop is not None:
+                self._fill(index.stop)
+            return self._buffer[index]
+        self._fill(index + 1)
+        return self._buffer[index]
+
+    def __setitem__(self, index, value) -> None:
+        self._buffer[index] = value
+
+    def __delitem__(self, index) -> None:
+        del self._buffer[index]
+
+    def insert(self, index: int, value: Any) -> None:
+        self._buffer.insert(index, value)
+
+def _styles() -> Dict[str, ParagraphStyle]:
+    if CJK_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(UnicodeCIDFont(CJK_FONT))
+    base = getSampleStyleSheet()
+    return {
+        "title": base["Title"],
+        "heading": ParagraphStyle("heading", parent=base["Heading2"], keepWithNext=1),
+        "body": ParagraphStyle("body", parent=base["Normal"], fontName=CJK_FONT, fontSize=9, leading=12),
+        "cell": ParagraphStyle("cell", parent=base["Normal"], fontName=CJK_FONT, fontSize=8, leading=10),
+    }
+
+_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#F5F5F5")),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTNAME", (0, 1), (-1, -1), CJK_FONT),
+    ("FONTSIZE", (0, 0), (-1, -1), 8),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#DDDDDD")),
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+])
+
+def _text(value: Any, style: ParagraphStyle) -> Paragraph:
+    return Paragraph(escape("" if value is None else str(value)), style)
+
+def _date(value: Optional[datetime]) -> str:
+    return value.strftime("%Y-%m-%d") if value else ""
+
+def _cell(value: Any, wrap: bool, style: ParagraphStyle) -> Any:
+    # Paragraph 的解析和折行开销远高于纯文本，只用于可能折行的自由文本
+    if not value:
+        return ""
+    return _text(value, style) if wrap else str(value)
+
+def _table_chunks(
+    header: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    col_widths: Sequence[float],
+    wrap: Sequence[bool],
+    empty_text: str,
+    style: ParagraphStyle
+) -> Iterator[Table]:
+    """
+    Yield the table TABLE_CHUNK_ROWS rows at a time, header repeated on every page
+
+    Columns flagged in `wrap` hold free text and are word-wrapped.
+    """
+    rows = iter(rows)
+    emitted = False
+    while True:
+        chunk = list(islice(rows, TABLE_CHUNK_ROWS))
+        if not chunk:
+            break
+        data = [list(header)] + [
+            [_cell(value, column_wrap, style) for value, column_wrap in zip(row, wrap)]
+            for row in chunk
+        ]
+        yield Table(data, colWidths=col_widths, repeatRows=1, style=_TABLE_STYLE)
+        emitted = True
+    if not emitted:
+        yield _text(empty_text, style)
+
+def _chart(png: Optional[bytes], width: float) -> Optional[Image]:
+    if not png:
+        return None
+    image = Image(BytesIO(png))
+    scale = width / image.imageWidth
+    image.drawWidth = width
+    image.drawHeight = image.imageHeight * scale
+    return image
+
+def _flowables(
+    pet,
+    summary: Sequence[Tuple[str, Any]],
+    weight_chart: Optional[bytes],
+    symptom_chart: Optional[bytes],
+    weight_rows: Iterable[Sequence[Any]],
+    medical_rows: Iterable[Sequence[Any]],
+    reminders: Iterable[Dict],
+    styles: Dict[str, ParagraphStyle]
+) -> Iterator[Any]:
+    yield Paragraph(f"{escape(pet.name)}'s Health Report", styles["title"])
+    yield _text(f"Generated on: {datetime.utcnow():%Y-%m-%d %H:%M}", styles["body"])
+    yield Spacer(1, 6 * mm)
+
+    yield Paragraph("Summary", styles["heading"])
+    yield Table(
+        [[label, _text(value, styles["cell"])] for label, value in summary],
+        colWidths=[45 * mm, CONTENT_WIDTH - 45 * mm],
+        style=TableStyle([
+            ("FONTSIZE", (0, 0), (-1, -1), 8),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.HexColor("#DDDDDD")),
+            ("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#F5F5F5")),
+        ])
+    )
+
+    for title, png in (("Weight Trend", weight_chart), ("Symptom Distribution", symptom_chart)):
+        image = _chart(png, CONTENT_WIDTH)
+        if image is not None:
+            yield Paragraph(title, styles["heading"])
+            yield image
+
+    yield Paragraph("Upcoming Reminders", styles["heading"])
+    yield from _table_chunks(
+        ("Type", "Due Date", "Details"),
+        ((r["type"], _date(r["due_date"]), r["details"]) for r in reminders),
+        (30 * mm, 30 * mm, CONTENT_WIDTH - 60 * mm),
+        (False, False, True),
+        "No upcoming reminders.",
+        styles["cell"]
+    )
+
+    yield Paragraph("Medical Records", styles["heading"])
+    yield from _table_chunks(
+        ("Date", "Symptoms", "Diagnosis", "Treatment"),
+        ((_date(date), symptoms, diagnosis, treatment) for date, symptoms, diagnosis, treatment in medical_rows),
+        (22 * mm, (CONTENT_WIDTH - 22 * mm) / 3, (CONTENT_WIDTH - 22 * mm) / 3, (CONTENT_WIDTH - 22 * mm) / 3),
+        (False, True, True, True),
+        "No medical records.",
+        styles["cell"]
+    )
+
+    yield Paragraph("Weight Records", styles["heading"])
+    yield from _table_chunks(
+        ("Date", "Weight (kg)", "Notes"),
+        ((_date(date), f"{weight:.2f}", notes) for date, weight, notes in weight_rows),
+        (30 * mm, 25 * mm, CONTENT_WIDTH - 55 * mm),
+        (False, False, True),
+        "No weight records.",
+        styles["cell"]
+    )
+
+def _draw_page_number(canvas, doc) -> None:
+    canvas.saveState()
+    canvas.setFont("Helvetica", 8)
+    canvas.drawRightString(PAGE_WIDTH - MARGIN, MARGIN / 2, f"Page {doc.page}")
+    canvas.restoreState()
+
+def build_pdf_report(
+    output: BinaryIO,
+    pet,
+    summary: Sequence[Tuple[str, Any]],
+    weight_rows: Iterable[Sequence[Any]],
+    medical_rows: Iterable[Sequence[Any]],
+    reminders: Iterable[Dict],
+    weight_chart: Optional[bytes] = None,
+    symptom_chart: Optional[bytes] = None
+) -> int:
+    """
+    生成 PDF 报告并写入 output
+
+    Args:
+        output: Writable binary file (e.g. a SpooledTemporaryFile)
+        pet: Pet or pet-like object (name, species, ...)
+        summary: (label, value) rows of the summary table
+        weight_rows: (date, weight, notes) tuples, consumed lazily
+        medical_rows: (date, symptoms, diagnosis, treatment) tuples, consumed lazily
+        reminders: Dicts with type, due_date and details
+        weight_chart, symptom_chart: PNG images
+
+    Returns:
+        int: Number of pages written
+    """
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        leftMargin=MARGIN,
+        rightMargin=MARGIN,
+        topMargin=MARGIN,
+        bottomMargin=MARGIN,
+        title=f"{pet.name}'s Health Report",
+        # 已完成页面在写出前只保留压缩后的内容流
+        pageCompression=1
+    )
+    flowables = _flowables(pet, summary, weight_chart, symptom_chart, weight_rows, medical_rows, reminders, _styles())
+    doc.build(FlowableStream(flowables), onFirstPage=_draw_page_number, onLaterPages=_draw_page_number)
+    return doc.page
+
+def summary_rows(
+    pet,
+    age: str,
+    weight_count: int,
+    current_weight: Optional[float],
+    min_weight: Optional[float],
+    max_weight: Optional[float],
+    visit_count: int,
+    recent_visits: int
+) -> List[Tuple[str, Any]]:
+    """Rows of the summary table"""
+    return [
+        ("Name", pet.name),
+        ("Species", pet.species),
+        ("Breed", getattr(pet, "breed", None) or "-"),
+        ("Age", age),
+        ("Weight records", weight_count),
+        ("Current weight", f"{current_weight:.2f} kg" if current_weight is not None else "-"),
+        ("Weight range", f"{min_weight:.2f} - {max_weight:.2f} kg" if weight_count else "-"),
+        ("Medical visits", f"{visit_count} ({recent_visits} in the last 90 days)"),
+    ]
+
+def write_pet_pdf_report(db: Session, pet: Pet, output: BinaryIO, reminders: Iterable[Dict] = ()) -> int:
+    """
+    从数据库流式生成宠物的 PDF 报告
+
+    Records are read as plain column tuples through server-side cursors, so
+    neither the ORM identity map nor the flowable list grows with the
+    number of records.
+
+    Returns:
+        int: Number of pages written
+    """
+    from app.utils.report_generator import ReportGenerator
+
+    weight_stats = db.query(
+        func.count(WeightRecord.id),
+        func.min(WeightRecord.weight),
+        func.max(WeightRecord.weight)
+    ).filter(WeightRecord.pet_id == pet.id).one()
+    latest_weight = db.query(WeightRecord.weight).filter(
+        WeightRecord.pet_id == pet.id
+    ).order_by(WeightRecord.date.desc()).limit(1).scalar()
+    visit_count, recent_visits = db.query(
+        func.count(MedicalVisit.id),
+        func.count(MedicalVisit.id).filter(MedicalVisit.date >= datetime.utcnow() - timedelta(days=90))
+    ).filter(MedicalVisit.pet_id == pet.id).one()
+
+    summary = summary_rows(
+        pet,
+        ReportGenerator._calculate_pet_age(pet),
+        weight_stats[0],
+        latest_weight,
+        weight_stats[1],
+        weight_stats[2],
+        visit_count,
+        recent_visits
+    )
+
+    chart_key = (pet.id, pet.data_version)
+    # 图表只需要日期和体重两列
+    weight_series = db.query(WeightRecord.date, WeightRecord.weight).filter(
+        WeightRecord.pet_id == pet.id
+    ).all()
+    weight_chart = render_weight_chart(weight_series, "png", cache_key=chart_key)
+    del weight_series
+    symptom_chart = render_symptom_chart(get_symptom_frequencies(db, pet.id), "png", cache_key=chart_key)
+
+    weight_rows = db.query(WeightRecord.date, WeightRecord.weight, WeightRecord.notes).filter(
+        WeightRecord.pet_id == pet.id
+    ).order_by(WeightRecord.date).yield_per(CURSOR_BATCH_SIZE)
+    medical_rows = db.query(
+        MedicalVisit.date, MedicalVisit.symptoms, MedicalVisit.diagnosis, MedicalVisit.treatment
+    ).filter(
+        MedicalVisit.pet_id == pet.id
+    ).order_by(MedicalVisit.date.desc()).yield_per(CURSOR_BATCH_SIZE)
+
+    return build_pdf_report(output, pet, summary, weight_rows, medical_rows, reminders, weight_chart, symptom_chart)
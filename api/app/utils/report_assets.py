@@ -0,0 +1,29 @@
+import hashlib
+from functools import lru_cache
+from typing import Optional
+from plotly.offline import get_plotlyjs
+from app.core.config import settings
+
+@lru_cache(maxsize=1)
+def get_plotlyjs_bundle() -> bytes:
+    """plotly.js bundle shipped with the installed plotly package"""
+    return get_plotlyjs().encode()
+
+@lru_cache(maxsize=1)
+def plotlyjs_digest() -> str:
+    """Content hash used to version the shared plotly.js asset"""
+    return hashlib.sha256(get_plotlyjs_bundle()).hexdigest()[:16]
+
+def plotlyjs_url(base_url: Optional[str] = None) -> Optional[str]:
+    """
+    Absolute URL of the shared, long-cached plotly.js asset referenced by reports
+
+    Reports are downloaded, served from object storage or zipped, so a
+    relative path would not resolve. STATIC_ASSET_BASE_URL wins over
+    `base_url` (the API address the request came in on); None when neither
+    is known.
+    """
+    base_url = settings.STATIC_ASSET_BASE_URL or base_url
+    if not base_url:
+        return None
+    return f"{base_url.rstrip('/')}/static/plotly-{plotlyjs_digest()}.min.js"
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+from typing import BinaryIO, List, Optional, Union
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.storage import put_object, remove_objects
+from app.db.session import detached_session
+from app.models.pet import Pet
+from app.models.settings import RenderedReport, ReportTemplate, ReportTemplateVersion
+from app.utils.template_engine import version_tag
+
+# 格式 -> (扩展名, Content-Type)
+REPORT_FORMATS = {
+    "html": ("html", "text/html; charset=utf-8"),
+    "markdown": ("md", "text/markdown; charset=utf-8"),
+    "excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("pdf", "application/pdf"),
+}
+
+def report_object_key(
+    pet: Pet,
+    template: ReportTemplate,
+    version: Optional[ReportTemplateVersion],
+    format: str,
+    day: datetime
+) -> str:
+    """
+    Object key of a rendered report
+
+    Any change to the pet, its records or the template yields a new key.
+    The day is part of the key because reminders are relative to today.
+    """
+    extension, _ = REPORT_FORMATS[format]
+    template_part = f"v{version.id}" if version is not None else version_tag(template.updated_at)
+    return (
+        f"reports/{pet.id}/{template.id}/{template_part}/"
+        f"{pet.data_version}-{version_tag(pet.updated_at)}-{day:%Y%m%d}.{extension}"
+    )
+
+def lookup_report(db: Session, object_key: str) -> Optional[RenderedReport]:
+    """
+    查找缓存的报告，命中时刷新访问时间
+
+    The access time only orders eviction, so it is refreshed at most once
+    per REPORT_ACCESS_RESOLUTION_SECONDS, by a single UPDATE committed on
+    its own session; the caller's session is left untouched.
+    """
+    cached = db.query(RenderedReport).filter(RenderedReport.object_key == object_key).first()
+    if cached is None:
+        return None
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.REPORT_ACCESS_RESOLUTION_SECONDS)
+    if cached.last_accessed_at < cutoff:
+        with detached_session(db) as session:
+            session.query(RenderedReport).filter(
+                RenderedReport.object_key == object_key,
+                RenderedReport.last_accessed_at < cutoff
+            ).update({"last_accessed_at": now}, synchronize_session=False)
+            session.commit()
+    return cached
+
+def forget_report(db: Session, cached: RenderedReport) -> None:
+    """Drop an index row whose object has gone missing from storage"""
+    db.delete(cached)
+    db.commit()
+
+def store_report(
+    db: Session,
+    object_key: str,
+    pet_id: int,
+    template_id: int,
+    format: str,
+    content: Union[bytes, BinaryIO],
+    size: Optional[int] = None
+) -> None:
+    """
+    上传渲染结果并登记，超出容量时淘汰最久未访问的报告
+
+    `content` is either bytes or a file positioned at its start, in which
+    case `size` must be given.
+    """
+    _, content_type = REPORT_FORMATS[format]
+    if isinstance(content, bytes):
+        size = len(content)
+    put_object(content, object_key, content_type, size)
+
+    now = datetime.utcnow()
+    # 其他进程可能同时写入同一个键
+    statement = insert(RenderedReport).values(
+        object_key=object_key,
+        pet_id=pet_id,
+        template_id=template_id,
+        format=format,
+        content_type=content_type,
+        size=size,
+        created_at=now,
+        last_accessed_at=now
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[RenderedReport.object_key],
+        set_={"size": statement.excluded.size, "last_accessed_at": now}
+    ))
+    db.commit()
+    evict_reports(db)
+
+def evict_reports(db: Session, max_bytes: Optional[int] = None) -> List[str]:
+    """
+    按最近访问时间淘汰报告，直到总大小不超过上限
+
+    Returns:
+        List[str]: Object keys removed
+    """
+    max_bytes = settings.REPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    # 从最近访问的开始累加大小，累计超出上限的都淘汰
+    running = db.query(
+        RenderedReport.id,
+        RenderedReport.object_key,
+        func.sum(RenderedReport.size).over(
+            order_by=(RenderedReport.last_accessed_at.desc(), RenderedReport.id.desc())
+        ).label("total")
+    ).subquery()
+    stale = db.query(running.c.id, running.c.object_key).filter(running.c.total > max_bytes).all()
+    if not stale:
+        return []
+
+    db.query(RenderedReport).filter(
+        RenderedReport.id.in_([row.id for row in stale])
+    ).delete(synchronize_session=False)
+    db.commit()
+    object_keys = [row.object_key for row in stale]
+    remove_objects(object_keys)
+    return object_keys
@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+from datetime import datetime
+from operator import attrgetter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Sequence, Tuple
+from sqlalchemy.orm import Session, selectinload
+from app.models.pet import Pet
+from app.models.records import Deworming, MedicalVisit, VaccineRecord, WeightRecord
+
+class Snapshot(SimpleNamespace):
+    """Read-only, picklable copy of an ORM row's column attributes"""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+class FrozenDict(dict):
+    """Read-only dict; templates read reminders as `reminder.type` or `reminder["type"]`"""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("FrozenDict is read-only")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+def snapshot(row, **extra) -> Snapshot:
+    """Detached, read-only copy of an ORM row, plus `extra` attributes"""
+    return Snapshot(**{attr.key: getattr(row, attr.key) for attr in row.__mapper__.column_attrs}, **extra)
+
+def _vaccine_reminder(record) -> FrozenDict:
+    return FrozenDict(type="Vaccine", due_date=record.next_due_date, details=record.vaccine_name)
+
+def _deworming_reminder(record) -> FrozenDict:
+    return FrozenDict(type="Deworming", due_date=record.next_due_date, details=record.medicine_name)
+
+def _follow_up_reminder(record) -> FrozenDict:
+    return FrozenDict(type="Follow-up", due_date=record.follow_up_date, details=record.diagnosis or record.symptoms)
+
+@dataclass(frozen=True)
+class ReportContext:
+    """
+    一只宠物生成报告所需的全部数据
+
+    Records are detached snapshots sorted by date (oldest first), so the
+    context can be shared across formats, cached and pickled into worker
+    processes without touching the session again.
+    """
+
+    pet: Snapshot
+    weight_records: Tuple[Snapshot, ...]
+    medical_records: Tuple[Snapshot, ...]
+    vaccine_records: Tuple[Snapshot, ...]
+    deworming_records: Tuple[Snapshot, ...]
+    reminders: Tuple[FrozenDict, ...]
+
+    def report_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments of `ReportGenerator.generate_report`"""
+        return {
+            "pet": self.pet,
+            "weight_records": self.weight_records,
+            "medical_records": self.medical_records,
+            "reminders": self.reminders
+        }
+
+def _build_context(pet: Pet, now: datetime) -> ReportContext:
+    by_date = attrgetter("date")
+    medical_records = sorted(pet.medical_records, key=by_date)
+    vaccine_records = sorted(pet.vaccine_records, key=by_date)
+    deworming_records = sorted(pet.deworming_records, key=by_date)
+
+    # 提醒由已加载的记录得出，无需额外查询
+    reminders = [_vaccine_reminder(r) for r in vaccine_records if r.next_due_date and r.next_due_date > now]
+    reminders += [_deworming_reminder(r) for r in deworming_records if r.next_due_date and r.next_due_date > now]
+    reminders += [_follow_up_reminder(r) for r in medical_records if r.follow_up_date and r.follow_up_date > now]
+
+    return ReportContext(
+        pet=snapshot(pet),
+        weight_records=tuple(snapshot(r) for r in sorted(pet.weight_records, key=by_date)),
+        medical_records=tuple(snapshot(r) for r in medical_records),
+        vaccine_records=tuple(snapshot(r) for r in vaccine_records),
+        deworming_records=tuple(snapshot(r) for r in deworming_records),
+        reminders=tuple(sorted(reminders, key=lambda r: r["due_date"]))
+    )
+
+def load_report_contexts(db: Session, pet_ids: Sequence[int]) -> List[ReportContext]:
+    """
+    批量加载报告数据
+
+    The pets and every record type are fetched with selectinload: five
+    queries in total regardless of how many pets are in `pet_ids`.
+
+    Returns:
+        List[ReportContext]: In `pet_ids` order; ids that do not exist are skipped
+    """
+    pets = db.query(Pet).options(
+        selectinload(Pet.weight_records),
+        selectinload(Pet.medical_records),
+        selectinload(Pet.vaccine_records),
+        selectinload(Pet.deworming_records)
+    ).filter(
+        Pet.id.in_(pet_ids)
+    ).populate_existing().all()
+    now = datetime.utcnow()
+    contexts = {pet.id: _build_context(pet, now) for pet in pets}
+    return [contexts[pet_id] for pet_id in pet_ids if pet_id in contexts]
+
+def load_report_context(db: Session, pet_id: int) -> ReportContext:
+    """Report context of one pet (the caller has checked it exists)"""
+    return load_report_contexts(db, [pet_id])[0]
+
+def load_recent_context(db: Session, pet_id: int, weights: int, visits: int) -> ReportContext:
+    """
+    Report context with only the latest `weights` weight records and `visits` visits
+
+    For the template preview: the limits are applied in SQL, vaccine and
+    deworming history is left empty and reminders are queried for the
+    rows that are due. Six small queries however long the history is.
+    """
+    pet = db.query(Pet).filter(Pet.id == pet_id).one()
+    weight_records = db.query(WeightRecord).filter(
+        WeightRecord.pet_id == pet_id
+    ).order_by(WeightRecord.date.desc()).limit(weights).all()
+    medical_records = db.query(MedicalVisit).filter(
+        MedicalVisit.pet_id == pet_id
+    ).order_by(MedicalVisit.date.desc()).limit(visits).all()
+
+    return ReportContext(
+        pet=snapshot(pet),
+        # 与完整报告一致，按日期从旧到新
+        weight_records=tuple(snapshot(r) for r in reversed(weight_records)),
+        medical_records=tuple(snapshot(r) for r in reversed(medical_records)),
+        vaccine_records=(),
+        deworming_records=(),
+        reminders=tuple(upcoming_reminders(db, pet_id))
+    )
+
+def upcoming_reminders(db: Session, pet_id: int) -> List[FrozenDict]:
+    """
+    Upcoming reminders of one pet, querying only the rows that are due
+
+    For callers that stream records instead of loading a full context.
+    """
+    now = datetime.utcnow()
+    reminders = [
+        _vaccine_reminder(r) for r in db.query(VaccineRecord).filter(
+            VaccineRecord.pet_id == pet_id,
+            VaccineRecord.next_due_date > now
+        )
+    ]
+    reminders += [
+        _deworming_reminder(r) for r in db.query(Deworming).filter(
+            Deworming.pet_id == pet_id,
+            Deworming.next_due_date > now
+        )
+    ]
+    reminders += [
+        _follow_up_reminder(r) for r in db.query(MedicalVisit).filter(
+            MedicalVisit.pet_id == pet_id,
+            MedicalVisit.follow_up_date > now
+        )
+    ]
+    return sorted(reminders, key=lambda r: r["due_date"])
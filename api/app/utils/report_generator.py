@@ -1,5 +1,6 @@
-from typing import List, Dict, Any, Union, Optional
-import jinja2
+import textwrap
+from collections import Counter
+from typing import List, Dict, Any, Hashable, Tuple, Union, Optional
 import markdown
 from datetime import datetime
 from app.models.records import WeightRecord, MedicalVisit, VaccineRecord, Deworming
@@ -8,12 +9,14 @@ from io import BytesIO
 import pandas as pd
 from PIL import Image
 import base64
-from app.models.settings import ReportTemplate
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from app.models.settings import ReportTemplate, ReportTemplateVersion
+from app.core.config import settings
+from app.utils.report_assets import plotlyjs_url
+from app.utils.visualization import create_weight_figure
+from app.utils.chart_renderer import render_weight_chart, render_symptom_chart, render_weight_sparkline
+from app.utils.symptom_index import normalize_symptoms
+from app.utils.template_engine import render_report_template
+from app.utils.pdf_report import build_pdf_report, summary_rows
 
 class ReportGenerator:
     # HTML 模板
@@ -91,42 +94,63 @@ class ReportGenerator:
         medical_records: List[MedicalVisit],
         reminders: List[Dict],
         template: Optional[ReportTemplate] = None,
-        format: str = "html"
+        format: str = "html",
+        chart_mode: Optional[str] = None,
+        version: Optional[ReportTemplateVersion] = None,
+        asset_base_url: Optional[str] = None
     ) -> Union[bytes, BytesIO]:
-        """生成健康报告"""
+        """
+        生成健康报告（指定 version 时使用该模板版本的内容）
+
+        `asset_base_url` is the API address shared-mode charts load plotly.js
+        from when STATIC_ASSET_BASE_URL is not set.
+        """
         # 准备数据
-        weight_chart = create_weight_chart(weight_records)
-        weight_chart_html = pio.to_html(weight_chart, full_html=False)
-        
-        # 使用自定义模板或默认模板
-        template_content = template.content if template else cls.HTML_TEMPLATE
+        chart_key = cls._chart_cache_key(pet)
+        # Markdown 模板直接渲染为 Markdown：图表以文本走势代替，不再经过 HTML 和 html2text
+        native_markdown = template is not None and template.template_type == "markdown"
+        if native_markdown:
+            weight_chart = render_weight_sparkline(weight_records)
+        else:
+            weight_chart = cls._render_chart_html(
+                weight_records,
+                chart_mode or settings.REPORT_CHART_MODE,
+                chart_key,
+                asset_base_url
+            )
         
-        # 渲染模板
-        template = jinja2.Template(template_content)
-        html_content = template.render(
+        # 使用自定义模板或默认模板（编译结果按模板 id 和修改时间缓存，自定义模板在沙箱中限时渲染）
+        content = render_report_template(template, dict(
             pet=pet,
             generated_date=datetime.utcnow().strftime("%Y-%m-%d %H:%M"),
             pet_age=cls._calculate_pet_age(pet),
-            weight_chart=weight_chart_html,
-            health_summary=cls._generate_health_summary(weight_records, medical_records),
+            weight_chart=weight_chart,
+            health_summary=cls._generate_health_summary(weight_records, medical_records, native_markdown),
             medical_records=medical_records[-5:],
             reminders=reminders,
             # 添加更多可用的模板变量
             weight_records=weight_records,
             all_medical_records=medical_records,
             stats=cls._generate_stats(weight_records, medical_records)
-        )
+        ), version)
+        if native_markdown:
+            # 模板正文常带有统一缩进，否则会被当作代码块
+            content = textwrap.dedent(content).strip() + "\n"
         
         # 根据格式返回不同内容
         if format == "html":
-            return html_content.encode()
+            if native_markdown:
+                return markdown.markdown(content, extensions=["tables"]).encode()
+            return content.encode()
         
         elif format == "markdown":
-            # 将HTML转换为Markdown
+            if native_markdown:
+                return content.encode()
+            # 将HTML模板的输出转换为Markdown
             from html2text import HTML2Text
             h2t = HTML2Text()
             h2t.ignore_links = False
-            markdown_content = h2t.handle(html_content)
+            markdown_content = h2t.handle(content)
             return markdown_content.encode()
         
         elif format == "pdf":
@@ -134,7 +158,8 @@ class ReportGenerator:
                 pet=pet,
                 weight_records=weight_records,
                 medical_records=medical_records,
-                reminders=reminders
+                reminders=reminders,
+                chart_key=chart_key
             )
         
         elif format == "excel":
@@ -142,12 +167,57 @@ class ReportGenerator:
                 pet,
                 weight_records,
                 medical_records,
-                reminders
+                reminders,
+                chart_key
             )
         
         else:
             raise ValueError(f"Unsupported format: {format}")
 
+    @staticmethod
+    def _chart_cache_key(pet) -> Optional[Hashable]:
+        """静态图表缓存键；示例数据没有 id/数据版本，不缓存"""
+        pet_id = getattr(pet, "id", None)
+        data_version = getattr(pet, "data_version", None)
+        if pet_id is None or data_version is None:
+            return None
+        return (pet_id, data_version)
+
+    @staticmethod
+    def _render_chart_html(
+        weight_records,
+        chart_mode: str,
+        chart_key: Optional[Hashable],
+        asset_base_url: Optional[str] = None
+    ) -> str:
+        """
+        图表 HTML 片段
+        
+        shared: 引用共享的 plotly.js; inline: 内嵌完整 plotly.js; svg: 静态内联 SVG，无需 JS
+        """
+        script_url = plotlyjs_url(asset_base_url) if chart_mode == "shared" else None
+        if chart_mode == "shared" and script_url is None:
+            # 不知道 API 地址时无法引用共享脚本，改用无需 JS 的 SVG
+            chart_mode = "svg"
+        if chart_mode == "svg":
+            return render_weight_chart(weight_records, "svg", cache_key=chart_key)
+        
+        figure = create_weight_figure(weight_records)
+        if chart_mode == "shared":
+            return pio.to_html(figure, full_html=False, include_plotlyjs=script_url)
+        elif chart_mode == "inline":
+            return pio.to_html(figure, full_html=False, include_plotlyjs=True)
+        raise ValueError(f"Unsupported chart mode: {chart_mode}")
+
+    @staticmethod
+    def _symptom_counts(medical_records) -> List[Tuple[str, int]]:
+        """症状频率（报告中的记录已在内存中）"""
+        counts = Counter(
+            name for record in medical_records for name in normalize_symptoms(record.symptoms)
+        )
+        # 与 SQL 聚合的排序一致（次数降序、名称升序），两者共用图表缓存
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
     @staticmethod
     def _calculate_pet_age(pet) -> str:
         """计算宠物年龄"""
@@ -163,8 +233,8 @@ class ReportGenerator:
         return f"{months} months"
 
     @staticmethod
-    def _generate_health_summary(weight_records, medical_records) -> str:
-        """生成健康总结"""
+    def _generate_health_summary(weight_records, medical_records, as_markdown: bool = False) -> str:
+        """生成健康总结（HTML 以 <br> 分行，Markdown 以列表分行）"""
         summary = []
         
         # 分析体重趋势
@@ -182,10 +252,17 @@ class ReportGenerator:
         if medical_records:
             recent_issues = [r.symptoms for r in medical_records[-3:]]
             if recent_issues:
+                if as_markdown and summary:
+                    summary.append("")
                 summary.append("Recent health issues:")
+                if as_markdown:
+                    # Markdown 列表前需要空行
+                    summary.append("")
                 summary.extend([f"- {issue}" for issue in recent_issues])
         
-        return "<br>".join(summary) if summary else "No significant health issues."
+        if not summary:
+            return "No significant health issues."
+        return "\n".join(summary) if as_markdown else "<br>".join(summary)
 
     @staticmethod
     def _generate_stats(weight_records, medical_records) -> Dict[str, Any]:
@@ -206,8 +283,41 @@ class ReportGenerator:
         }
         return stats
 
+    @classmethod
+    def _generate_pdf(cls, pet, weight_records, medical_records, reminders, chart_key=None) -> BytesIO:
+        """
+        生成PDF报告（记录已在内存中）
+
+        Reports straight from the database should use
+        `pdf_report.write_pet_pdf_report`, which streams the rows instead.
+        """
+        stats = cls._generate_stats(weight_records, medical_records)
+        summary = summary_rows(
+            pet,
+            cls._calculate_pet_age(pet),
+            len(weight_records),
+            stats["weight"]["current"],
+            stats["weight"]["min"],
+            stats["weight"]["max"],
+            stats["medical"]["total_visits"],
+            stats["medical"]["recent_visits"]
+        )
+        output = BytesIO()
+        build_pdf_report(
+            output,
+            pet,
+            summary,
+            ((r.date, r.weight, r.notes) for r in weight_records),
+            ((r.date, r.symptoms, r.diagnosis, r.treatment) for r in reversed(medical_records)),
+            reminders,
+            render_weight_chart(weight_records, "png", cache_key=chart_key),
+            render_symptom_chart(cls._symptom_counts(medical_records), "png", cache_key=chart_key)
+        )
+        output.seek(0)
+        return output
+
     @staticmethod
-    def _generate_excel(pet, weight_records, medical_records, reminders) -> BytesIO:
+    def _generate_excel(pet, weight_records, medical_records, reminders, chart_key=None) -> BytesIO:
         """生成Excel报告"""
         output = BytesIO()
         with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
@@ -259,37 +369,26 @@ class ReportGenerator:
                 index=False
             )
             
-            # 获取workbook和worksheet对象
-            workbook = writer.book
-            
-            # 添加图表
-            chart_sheet = workbook.add_worksheet('Weight Chart')
-            chart = workbook.add_chart({'type': 'line'})
-            
-            # 配置图表数据
-            weight_data = pd.DataFrame([{
+            # 图表sheet：数据 + 静态图片（与 HTML/PDF 共用同一渲染缓存）
+            pd.DataFrame([{
                 'Date': r.date,
                 'Weight': r.weight
-            } for r in weight_records])
-            
-            weight_data.to_excel(
+            } for r in weight_records]).to_excel(
                 writer,
-                sheet_name='Weight Chart',
-                startrow=1,
+                sheet_name='Charts',
                 index=False
             )
-            
-            chart.add_series({
-                'name': 'Weight',
-                'categories': '=Weight Chart!$A$2:$A$' + str(len(weight_data) + 1),
-                'values': '=Weight Chart!$B$2:$B$' + str(len(weight_data) + 1),
+            chart_sheet = writer.sheets['Charts']
+            chart_sheet.insert_image('D2', 'weight.png', {
+                'image_data': BytesIO(render_weight_chart(weight_records, "png", cache_key=chart_key))
+            })
+            chart_sheet.insert_image('D22', 'symptoms.png', {
+                'image_data': BytesIO(render_symptom_chart(
+                    ReportGenerator._symptom_counts(medical_records),
+                    "png",
+                    cache_key=chart_key
+                ))
             })
-            
-            chart.set_title({'name': 'Weight Trend'})
-            chart.set_x_axis({'name': 'Date'})
-            chart.set_y_axis({'name': 'Weight (kg)'})
-            
-            chart_sheet.insert_chart('D2', chart)
         
         output.seek(0)
         return output 
\ No newline at end of file
@@ -1,8 +1,12 @@
+# 修改示例数据的内容或结构时递增，已缓存的预览随之失效
+SAMPLE_DATA_VERSION = 1
+
 def generate_sample_data():
     """生成用于模板预览的示例数据"""
     from datetime import datetime, timedelta
     
-    now = datetime.utcnow()
+    # 以当天零点为基准，同一天内生成的示例数据完全相同，预览可以缓存
+    now = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     
     # 创建示例宠物
     pet = type('Pet', (), {
@@ -0,0 +1,269 @@
+import math
+import re
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+from PIL import Image
+
+# 仅支持 SVG path 的 d 属性，足够绘制 AvatarGenerator.ANIMAL_ICONS
+
+Point = Tuple[float, float]
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_SEPARATORS = " ,\t\r\n"
+
+# 每段贝塞尔曲线的折线段数；圆弧每 π/16 一段
+CURVE_STEPS = 16
+ARC_STEP = math.pi / 16
+
+class _Scanner:
+    def __init__(self, data: str):
+        self.data = data
+        self.pos = 0
+
+    def _skip(self) -> None:
+        while self.pos < len(self.data) and self.data[self.pos] in _SEPARATORS:
+            self.pos += 1
+
+    def command(self) -> Optional[str]:
+        self._skip()
+        if self.pos < len(self.data) and self.data[self.pos].isalpha():
+            self.pos += 1
+            return self.data[self.pos - 1]
+        return None
+
+    def has_number(self) -> bool:
+        self._skip()
+        return self.pos < len(self.data) and (self.data[self.pos].isdigit() or self.data[self.pos] in "+-.")
+
+    def number(self) -> float:
+        self._skip()
+        match = _NUMBER.match(self.data, self.pos)
+        if match is None:
+            raise ValueError(f"Expected a number at {self.pos} in path data")
+        self.pos = match.end()
+        return float(match.group())
+
+    def flag(self) -> bool:
+        # 圆弧标志位可以不加分隔符，如 "a1 1 0 01 1 1"
+        self._skip()
+        if self.pos >= len(self.data) or self.data[self.pos] not in "01":
+            raise ValueError(f"Expected an arc flag at {self.pos} in path data")
+        self.pos += 1
+        return self.data[self.pos - 1] == "1"
+
+def _cubic(p0: Point, p1: Point, p2: Point, p3: Point) -> List[Point]:
+    points = []
+    for step in range(1, CURVE_STEPS + 1):
+        t = step / CURVE_STEPS
+        u = 1 - t
+        points.append((
+            u * u * u * p0[0] + 3 * u * u * t * p1[0] + 3 * u * t * t * p2[0] + t * t * t * p3[0],
+            u * u * u * p0[1] + 3 * u * u * t * p1[1] + 3 * u * t * t * p2[1] + t * t * t * p3[1]
+        ))
+    return points
+
+def _quadratic(p0: Point, p1: Point, p2: Point) -> List[Point]:
+    points = []
+    for step in range(1, CURVE_STEPS + 1):
+        t = step / CURVE_STEPS
+        u = 1 - t
+        points.append((
+            u * u * p0[0] + 2 * u * t * p1[0] + t * t * p2[0],
+            u * u * p0[1] + 2 * u * t * p1[1] + t * t * p2[1]
+        ))
+    return points
+
+def _arc(p0: Point, rx: float, ry: float, rotation: float, large: bool, sweep: bool, p1: Point) -> List[Point]:
+    """Endpoint arc to points, per the SVG implementation notes (F.6.5)"""
+    if p0 == p1:
+        return []
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0:
+        return [p1]
+    phi = math.radians(rotation)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (p0[0] - p1[0]) / 2, (p0[1] - p1[1]) / 2
+    x1 = cos_phi * dx + sin_phi * dy
+    y1 = -sin_phi * dx + cos_phi * dy
+
+    # 半径不足以连接两端点时按比例放大
+    scale = (x1 * x1) / (rx * rx) + (y1 * y1) / (ry * ry)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+
+    numerator = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    denominator = rx * rx * y1 * y1 + ry * ry * x1 * x1
+    factor = math.sqrt(max(numerator / denominator, 0.0))
+    if large == sweep:
+        factor = -factor
+    cx1, cy1 = factor * rx * y1 / ry, -factor * ry * x1 / rx
+    cx = cos_phi * cx1 - sin_phi * cy1 + (p0[0] + p1[0]) / 2
+    cy = sin_phi * cx1 + cos_phi * cy1 + (p0[1] + p1[1]) / 2
+
+    start = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    end = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx)
+    delta = end - start
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+
+    steps = max(2, math.ceil(abs(delta) / ARC_STEP))
+    points = []
+    for step in range(1, steps + 1):
+        angle = start + delta * step / steps
+        x, y = rx * math.cos(angle), ry * math.sin(angle)
+        points.append((cos_phi * x - sin_phi * y + cx, sin_phi * x + cos_phi * y + cy))
+    points[-1] = p1
+    return points
+
+@lru_cache(maxsize=32)
+def parse_path(data: str) -> Tuple[Tuple[Point, ...], ...]:
+    """
+    Parse SVG path data into flattened subpaths
+
+    Supports M, L, H, V, C, S, Q, T, A and Z in absolute and relative
+    form; curves and arcs become polylines.
+
+    Raises:
+        ValueError: Malformed or unsupported path data
+    """
+    scanner = _Scanner(data)
+    subpaths: List[List[Point]] = []
+    current: Point = (0.0, 0.0)
+    start: Point = current
+    control: Optional[Point] = None  # 上一段曲线的第二控制点，供 S/T 反射
+    command = scanner.command()
+    if command not in ("M", "m"):
+        raise ValueError("Path data must start with a moveto")
+
+    while command is not None:
+        relative = command.islower()
+        op = command.upper()
+        ox, oy = current if relative else (0.0, 0.0)
+
+        def point() -> Point:
+            return (scanner.number() + ox, scanner.number() + oy)
+
+        if op == "Z":
+            if subpaths and subpaths[-1][-1] != start:
+                subpaths[-1].append(start)
+            current, control = start, None
+            command = scanner.command()
+            continue
+
+        first = True
+        while first or scanner.has_number():
+            first = False
+            if op == "M":
+                current = start = point()
+                subpaths.append([current])
+                # moveto 之后的坐标对按 lineto 处理
+                op = "L"
+            elif op == "L":
+                current = point()
+                subpaths[-1].append(current)
+            elif op == "H":
+                current = (scanner.number() + ox, current[1])
+                subpaths[-1].append(current)
+            elif op == "V":
+                current = (current[0], scanner.number() + oy)
+                subpaths[-1].append(current)
+            elif op == "C":
+                p1, p2, p3 = point(), point(), point()
+                subpaths[-1].extend(_cubic(current, p1, p2, p3))
+                current, control = p3, p2
+            elif op == "S":
+                p1 = (2 * current[0] - control[0], 2 * current[1] - control[1]) if control else current
+                p2, p3 = point(), point()
+                subpaths[-1].extend(_cubic(current, p1, p2, p3))
+                current, control = p3, p2
+            elif op == "Q":
+                p1, p2 = point(), point()
+                subpaths[-1].extend(_quadratic(current, p1, p2))
+                current, control = p2, p1
+            elif op == "T":
+                p1 = (2 * current[0] - control[0], 2 * current[1] - control[1]) if control else current
+                p2 = point()
+                subpaths[-1].extend(_quadratic(current, p1, p2))
+                current, control = p2, p1
+            elif op == "A":
+                rx, ry, rotation = scanner.number(), scanner.number(), scanner.number()
+                large, sweep = scanner.flag(), scanner.flag()
+                end = point()
+                subpaths[-1].extend(_arc(current, rx, ry, rotation, large, sweep, end))
+                current = end
+            else:
+                raise ValueError(f"Unsupported path command: {command}")
+            if op not in ("C", "S", "Q", "T"):
+                control = None
+            # 相对坐标以本段终点为基准
+            if relative:
+                ox, oy = current
+        command = scanner.command()
+        if command is None and scanner.pos < len(data.rstrip(_SEPARATORS)):
+            raise ValueError(f"Unexpected character at {scanner.pos} in path data")
+
+    return tuple(tuple(subpath) for subpath in subpaths if len(subpath) > 2)
+
+def _fill(subpaths: Sequence[Sequence[Point]], width: int, height: int, even_odd: bool) -> bytearray:
+    """Scanline fill sampling pixel centres; returns one 0/255 byte per pixel"""
+    edges = []
+    for subpath in subpaths:
+        # 子路径隐式闭合
+        for (x0, y0), (x1, y1) in zip(subpath, subpath[1:] + subpath[:1]):
+            if y0 != y1:
+                direction = 1 if y1 > y0 else -1
+                if y0 > y1:
+                    x0, y0, x1, y1 = x1, y1, x0, y0
+                edges.append((y0, y1, x0, (x1 - x0) / (y1 - y0), direction))
+
+    pixels = bytearray(width * height)
+    for row in range(height):
+        y = row + 0.5
+        crossings = sorted(
+            (x0 + (y - y0) * slope, direction)
+            for y0, y1, x0, slope, direction in edges
+            if y0 <= y < y1
+        )
+        winding = 0
+        for (x, direction), (next_x, _) in zip(crossings, crossings[1:] + [(0.0, 0)]):
+            winding += direction
+            inside = winding % 2 if even_odd else winding
+            if inside:
+                left = max(0, math.ceil(x - 0.5))
+                right = min(width, math.ceil(next_x - 0.5))
+                if right > left:
+                    pixels[row * width + left:row * width + right] = b"\xff" * (right - left)
+    return pixels
+
+@lru_cache(maxsize=64)
+def path_mask(data: str, size: int, fill_rule: str = "nonzero", supersample: int = 4) -> Image.Image:
+    """
+    Anti-aliased alpha mask of a path, scaled to fit a size x size square
+
+    The path's bounding box is centred in the square. Filling follows SVG
+    `fill-rule` ("nonzero" or "evenodd") at `supersample` times the
+    resolution, then box-filtered down. Masks are cached; treat them as
+    read-only.
+
+    Raises:
+        ValueError: Malformed path data or an unknown fill rule
+    """
+    if fill_rule not in ("nonzero", "evenodd"):
+        raise ValueError(f"Unsupported fill rule: {fill_rule}")
+    subpaths = parse_path(data)
+    if not subpaths:
+        raise ValueError("Path data has no closed area")
+    xs = [x for subpath in subpaths for x, _ in subpath]
+    ys = [y for subpath in subpaths for _, y in subpath]
+    width, height = max(xs) - min(xs), max(ys) - min(ys)
+    canvas = size * supersample
+    # 按包围盒等比缩放并居中（图标数据不都在同一 viewBox 内）
+    scale = canvas / max(width, height)
+    dx = (canvas - width * scale) / 2 - min(xs) * scale
+    dy = (canvas - height * scale) / 2 - min(ys) * scale
+
+    scaled = [[(x * scale + dx, y * scale + dy) for x, y in subpath] for subpath in subpaths]
+    pixels = _fill(scaled, canvas, canvas, fill_rule == "evenodd")
+    return Image.frombytes("L", (canvas, canvas), bytes(pixels)).reduce(supersample)
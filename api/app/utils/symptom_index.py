@@ -0,0 +1,51 @@
+from typing import Dict, Iterable, List
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models.records import MedicalVisit, Symptom, VisitSymptom
+
+def normalize_symptoms(symptoms: str) -> List[str]:
+    """Split a free-text symptom list into unique, normalized names"""
+    names = []
+    for symptom in (symptoms or '').split(','):
+        name = symptom.strip().lower()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def intern_symptoms(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """
+    Look up symptom ids, adding any names not yet in the vocabulary
+
+    Returns:
+        Dict[str, int]: Symptom name -> id
+    """
+    names = set(names)
+    if not names:
+        return {}
+    
+    # 并发写入时依赖唯一约束去重
+    db.execute(
+        insert(Symptom)
+        .values([{"name": name} for name in sorted(names)])
+        .on_conflict_do_nothing(index_elements=[Symptom.name])
+    )
+    rows = db.execute(
+        select(Symptom.name, Symptom.id).where(Symptom.name.in_(names))
+    ).all()
+    return {name: symptom_id for name, symptom_id in rows}
+
+def index_visit_symptoms(db: Session, visits: Iterable[MedicalVisit]) -> None:
+    """(Re)build the symptom links of new or edited visits"""
+    visits = list(visits)
+    parsed = [(visit, normalize_symptoms(visit.symptoms)) for visit in visits]
+    symptom_ids = intern_symptoms(db, (name for _, names in parsed for name in names))
+    
+    for visit, names in parsed:
+        # 保留未变化的链接，避免同主键的删除再插入
+        existing = {link.symptom_id: link for link in visit.symptom_links}
+        visit.symptom_links = [
+            existing.get(symptom_ids[name])
+            or VisitSymptom(symptom_id=symptom_ids[name], pet_id=visit.pet_id)
+            for name in names
+        ]
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+from app.core.cache import ResultCache
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.settings import ReportTemplate, SharedTemplate
+from app.schemas.report import ReportTemplateResponse
+
+@dataclass(frozen=True)
+class TemplateListing:
+    """Serialized template list and its ETag, shared read-only between requests"""
+
+    body: bytes
+    etag: str
+
+    @classmethod
+    def build(cls, templates: Iterable[ReportTemplate]) -> "TemplateListing":
+        items = [ReportTemplateResponse.model_validate(t).model_dump() for t in templates]
+        # 与 JSONResponse 的序列化方式一致
+        body = json.dumps(jsonable_encoder(items), ensure_ascii=False, separators=(",", ":")).encode()
+        return cls(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+    def response(self, request: Request) -> Response:
+        """200 with the body, or 304 when the client already has this listing"""
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+# ---- 默认模板 ----
+
+# (TemplateListing, 过期时间)
+_defaults: Optional[Tuple[TemplateListing, float]] = None
+_defaults_lock = threading.Lock()
+
+def load_default_templates() -> TemplateListing:
+    """
+    加载默认模板快照（启动时在线程池中调用）
+
+    Template create/update/delete call `invalidate_default_templates` in
+    the worker that handled them; other workers pick the change up when
+    the snapshot expires after SHARED_TEMPLATE_CACHE_TTL seconds.
+    """
+    global _defaults
+    db = SessionLocal()
+    try:
+        listing = TemplateListing.build(
+            db.query(ReportTemplate).filter(
+                ReportTemplate.is_default == True
+            ).order_by(ReportTemplate.id)
+        )
+    finally:
+        db.close()
+    with _defaults_lock:
+        _defaults = (listing, time.monotonic() + settings.SHARED_TEMPLATE_CACHE_TTL)
+    return listing
+
+def default_templates() -> TemplateListing:
+    cached = _defaults
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    return load_default_templates()
+
+def invalidate_default_templates() -> None:
+    global _defaults
+    with _defaults_lock:
+        _defaults = None
+
+# ---- 分享给用户的模板 ----
+
+# 用户 id -> (TemplateListing, 过期时间)
+shared_cache = ResultCache("shared_templates", max_entries=settings.SHARED_TEMPLATE_CACHE_SIZE)
+
+def shared_templates(db: Session, user_id: int) -> TemplateListing:
+    """
+    Templates shared with `user_id`, cached per user
+
+    Entries are dropped on share, update and delete of a template, and
+    expire after SHARED_TEMPLATE_CACHE_TTL seconds to bound staleness
+    from changes handled by other workers.
+    """
+    cached = shared_cache.get(user_id)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+    listing = TemplateListing.build(
+        db.query(ReportTemplate).join(
+            SharedTemplate,
+            SharedTemplate.template_id == ReportTemplate.id
+        ).filter(
+            SharedTemplate.shared_with_id == user_id
+        ).order_by(ReportTemplate.id)
+    )
+    shared_cache.set(user_id, (listing, time.monotonic() + settings.SHARED_TEMPLATE_CACHE_TTL))
+    return listing
+
+def shared_with(db: Session, template_id: int) -> List[int]:
+    """Ids of the users a template is shared with (read before deleting it)"""
+    return [
+        row.shared_with_id for row in db.query(SharedTemplate.shared_with_id).filter(
+            SharedTemplate.template_id == template_id
+        )
+    ]
+
+def invalidate_shared_templates(user_ids: Iterable[int]) -> None:
+    for user_id in user_ids:
+        shared_cache.invalidate(user_id)
@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+from typing import Optional
+import jinja2
+from app.core.config import settings
+from app.models.settings import ReportTemplate, ReportTemplateVersion
+from app.utils.template_sandbox import BudgetedSandboxedEnvironment, SourceLoader, render_budgeted, render_in_pool
+
+# 模板名称空间：
+#   builtin/<name>                     内置模板
+#   report_template/<id>@<updated_at>  自定义模板的某次修改
+#   report_version/<version_id>        模板版本（创建后不可变）
+# 名称里带着修改时间或版本 id，内容变化即换名，编译结果永不过期
+
+def version_tag(updated_at: Optional[datetime]) -> str:
+    """Stable tag for updated_at whether the value is naive (UTC) or aware"""
+    if updated_at is None:
+        return "0"
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return updated_at.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+
+# 自定义模板和模板版本的源码由调用方提供，编译未命中时不再查询数据库
+_user_templates = SourceLoader()
+
+_environment: Optional[jinja2.Environment] = None
+
+def _bytecode_cache() -> Optional[jinja2.BytecodeCache]:
+    if not settings.TEMPLATE_BYTECODE_CACHE:
+        return None
+    # 未指定目录时使用 Jinja 默认的用户临时目录
+    return jinja2.FileSystemBytecodeCache(settings.TEMPLATE_BYTECODE_CACHE_DIR or None)
+
+def get_environment() -> jinja2.Environment:
+    """Shared environment; compiled templates are kept in its LRU cache"""
+    global _environment
+    if _environment is None:
+        from app.utils.report_generator import ReportGenerator
+
+        # 自定义模板由用户编写，统一在沙箱中编译和渲染
+        _environment = BudgetedSandboxedEnvironment(
+            loader=jinja2.ChoiceLoader([
+                jinja2.DictLoader({"builtin/report.html": ReportGenerator.HTML_TEMPLATE}),
+                _user_templates
+            ]),
+            cache_size=settings.TEMPLATE_CACHE_SIZE,
+            bytecode_cache=_bytecode_cache(),
+            # 名称即版本，命中缓存时无需再检查源码是否变化
+            auto_reload=False
+        )
+    return _environment
+
+def template_name(template: Optional[ReportTemplate] = None, version: Optional[ReportTemplateVersion] = None) -> str:
+    """Loader name for a template row, a version row, or the built-in report"""
+    if version is not None:
+        return f"report_version/{version.id}"
+    if template is not None:
+        return f"report_template/{template.id}@{version_tag(template.updated_at)}"
+    return "builtin/report.html"
+
+def get_template(
+    template: Optional[ReportTemplate] = None,
+    version: Optional[ReportTemplateVersion] = None
+) -> jinja2.Template:
+    """
+    获取编译后的报告模板
+
+    Args:
+        template: Custom template (None for the built-in report)
+        version: Template version, takes precedence over template
+
+    Returns:
+        jinja2.Template: Compiled template, shared across renders
+    """
+    source = version if version is not None else template
+    environment = get_environment()
+    if source is None:
+        return environment.get_template(template_name())
+    # 未保存的对象没有 id，直接编译
+    if getattr(source, "id", None) is None:
+        return environment.from_string(source.content)
+    return _user_templates.get_template(environment, template_name(template, version), lambda: source.content)
+
+def render_report_template(
+    template: Optional[ReportTemplate],
+    context: dict,
+    version: Optional[ReportTemplateVersion] = None
+) -> str:
+    """
+    渲染报告模板
+
+    The built-in report renders in-process. User templates render in the
+    sandbox under CPU, operation and output budgets, in the render worker
+    pool unless TEMPLATE_RENDER_WORKERS is 0.
+
+    Raises:
+        TemplateBudgetExceeded: A user template hit a render limit
+        jinja2.exceptions.SecurityError: A user template touched an unsafe attribute
+    """
+    if template is None and version is None:
+        return get_template().render(**context)
+    if settings.TEMPLATE_RENDER_WORKERS > 0:
+        source = version if version is not None else template
+        name = template_name(template, version) if getattr(source, "id", None) is not None else None
+        return render_in_pool(name, source.content, context)
+    return render_budgeted(get_template(template, version), context, settings.TEMPLATE_RENDER_CPU_SECONDS)
@@ -0,0 +1,64 @@
+import hashlib
+import logging
+from datetime import datetime
+from typing import Hashable, Optional
+import jinja2
+from app.core.cache import ResultCache
+from app.core.config import settings
+from app.models.settings import ReportTemplate, ReportTemplateVersion
+from app.utils.report_generator import ReportGenerator
+from app.utils.sample_data import SAMPLE_DATA_VERSION, generate_sample_data
+from app.utils.template_sandbox import TemplateBudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+# 示例数据预览按模板内容缓存，内容相同的模板（副本、版本回滚）共用同一条
+preview_cache = ResultCache(
+    "preview",
+    max_entries=settings.PREVIEW_CACHE_MAX_ENTRIES,
+    max_bytes=settings.PREVIEW_CACHE_MAX_BYTES
+)
+
+def preview_key(content: str, template_type: str) -> Hashable:
+    """
+    Cache key of a sample-data preview
+
+    The same content renders differently as an HTML or a Markdown template,
+    so the type is part of the key. Sample dates are relative to the
+    current day, so the day is too, along with the content hash and the
+    sample data version.
+    """
+    digest = hashlib.sha256(content.encode()).hexdigest()
+    return ("sample", template_type, digest, SAMPLE_DATA_VERSION, datetime.utcnow().date())
+
+def render_sample_preview(
+    template: ReportTemplate,
+    version: Optional[ReportTemplateVersion] = None
+) -> bytes:
+    """用示例数据渲染模板（或模板版本）并写入预览缓存"""
+    source = version if version is not None else template
+    content = ReportGenerator.generate_report(
+        **generate_sample_data(),
+        template=template,
+        version=version
+    )
+    preview_cache.set(preview_key(source.content, template.template_type), content)
+    return content
+
+def warm_sample_preview(
+    template: ReportTemplate,
+    version: Optional[ReportTemplateVersion] = None
+) -> None:
+    """
+    保存模板后预先渲染示例预览（后台任务）
+
+    Templates that fail to render are skipped; the author sees the error
+    on the next explicit preview.
+    """
+    source = version if version is not None else template
+    if preview_cache.get(preview_key(source.content, template.template_type)) is not None:
+        return
+    try:
+        render_sample_preview(template, version)
+    except (TemplateBudgetExceeded, jinja2.TemplateError) as e:
+        logger.info(f"Skipped preview warm-up for template {template.id}: {e}")
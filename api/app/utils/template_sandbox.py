@@ -0,0 +1,275 @@
+import signal
+import threading
+import time
+from contextvars import ContextVar
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional
+import jinja2
+from jinja2.sandbox import SandboxedEnvironment
+from app.core.config import settings
+from app.utils.worker_pool import TaskTimeout, WorkerPool
+
+# 注意：本模块会被渲染子进程导入，不能依赖数据库或模型
+
+class TemplateBudgetExceeded(Exception):
+    """A user template hit one of its render limits"""
+
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        self.limit = limit
+
+    def __reduce__(self):
+        # 从渲染子进程传回时保留 limit
+        return (self.__class__, (self.limit, str(self)))
+
+class _Budget:
+    """Per-render counters, checked from the sandbox hooks"""
+
+    # 每隔多少次操作检查一次 CPU 时间，避免每次都调用系统时钟
+    CPU_CHECK_INTERVAL = 1024
+
+    def __init__(self, max_operations: int, cpu_seconds: Optional[float]):
+        self.remaining = max_operations
+        self.until_cpu_check = self.CPU_CHECK_INTERVAL
+        self.cpu_deadline = time.thread_time() + cpu_seconds if cpu_seconds else None
+
+    def charge(self, cost: int = 1) -> None:
+        self.remaining -= cost
+        if self.remaining < 0:
+            raise TemplateBudgetExceeded("operations", "Template exceeded its operation budget")
+        self.until_cpu_check -= cost
+        if self.until_cpu_check <= 0:
+            self.until_cpu_check = self.CPU_CHECK_INTERVAL
+            if self.cpu_deadline is not None and time.thread_time() > self.cpu_deadline:
+                raise TemplateBudgetExceeded("cpu", "Template exceeded its CPU time budget")
+
+_budget: ContextVar[Optional[_Budget]] = ContextVar("template_budget", default=None)
+
+def _charge(cost: int = 1) -> None:
+    budget = _budget.get()
+    if budget is not None:
+        budget.charge(cost)
+
+class _BudgetedRange:
+    """range() whose iteration is charged per item"""
+
+    def __init__(self, values: range):
+        self.values = values
+
+    def __iter__(self):
+        for value in self.values:
+            _charge()
+            yield value
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __contains__(self, value):
+        return value in self.values
+
+class BudgetedSandboxedEnvironment(SandboxedEnvironment):
+    """
+    Sandboxed Jinja environment that charges every call, attribute or item
+    lookup and loop iteration over `range` against the active render budget
+    """
+
+    intercepted_binops = frozenset(["*", "**"])
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.globals["range"] = self._budgeted_range
+
+    @staticmethod
+    def _budgeted_range(*args) -> _BudgetedRange:
+        values = range(*args)
+        if len(values) > settings.TEMPLATE_RENDER_MAX_RANGE:
+            raise TemplateBudgetExceeded("iterations", "Template range is too large")
+        return _BudgetedRange(values)
+
+    def call(__self, __context, __obj, *args, **kwargs):
+        _charge()
+        return super().call(__context, __obj, *args, **kwargs)
+
+    def getattr(self, obj, attribute):
+        _charge()
+        return super().getattr(obj, attribute)
+
+    def getitem(self, obj, argument):
+        _charge()
+        return super().getitem(obj, argument)
+
+    def call_binop(self, context, operator, left, right):
+        # 大整数幂和超长序列乘法在 C 代码里执行，CPU 计时信号无法打断，只能提前拒绝
+        if operator == "**" and isinstance(right, (int, float)) and abs(right) > 64:
+            raise TemplateBudgetExceeded("operations", "Template exponent is too large")
+        if operator == "*":
+            for sequence, count in ((left, right), (right, left)):
+                if isinstance(sequence, (str, list, tuple)) and isinstance(count, int):
+                    if len(sequence) * count > settings.TEMPLATE_RENDER_MAX_OUTPUT:
+                        raise TemplateBudgetExceeded("output", "Template output is too large")
+        _charge()
+        return super().call_binop(context, operator, left, right)
+
+def render_budgeted(template: jinja2.Template, context: Dict[str, Any], cpu_seconds: Optional[float] = None) -> str:
+    """
+    在预算内渲染模板
+
+    Output is collected chunk by chunk so an oversized render stops as soon
+    as it crosses the limit instead of after it has been built.
+    """
+    token = _budget.set(_Budget(settings.TEMPLATE_RENDER_MAX_OPERATIONS, cpu_seconds))
+    try:
+        chunks = []
+        size = 0
+        for chunk in template.generate(**context):
+            size += len(chunk)
+            if size > settings.TEMPLATE_RENDER_MAX_OUTPUT:
+                raise TemplateBudgetExceeded("output", "Template output is too large")
+            chunks.append(chunk)
+        return "".join(chunks)
+    finally:
+        _budget.reset(token)
+
+_PLAIN_TYPES = (str, int, float, bool, type(None), datetime, date, Decimal)
+
+def to_plain(value: Any) -> Any:
+    """
+    将渲染上下文转换为可序列化的普通数据
+
+    ORM rows and ad-hoc sample objects become dicts of their public
+    attributes, which Jinja reads with the same `obj.attr` syntax.
+    """
+    if isinstance(value, _PLAIN_TYPES):
+        return value
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    mapper = getattr(value, "__mapper__", None)
+    if mapper is not None:
+        return {attr.key: to_plain(getattr(value, attr.key)) for attr in mapper.column_attrs}
+    # generate_sample_data 用 type() 构造的示例对象，属性在类上
+    namespace = vars(value) if isinstance(value, type) else getattr(value, "__dict__", None)
+    if namespace is not None:
+        return {
+            key: to_plain(item)
+            for key, item in namespace.items()
+            if not key.startswith("_") and not callable(item)
+        }
+    return str(value)
+
+class SourceLoader(jinja2.BaseLoader):
+    """
+    Serves the source handed over with the current `get_template` call
+
+    Template names carry the identity of their content (an updated_at tag
+    or a version id), so the caller's copy is authoritative and a compile
+    miss never goes back to the database. `load` is only called on a miss.
+    Pending sources are per thread.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get_source(self, environment, name):
+        load = getattr(self._local, "pending", {}).get(name)
+        if load is None:
+            raise jinja2.TemplateNotFound(name)
+        return load(), None, lambda: True
+
+    def get_template(self, environment: jinja2.Environment, name: str, load: Callable[[], str]) -> jinja2.Template:
+        pending = self._local.__dict__.setdefault("pending", {})
+        pending[name] = load
+        try:
+            return environment.get_template(name)
+        finally:
+            pending.pop(name, None)
+
+# ---- 渲染子进程 ----
+
+_worker_environment: Optional[BudgetedSandboxedEnvironment] = None
+
+def _on_cpu_timeout(signum, frame):
+    raise TemplateBudgetExceeded("cpu", "Template exceeded its CPU time budget")
+
+def _init_worker() -> None:
+    global _worker_environment
+    bytecode_cache = None
+    if settings.TEMPLATE_BYTECODE_CACHE:
+        bytecode_cache = jinja2.FileSystemBytecodeCache(settings.TEMPLATE_BYTECODE_CACHE_DIR or None)
+    _worker_environment = BudgetedSandboxedEnvironment(
+        loader=SourceLoader(),
+        cache_size=settings.TEMPLATE_CACHE_SIZE,
+        bytecode_cache=bytecode_cache,
+        auto_reload=False
+    )
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGPROF, _on_cpu_timeout)
+
+def _render_in_worker(name: Optional[str], source: str, context: Dict[str, Any]) -> str:
+    environment = _worker_environment
+    if name is None:
+        template = environment.from_string(source)
+    else:
+        template = environment.loader.get_template(environment, name, lambda: source)
+
+    cpu_seconds = settings.TEMPLATE_RENDER_CPU_SECONDS
+    if not hasattr(signal, "setitimer"):
+        return render_budgeted(template, context, cpu_seconds)
+    # ITIMER_PROF 统计本进程的 CPU 时间（用户态 + 内核态），超时触发 SIGPROF
+    signal.setitimer(signal.ITIMER_PROF, cpu_seconds)
+    try:
+        return render_budgeted(template, context)
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> WorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 子进程在创建时全部启动，首个请求不承担进程启动和导入开销
+            _pool = WorkerPool(settings.TEMPLATE_RENDER_WORKERS, initializer=_init_worker)
+        return _pool
+
+def warm_render_pool() -> None:
+    """Start the render workers ahead of the first user-template render"""
+    if settings.TEMPLATE_RENDER_WORKERS > 0:
+        _get_pool()
+
+def shutdown_render_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+def render_in_pool(name: Optional[str], source: str, context: Dict[str, Any]) -> str:
+    """
+    在渲染子进程中执行用户模板（阻塞调用，应在线程池中调用）
+
+    TEMPLATE_RENDER_TIMEOUT counts from the moment a worker starts the
+    render, so renders queued behind others are not failed early. It backs
+    up the CPU timer for C code the signal cannot interrupt; only the stuck
+    worker is killed and renders on the other workers are unaffected.
+
+    Args:
+        name: Immutable template name used as the compile cache key, or None
+        source: Template source
+        context: Render context, converted to plain data before pickling
+
+    Raises:
+        TemplateBudgetExceeded: CPU, operation, iteration, output or time limit hit
+    """
+    context = to_plain(context)
+    task = _get_pool().submit(_render_in_worker, name, source, context)
+    try:
+        return task.result(timeout=settings.TEMPLATE_RENDER_TIMEOUT)
+    except TaskTimeout:
+        raise TemplateBudgetExceeded("time", "Template render timed out")
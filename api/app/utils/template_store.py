@@ -0,0 +1,142 @@
+import hashlib
+import json
+import zlib
+from difflib import SequenceMatcher
+from typing import Optional
+from sqlalchemy import exists
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+from app.core.cache import ResultCache
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.settings import ReportTemplateVersion, TemplateContent
+
+# 内容按哈希寻址、不可变，解码结果可一直缓存
+content_cache = ResultCache("template_content", max_entries=settings.TEMPLATE_CONTENT_CACHE_SIZE)
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def encode_delta(base: str, content: str) -> bytes:
+    """
+    Line delta of `content` against `base`
+
+    A JSON list whose items are either [start, end] (copy those base
+    lines) or a string (insert it), zlib-compressed.
+    """
+    base_lines = base.splitlines(keepends=True)
+    lines = content.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, base_lines, lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, ensure_ascii=False).encode(), 9)
+
+def apply_delta(base: str, data: bytes) -> str:
+    base_lines = base.splitlines(keepends=True)
+    return "".join(
+        "".join(base_lines[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in json.loads(zlib.decompress(data))
+    )
+
+def _delta_base(db: Session, template_id: int) -> Optional[TemplateContent]:
+    """The template's most recent version stored in full"""
+    return db.query(TemplateContent).join(
+        ReportTemplateVersion, ReportTemplateVersion.content_hash == TemplateContent.content_hash
+    ).filter(
+        ReportTemplateVersion.template_id == template_id,
+        TemplateContent.encoding == "zlib"
+    ).order_by(ReportTemplateVersion.created_at.desc()).with_for_update(read=True, of=TemplateContent).first()
+
+def intern_content(db: Session, template_id: int, content: str) -> str:
+    """
+    保存版本内容（已存在则复用），返回内容哈希
+
+    New content is stored as a delta against the template's latest full
+    blob when the delta is at most half the compressed size; deltas only
+    ever point at full blobs, so decoding takes at most one extra step.
+    The caller commits.
+
+    The reused content (or delta base) is locked FOR SHARE until then, so
+    a concurrent purge_unused_contents skips it instead of deleting it
+    before the version row referencing it is committed.
+    """
+    digest = content_hash(content)
+    reused = db.query(TemplateContent.id).filter(
+        TemplateContent.content_hash == digest
+    ).with_for_update(read=True).first()
+    if reused is None:
+        encoding, base_id = "zlib", None
+        data = zlib.compress(content.encode(), 9)
+        base = _delta_base(db, template_id)
+        if base is not None:
+            delta = encode_delta(load_content(base.content_hash, db), content)
+            if len(delta) * 2 <= len(data):
+                encoding, base_id, data = "delta", base.id, delta
+        # 其他请求可能同时保存相同内容
+        db.execute(insert(TemplateContent).values(
+            content_hash=digest,
+            encoding=encoding,
+            base_id=base_id,
+            data=data,
+            size=len(content.encode())
+        ).on_conflict_do_nothing(index_elements=[TemplateContent.content_hash]))
+    content_cache.set(digest, content)
+    return digest
+
+def _decode(db: Session, blob: TemplateContent) -> str:
+    if blob.encoding == "delta":
+        base = db.query(TemplateContent).filter(TemplateContent.id == blob.base_id).one()
+        return apply_delta(load_content(base.content_hash, db), blob.data)
+    return zlib.decompress(blob.data).decode()
+
+def load_content(digest: str, db: Optional[Session] = None) -> str:
+    """
+    按哈希读取内容
+
+    Opens its own session when `db` is None (e.g. in background tasks
+    that outlive the request session).
+    """
+    content = content_cache.get(digest)
+    if content is not None:
+        return content
+    session = db if db is not None else SessionLocal()
+    try:
+        blob = session.query(TemplateContent).filter(TemplateContent.content_hash == digest).one()
+        content = _decode(session, blob)
+    finally:
+        if db is None:
+            session.close()
+    content_cache.set(digest, content)
+    return content
+
+def purge_unused_contents(db: Session) -> int:
+    """
+    Delete contents no version refers to and no delta is based on
+
+    Returns:
+        int: Number of rows deleted
+    """
+    dependent = aliased(TemplateContent)
+    unused = (
+        ~exists().where(ReportTemplateVersion.content_hash == TemplateContent.content_hash),
+        ~exists().where(dependent.base_id == TemplateContent.id)
+    )
+    total = 0
+    # 先删增量，其基准在下一轮才变为无依赖
+    while True:
+        # 跳过 intern_content 正在复用（FOR SHARE）的内容；持有 FOR UPDATE 期间也无法新增引用
+        candidates = [
+            row.id for row in db.query(TemplateContent.id).filter(*unused).with_for_update(skip_locked=True)
+        ]
+        if not candidates:
+            db.commit()
+            return total
+        # 删除语句取新快照，再确认一次锁定前没有新提交的引用
+        total += db.query(TemplateContent).filter(
+            TemplateContent.id.in_(candidates),
+            *unused
+        ).delete(synchronize_session=False)
+        db.commit()
@@ -1,18 +1,83 @@
+import json
 import plotly.graph_objects as go
 import plotly.express as px
-from typing import List
+from typing import List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from app.models.records import WeightRecord, MedicalVisit
 
-def create_weight_chart(weight_records: List[WeightRecord]) -> dict:
-    """创建体重变化图表"""
-    df = pd.DataFrame([
-        {
-            "date": record.date,
-            "weight": record.weight
-        } for record in weight_records
-    ])
-    
+# 图表数据格式：紧凑列式（默认）或完整 Plotly figure
+CHART_FORMATS = ("columnar", "plotly")
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+def weight_frame(weight_records: List[WeightRecord]) -> pd.DataFrame:
+    """Weight readings sorted by date, with a time-based 7-day moving average"""
+    df = pd.DataFrame({
+        "date": pd.to_datetime([record.date for record in weight_records]),
+        "weight": np.array([record.weight for record in weight_records], dtype=float)
+    })
+    if df.empty:
+        df["ma7"] = np.array([], dtype=float)
+        return df
+
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+    # 按时间窗口而不是点数计算，称重间隔不规则时依然是真正的 7 天均值
+    df["ma7"] = df.rolling("7D", on="date")["weight"].mean()
+    return df
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Returns the indices of the points to keep, always including the first
+    and last point.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 下一个桶的平均点作为第三个顶点
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        areas = np.abs(
+            (x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Keep the minimum and maximum of each bucket (threshold / 2 buckets)"""
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, threshold // 2 + 1).astype(int)
+    indices = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = y[start:end]
+        indices.extend((start + int(np.argmin(bucket)), start + int(np.argmax(bucket))))
+    return np.unique(indices)
+
+def _column(values: np.ndarray, decimals: int = 3) -> list:
+    """Rounded floats with NaN as null"""
+    return [None if np.isnan(v) else v for v in np.round(values, decimals).tolist()]
+
+def create_weight_figure(weight_records: List[WeightRecord]) -> go.Figure:
+    """体重变化 Plotly 图表"""
+    df = weight_frame(weight_records)
+
     fig = go.Figure()
     fig.add_trace(go.Scatter(
         x=df['date'],
@@ -20,9 +85,8 @@ def create_weight_chart(weight_records: List[WeightRecord]) -> dict:
         mode='lines+markers',
         name='Weight'
     ))
-    
+
     # 添加移动平均线
-    df['ma7'] = df['weight'].rolling(window=7).mean()
     fig.add_trace(go.Scatter(
         x=df['date'],
         y=df['ma7'],
@@ -30,28 +94,82 @@ def create_weight_chart(weight_records: List[WeightRecord]) -> dict:
         name='7-day MA',
         line=dict(dash='dash')
     ))
-    
+
     fig.update_layout(
         title="Weight Trend",
         xaxis_title="Date",
         yaxis_title="Weight (kg)"
     )
-    
-    return fig.to_dict()
+    return fig
+
+def create_weight_chart(
+    weight_records: List[WeightRecord],
+    max_points: Optional[int] = None,
+    downsample: str = "lttb",
+    chart_format: str = "columnar"
+) -> dict:
+    """
+    创建体重变化图表
+
+    Args:
+        weight_records: Weight records
+        max_points: Point budget for the columnar format (None keeps all)
+        downsample: "lttb" or "minmax"
+        chart_format: "columnar" (parallel arrays) or "plotly" (full figure)
 
-def create_health_summary_chart(medical_records: List[MedicalVisit]) -> dict:
+    Returns:
+        dict: Chart payload
+    """
+    if chart_format == "plotly":
+        return json.loads(create_weight_figure(weight_records).to_json())
+    if chart_format not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format: {chart_format}")
+    if downsample not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unsupported downsample method: {downsample}")
+
+    df = weight_frame(weight_records)
+    # 毫秒时间戳，前端可直接 new Date(ts)
+    timestamps = df["date"].to_numpy(dtype="datetime64[ms]").astype(np.int64)
+    weights = df["weight"].to_numpy()
+    moving_average = df["ma7"].to_numpy()
+
+    indices = np.arange(len(df))
+    if max_points is not None and len(df) > max_points:
+        if downsample == "lttb":
+            indices = lttb_indices(timestamps.astype(float), weights, max_points)
+        else:
+            indices = minmax_indices(weights, max_points)
+
+    return {
+        "format": "columnar",
+        "title": "Weight Trend",
+        "timestamps": timestamps[indices].tolist(),
+        "series": [
+            {
+                "name": "Weight",
+                "unit": "kg",
+                "mode": "lines+markers",
+                "values": _column(weights[indices])
+            },
+            {
+                "name": "7-day MA",
+                "unit": "kg",
+                "mode": "lines",
+                "dash": "dash",
+                "values": _column(moving_average[indices])
+            }
+        ],
+        "total_points": int(len(df)),
+        "downsampled": bool(len(indices) < len(df))
+    }
+
+def create_health_summary_chart(symptom_counts: List[Tuple[str, int]]) -> dict:
     """创建健康概况图表"""
     # 症状频率饼图
-    symptom_counts = {}
-    for record in medical_records:
-        for symptom in record.symptoms.split(','):
-            symptom = symptom.strip()
-            symptom_counts[symptom] = symptom_counts.get(symptom, 0) + 1
-    
     fig = px.pie(
-        values=list(symptom_counts.values()),
-        names=list(symptom_counts.keys()),
+        values=[count for _, count in symptom_counts],
+        names=[symptom for symptom, _ in symptom_counts],
         title="Symptom Distribution"
     )
-    
-    return fig.to_dict() 
\ No newline at end of file
+
+    return json.loads(fig.to_json())
@@ -0,0 +1,111 @@
+import itertools
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.pool import AsyncResult
+from typing import Any, Callable, Optional
+
+# 注意：本模块会被子进程导入，不能依赖数据库或模型
+
+class TaskTimeout(Exception):
+    """A task ran longer than its timeout; its worker has been killed"""
+
+# ---- 子进程 ----
+
+_started = None
+
+def _init_worker(started, initializer: Optional[Callable[[], None]]) -> None:
+    global _started
+    _started = started
+    if initializer is not None:
+        initializer()
+
+def _run_task(task_id: int, func: Callable, args: tuple) -> Any:
+    # 开始执行时登记 (pid, 墙钟时间)，超时从这里起算，也据此只结束这一个子进程
+    _started[task_id] = (os.getpid(), time.time())
+    try:
+        return func(*args)
+    finally:
+        _started.pop(task_id, None)
+
+class WorkerTask:
+    """Handle for a task submitted to a WorkerPool"""
+
+    def __init__(self, pool: "WorkerPool", task_id: int, result: AsyncResult):
+        self.pool = pool
+        self.task_id = task_id
+        self._result = result
+
+    def started_at(self) -> Optional[float]:
+        """Wall-clock time a worker picked the task up, None while queued or done"""
+        started = self.pool._started.get(self.task_id)
+        return started[1] if started else None
+
+    def result(self, timeout: float) -> Any:
+        """
+        等待任务结果（阻塞调用）
+
+        `timeout` counts from the moment a worker starts the task, so time
+        spent queued behind other tasks is not held against it. A task that
+        overruns has only its own worker killed; the pool starts a
+        replacement and other tasks carry on.
+
+        Raises:
+            TaskTimeout: The task overran and its worker was killed
+        """
+        deadline = None
+        while not self._result.ready():
+            if deadline is None:
+                # 任务开始前不会超时，排队期间每个 timeout 查看一次是否已开始
+                self._result.wait(timeout)
+                started = self.started_at()
+                if started is not None:
+                    deadline = started + timeout
+                continue
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                if self.pool._kill(self.task_id):
+                    raise TaskTimeout(f"Task ran longer than {timeout} seconds")
+                # 刚好执行完，结果正在传回
+                deadline = None
+                continue
+            self._result.wait(remaining)
+        return self._result.get()
+
+class WorkerPool:
+    """
+    Spawned process pool with per-task timeouts
+
+    Unlike ProcessPoolExecutor, losing one worker does not break the pool:
+    multiprocessing.Pool replaces it and only the task it was running is
+    lost. Workers record when they start each task in a Manager dict so the
+    parent can time tasks from their start and kill just the stuck worker.
+    """
+
+    def __init__(self, processes: int, initializer: Optional[Callable[[], None]] = None):
+        # 子进程不继承 API 进程的线程和数据库连接
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._started = self._manager.dict()
+        self._pool = context.Pool(processes, initializer=_init_worker, initargs=(self._started, initializer))
+        self._ids = itertools.count()
+
+    def submit(self, func: Callable, *args) -> WorkerTask:
+        task_id = next(self._ids)
+        return WorkerTask(self, task_id, self._pool.apply_async(_run_task, (task_id, func, args)))
+
+    def _kill(self, task_id: int) -> bool:
+        # 条目在任务结束时移除，仍存在说明该子进程还在执行这个任务
+        started = self._started.pop(task_id, None)
+        if started is None:
+            return False
+        try:
+            os.kill(started[0], getattr(signal, "SIGKILL", signal.SIGTERM))
+        except ProcessLookupError:
+            pass
+        return True
+
+    def shutdown(self) -> None:
+        self._pool.terminate()
+        self._manager.shutdown()
@@ -0,0 +1,65 @@
+"""
+Markdown report render time: native path vs. HTML + html2text
+
+Renders the default Markdown template for a synthetic pet both ways:
+as an HTML-typed template converted back through html2text (the old
+path, Plotly chart included) and natively as a Markdown template with
+the text sparkline. Also times html2text on its own to show the cost
+the native path removes.
+
+Usage (from api/, with the app's environment configured):
+    python -m benchmarks.bench_markdown_report [--weights 365] [--runs 10]
+"""
+import argparse
+import statistics
+import time
+from types import SimpleNamespace
+
+from html2text import HTML2Text
+
+from app.core.config import settings
+from app.utils.init_data import DEFAULT_MARKDOWN_TEMPLATE
+from app.utils.report_generator import ReportGenerator
+
+from benchmarks.bench_report_size import build_sample
+
+# shared 模式需要 API 地址，否则回退为 SVG
+ASSET_BASE_URL = "http://localhost:8000"
+
+def median_ms(runs: int, func) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def bench_report(runs: int, sample: dict, template):
+    render = lambda: ReportGenerator.generate_report(**sample, template=template, format="markdown", chart_mode="shared", asset_base_url=ASSET_BASE_URL)
+    return len(render()), median_ms(runs, render)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weights", type=int, default=365)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    # 未保存的模板（无 id）在进程内编译渲染，只计报告本身的开销
+    settings.TEMPLATE_RENDER_WORKERS = 0
+    sample = build_sample(args.weights)
+    as_html = SimpleNamespace(id=None, template_type="html", content=DEFAULT_MARKDOWN_TEMPLATE, updated_at=None)
+    native = SimpleNamespace(id=None, template_type="markdown", content=DEFAULT_MARKDOWN_TEMPLATE, updated_at=None)
+    # 旧路径中交给 html2text 的中间 HTML
+    html = ReportGenerator.generate_report(**sample, template=as_html, format="html", chart_mode="shared", asset_base_url=ASSET_BASE_URL).decode()
+
+    results = [
+        ("html2text", len(html), median_ms(args.runs, lambda: HTML2Text().handle(html))),
+        ("via html", *bench_report(args.runs, sample, as_html)),
+        ("native", *bench_report(args.runs, sample, native)),
+    ]
+    print(f"{'path':<12}{'input/out (KB)':>16}{'median (ms)':>14}")
+    for name, size, median in results:
+        print(f"{name:<12}{size / 1024:>16.1f}{median:>14.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+PDF report throughput and peak memory by record count
+
+Streams synthetic weight and medical rows through the platypus engine,
+the same way the render endpoint feeds it from DB cursors, and reports
+pages per second and the tracemalloc peak.
+
+Usage (from api/, with the app's environment configured):
+    python -m benchmarks.bench_pdf_report [--sizes 1000 5000 20000]
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.utils.pdf_report import build_pdf_report, summary_rows
+
+def weight_rows(count: int):
+    start = datetime.utcnow() - timedelta(days=count)
+    for i in range(count):
+        yield start + timedelta(days=i), 10 + (i % 30) * 0.05, "routine check" if i % 7 == 0 else None
+
+def medical_rows(count: int):
+    start = datetime.utcnow()
+    for i in range(count):
+        yield start - timedelta(days=i), "呕吐, 食欲不振", "肠胃炎", "Rest and bland diet"
+
+def bench(records: int):
+    pet = SimpleNamespace(name="Bench Pet", species="dog", breed="Mixed")
+    summary = summary_rows(pet, "3 years", records, 10.5, 10.0, 11.45, records // 10, 0)
+    with tempfile.TemporaryFile() as output:
+        tracemalloc.start()
+        start = time.perf_counter()
+        pages = build_pdf_report(
+            output, pet, summary,
+            weight_rows(records),
+            medical_rows(records // 10),
+            []
+        )
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = output.tell()
+    return pages, size, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    args = parser.parse_args()
+
+    print(f"{'records':>8}{'pages':>8}{'size (KB)':>12}{'seconds':>10}{'pages/s':>10}{'peak (MB)':>12}")
+    for records in args.sizes:
+        pages, size, elapsed, peak = bench(records)
+        print(
+            f"{records:>8}{pages:>8}{size / 1024:>12.1f}{elapsed:>10.2f}"
+            f"{pages / elapsed:>10.1f}{peak / 1024 / 1024:>12.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
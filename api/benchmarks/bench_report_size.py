@@ -0,0 +1,53 @@
+"""
+Report size and render time by chart mode
+
+Renders the default HTML report for a synthetic pet and compares the
+inline plotly.js bundle with the shared static asset.
+
+Usage (from api/, with the app's environment configured):
+    python -m benchmarks.bench_report_size [--weights 365] [--runs 10]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.utils.report_generator import ReportGenerator
+from app.utils.sample_data import generate_sample_data
+
+def build_sample(weight_count: int) -> dict:
+    sample = generate_sample_data()
+    now = datetime.utcnow()
+    sample["weight_records"] = [
+        SimpleNamespace(
+            date=now - timedelta(days=weight_count - i),
+            weight=10 + (i % 30) * 0.05,
+            notes=None
+        ) for i in range(weight_count)
+    ]
+    return sample
+
+def bench(sample: dict, runs: int, **kwargs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        report = ReportGenerator.generate_report(**sample, **kwargs)
+        timings.append(time.perf_counter() - start)
+    return len(report), statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--weights", type=int, default=365)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    sample = build_sample(args.weights)
+    print(f"{'mode':<10}{'size (KB)':>12}{'median (ms)':>14}")
+    for chart_mode in ("inline", "shared"):
+        # shared 模式需要 API 地址，否则回退为 SVG
+        size, median = bench(sample, args.runs, chart_mode=chart_mode, asset_base_url="http://localhost:8000")
+        print(f"{chart_mode:<10}{size / 1024:>12.1f}{median * 1000:>14.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import io
+import tempfile
+import tracemalloc
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from app.core.config import settings
+from app.utils.avatar_variants import render_variants, variant_key
+from app.utils.file_validator import FileValidator
+from app.utils.image_pool import StageTimer, image_stats
+
+def make_upload(content: bytes) -> UploadFile:
+    # 与 Starlette 一致：超过 1MB 的上传落盘
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spool.write(content)
+    spool.seek(0)
+    return UploadFile(file=spool, filename="avatar.png", size=len(content))
+
+def noise_png(width: int, height: int, mode: str = "RGB") -> bytes:
+    # 随机像素、不压缩，文件大小接近像素数据
+    output = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert(mode).save(output, "PNG", compress_level=0)
+    return output.getvalue()
+
+def test_upload_is_streamed_not_buffered():
+    """Test an accepted upload is hashed in chunks and handed over as the spooled file"""
+    content = noise_png(1000, 1000)
+    upload = make_upload(content)
+
+    tracemalloc.start()
+    image = asyncio.run(FileValidator.validate_image(upload))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert image.stream is upload.file and image.stream.tell() == 0
+    assert image.size == len(content)
+    assert image.digest == hashlib.sha256(content).hexdigest()
+    assert image.image_type == "png"
+    # 旧实现持有 bytearray、bytes 和解码后的像素，峰值是文件大小的数倍
+    assert peak < len(content) / 4
+
+def test_bad_upload_rejected_from_header():
+    """Test type and dimension errors are raised after the first chunk"""
+    content = noise_png(2100, 1000, "L")
+    upload = make_upload(content)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(FileValidator.validate_image(upload))
+    assert "too large (2100x1000)" in exc.value.detail
+    assert upload.file.tell() == FileValidator.CHUNK_SIZE
+
+    upload = make_upload(b"not an image" * 100_000)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(FileValidator.validate_image(upload))
+    assert exc.value.detail == "The uploaded file is not a valid image"
+    assert upload.file.tell() < len(b"not an image" * 100_000)
+
+def test_large_image_resized_in_pool(monkeypatch):
+    """Test oversized images are shrunk in the image pool, within its queue limit"""
+    output = io.BytesIO()
+    Image.new("RGB", (1500, 1200), "teal").save(output, "JPEG")
+    image = asyncio.run(FileValidator.validate_image(make_upload(output.getvalue())))
+    assert image.image_type == "jpeg"
+    assert Image.open(image.stream).size == (1000, 800)
+    assert {"queue", "decode", "resize", "encode", "total"} <= set(image_stats()["stages"])
+
+    monkeypatch.setattr(settings, "IMAGE_QUEUE_LIMIT", 0)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(FileValidator.validate_image(make_upload(output.getvalue())))
+    assert exc.value.status_code == 503
+
+def test_webp_header_sniffed_without_whole_file():
+    """Test WebP size is read from the RIFF header (PIL needs the full file)"""
+    output = io.BytesIO()
+    Image.effect_noise((900, 700), 64).convert("RGB").save(output, "WEBP", quality=95)
+    assert len(output.getvalue()) > FileValidator.HEADER_LIMIT
+    image = asyncio.run(FileValidator.validate_image(make_upload(output.getvalue())))
+    assert image.image_type == "webp" and image.size == len(output.getvalue())
+
+def test_avatar_variants():
+    """Test each size gets a square WebP and a fallback that keeps transparency"""
+    output = io.BytesIO()
+    Image.new("RGBA", (640, 480), (0, 128, 255, 100)).save(output, "PNG")
+    variants = render_variants(StageTimer(), output.getvalue(), [48, 96, 256])
+    assert sorted((size, fmt) for size, fmt, _ in variants) == [
+        (48, "png"), (48, "webp"), (96, "png"), (96, "webp"), (256, "png"), (256, "webp")
+    ]
+    for size, fmt, content in variants:
+        with Image.open(io.BytesIO(content)) as img:
+            assert img.size == (size, size) and img.mode == "RGBA"
+    assert variant_key("pets/1/avatar-abc.png", 96, "webp") == "pets/1/avatar-abc/96.webp"
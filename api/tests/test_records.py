@@ -1,3 +1,33 @@
+from datetime import datetime
+from app.models.pet import Pet
+from app.models.records import WeightAnomaly, WeightRecord
+from app.utils.anomaly_detection import update_weight_baseline, update_weight_baselines
+
 def test_create_weight_record(client, auth_headers):
     """Test creating a weight record"""
-    # ... 
\ No newline at end of file
+    # ... 
+
+def test_weight_anomaly_flagged_on_insert(db, test_user):
+    """Test that a sudden weight drop is flagged at insert time"""
+    pet = Pet(name="Rex", species="dog", gender="male", owner_id=test_user.id)
+    db.add(pet)
+    db.flush()
+    
+    readings = [
+        WeightRecord(pet_id=pet.id, weight=weight, date=datetime(2024, 1, day + 1, 8))
+        for day, weight in enumerate([10.0, 10.1, 9.9, 10.0, 10.1, 10.0])
+    ]
+    db.add_all(readings)
+    # 批量导入按日期顺序折入基线，读数平稳时不标记
+    assert update_weight_baselines(db, reversed(readings)) == []
+    
+    drop = WeightRecord(pet_id=pet.id, weight=8.0, date=datetime(2024, 1, 8, 8))
+    db.add(drop)
+    anomaly = update_weight_baseline(db, drop)
+    db.flush()
+    
+    anomalies = db.query(WeightAnomaly).filter(WeightAnomaly.pet_id == pet.id).all()
+    assert anomalies == [anomaly]
+    assert anomaly.weight == 8.0
+    assert anomaly.weight_record_id == drop.id
+    assert anomaly.z_score < 0
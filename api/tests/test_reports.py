@@ -0,0 +1,77 @@
+from datetime import date
+from types import SimpleNamespace
+import pytest
+from jinja2.sandbox import SecurityError
+from app.core.config import settings
+from app.models.settings import ReportTemplate
+from app.utils.chart_renderer import render_weight_chart
+from app.utils.report_generator import ReportGenerator
+from app.utils.sample_data import generate_sample_data
+from app.utils.template_engine import get_template
+from app.utils.template_sandbox import TemplateBudgetExceeded
+from app.utils.template_store import apply_delta, encode_delta
+
+def render(content, monkeypatch):
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_WORKERS", 0)
+    template = ReportTemplate(name="t", template_type="html", content=content)
+    return ReportGenerator.generate_report(**generate_sample_data(), template=template, chart_mode="svg")
+
+def test_user_template_renders_in_sandbox(monkeypatch):
+    """Test a user template sees the report context"""
+    assert render("{{ pet.name }}", monkeypatch) == b"Sample Pet"
+    with pytest.raises(SecurityError):
+        render("{{ pet.__class__.__mro__ }}", monkeypatch)
+
+def test_runaway_template_is_stopped(monkeypatch):
+    """Test render budgets stop loops and oversized output"""
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_MAX_OPERATIONS", 10_000)
+    with pytest.raises(TemplateBudgetExceeded) as exc:
+        render("{% for i in range(1000) %}{% for j in range(1000) %}{% endfor %}{% endfor %}", monkeypatch)
+    assert exc.value.limit == "operations"
+
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_MAX_OUTPUT", 1000)
+    with pytest.raises(TemplateBudgetExceeded) as exc:
+        render("{% for i in range(100) %}{{ 'x' * 100 }}{% endfor %}", monkeypatch)
+    assert exc.value.limit == "output"
+
+def test_template_delta_roundtrip():
+    """Test a version delta decodes back to the exact content"""
+    base = "".join(f"<p>{i} {{{{ pet.name }}}}</p>\n" for i in range(200))
+    content = base.replace("<p>7 ", "<p>seven ") + "<p>新增</p>"
+    delta = encode_delta(base, content)
+    assert apply_delta(base, delta) == content
+    assert len(delta) < 100
+
+
+def test_markdown_template_renders_natively(monkeypatch):
+    """Test Markdown templates skip the HTML chart and html2text"""
+    monkeypatch.setattr(settings, "TEMPLATE_RENDER_WORKERS", 0)
+    template = ReportTemplate(name="t", template_type="markdown", content="    # {{ pet.name }}\n\n    {{ weight_chart }}")
+    report = ReportGenerator.generate_report(**generate_sample_data(), template=template, format="markdown")
+    assert report.startswith(b"# Sample Pet\n\n`")
+    assert b"<" not in report
+    html = ReportGenerator.generate_report(**generate_sample_data(), template=template, format="html")
+    assert html.startswith(b"<h1>Sample Pet</h1>")
+
+def test_chart_cache_keyed_by_records():
+    """Test a preview subset and the full history of one pet do not share a cached chart"""
+    records = [SimpleNamespace(date=date(2024, 1, day), weight=10 + day / 10) for day in range(1, 29)]
+    full = render_weight_chart(records, "svg", cache_key=(1, 0))
+    preview = render_weight_chart(records[-10:], "svg", cache_key=(1, 0))
+    assert preview != full
+    assert render_weight_chart(records, "svg", cache_key=(1, 0)) == full
+
+def test_template_compiled_from_caller_content():
+    """Test saved templates compile from the content the caller holds and are cached by name"""
+    template = SimpleNamespace(id=4242, updated_at=None, content="<p>{{ name }}</p>")
+    compiled = get_template(template)
+    assert compiled.render(name="Rex") == "<p>Rex</p>"
+    assert get_template(template) is compiled
+
+def test_shared_chart_uses_absolute_asset_url(monkeypatch):
+    """Test shared charts reference plotly.js by absolute URL and fall back to SVG without one"""
+    monkeypatch.setattr(settings, "STATIC_ASSET_BASE_URL", "")
+    offline = ReportGenerator.generate_report(**generate_sample_data(), chart_mode="shared")
+    assert b"<svg" in offline and b"/static/plotly-" not in offline
+    served = ReportGenerator.generate_report(**generate_sample_data(), chart_mode="shared", asset_base_url="http://api.test/")
+    assert b'src="http://api.test/static/plotly-' in served
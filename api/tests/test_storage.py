@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import pytest
+from minio import Minio
+from app.core import storage
+from app.core.config import settings
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    """Just enough of the S3 API for put, presign and delete"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, code: int, body: bytes = b"", headers: dict = None):
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlsplit(self.path).query.startswith("location"):
+            self._reply(200, b'<LocationConstraint xmlns="http://s3.amazonaws.com/doc/2006-03-01/"/>')
+        else:
+            self._reply(404)
+
+    def do_PUT(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.puts += 1
+            if server.fail_next:
+                server.fail_next -= 1
+                self._reply(503)
+                return
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+        # 模拟网络传输耗时
+        time.sleep(server.delay)
+        with server.lock:
+            server.active -= 1
+            server.objects[urlsplit(self.path).path] = body
+        self._reply(200, headers={"ETag": '"fake"'})
+
+    def do_DELETE(self):
+        self.server.objects.pop(urlsplit(self.path).path, None)
+        self._reply(204)
+
+    def log_message(self, *args):
+        pass
+
+class FakeS3(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeS3Handler)
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.delay = 0.0
+        self.fail_next = 0
+        self.puts = 0
+        self.active = 0
+        self.peak = 0
+
+@pytest.fixture
+def s3(monkeypatch):
+    server = FakeS3()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(storage, "minio_client", Minio(
+        f"127.0.0.1:{server.server_port}",
+        access_key="test",
+        secret_key="test-secret",
+        secure=False,
+        http_client=storage.create_http_client()
+    ))
+    monkeypatch.setattr(settings, "MINIO_WORKERS", 4)
+    storage.shutdown_storage()
+    yield server
+    storage.shutdown_storage()
+    server.shutdown()
+    server.server_close()
+
+def test_uploads_do_not_block_event_loop(s3):
+    """Test uploads run on the bounded storage pool while the loop keeps serving"""
+    s3.delay = 0.2
+
+    async def upload_all():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        urls = await asyncio.gather(*(
+            storage.upload_file(b"x" * 1024, f"pets/{i}/avatar.png", "image/png") for i in range(8)
+        ))
+        elapsed = time.perf_counter() - start
+        task.cancel()
+        return urls, elapsed, ticks
+
+    urls, elapsed, ticks = asyncio.run(upload_all())
+    assert len(urls) == 8 and len(s3.objects) == 8
+    # 8 次上传分两批完成，同时进行的不超过线程数
+    assert s3.peak == settings.MINIO_WORKERS
+    assert elapsed < 8 * s3.delay
+    assert ticks > 10
+
+    asyncio.run(storage.delete_file("pets/0/avatar.png"))
+    assert len(s3.objects) == 7
+
+def test_upload_retries_server_errors(s3):
+    """Test 5xx responses are retried by the connection pool"""
+    s3.fail_next = 2
+    asyncio.run(storage.upload_file(b"data", "pets/1/avatar.png", "image/png"))
+    assert s3.puts == 3
+    assert list(s3.objects.values()) == [b"data"]
@@ -0,0 +1,38 @@
+import io
+import pytest
+from PIL import Image
+from app.utils.avatar_generator import AvatarGenerator
+from app.utils.svg_path import parse_path, path_mask
+
+def test_parse_path_commands():
+    """Test relative, implicit and shorthand commands resolve to absolute points"""
+    (square,) = parse_path("m10 10h20v20H10z")
+    assert square == ((10, 10), (30, 10), (30, 30), (10, 30), (10, 10))
+    # moveto 后的坐标对按 lineto 处理，数字可以不加分隔符
+    (triangle,) = parse_path("M0 0 10-5.5.5 3z")
+    assert triangle[:3] == ((0, 0), (10, -5.5), (0.5, 3))
+    # 半圆：终点精确落在目标点，中点在圆上
+    (arc,) = parse_path("M0 0a10 10 0 0 0 20 0z")
+    assert arc[-2] == (20, 0)
+    assert any(abs(x - 10) < 1e-6 and abs(y - 10) < 1e-6 for x, y in arc)
+    with pytest.raises(ValueError):
+        parse_path("L10 10")
+    with pytest.raises(ValueError):
+        parse_path("M0 0a10 10 0 2 0 20 0")
+
+def test_path_mask_fill_rules():
+    """Test nested same-direction squares fill under nonzero and cut a hole under evenodd"""
+    data = "M0 0H40V40H0zM10 10H30V30H10z"
+    nonzero = path_mask(data, 40)
+    evenodd = path_mask(data, 40, "evenodd")
+    assert nonzero.mode == "L" and nonzero.size == (40, 40)
+    assert nonzero.getpixel((20, 20)) == 255 and evenodd.getpixel((20, 20)) == 0
+    assert nonzero.getpixel((5, 5)) == evenodd.getpixel((5, 5)) == 255
+    assert path_mask(data, 40) is nonzero
+
+def test_default_avatar_draws_icon():
+    """Test the species icon is pasted through its mask in the icon color"""
+    content = AvatarGenerator.generate_default_avatar(size=(200, 200), species="Fish", scheme=1)
+    with Image.open(io.BytesIO(content)) as img:
+        colors = {color for _, color in img.getcolors()}
+    assert {(0x4E, 0xCD, 0xC4), (0xFF, 0xFF, 0xFF)} <= colors